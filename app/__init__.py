@@ -1,11 +1,48 @@
 import os
 import logging
-from flask import Flask, send_from_directory, jsonify
+from flask import Flask, Response, g, request, send_from_directory, jsonify
 from config import config
+from app.models.knowledge_base import RepositoryAccess
 from app.services.openai_service import OpenAIService
+from app.services.admission import AdmissionController
+from app.services.batch_runner import BatchRunner
 from app.services.chatbot_service import ChatbotService
+from app.services.context_manager import ContextManager
+from app.services.http_pool import HttpConnectionPool
+from app.services.intent_router import IntentRouter, NaiveBayesIntentModel
+from app.services.knowledge_index import KnowledgeIndex, load_documents
+from app.services.log_pipeline import REQUEST_ID_HEADER, LogPipeline, bind_request, log_access, new_request_id, \
+    unbind_request
+from app.services.model_tiering import FAST, TierPolicy
+from app.services.resilience import ResiliencePolicy
+from app.services.response_cache import ResponseCache
+from app.services.session_store import SessionStore
+from app.services.single_flight import SingleFlight
+from app.services.static_assets import StaticAssetPipeline
+from app.services.tracing import MetricsRegistry
+from app.services.transcript_store import TranscriptStore
+from app.services.usage_tracker import UsageTracker
 from app.api.chat_routes import create_chat_routes
 
+def start_worker(app):
+    """Start a worker's background start-up: build the openai client and pre-open connections.
+    
+    create_app calls this itself unless PRELOAD_APP is set. Then the gunicorn
+    master has already built the client, and each forked worker calls this from
+    the post_fork hook in gunicorn.conf.py, since threads and sockets must not
+    be carried across a fork. That includes the log and transcript writer threads.
+    """
+    services = app.extensions['chatbot_services']
+    if services['log_pipeline']:
+        services['log_pipeline'].start()
+    if services['transcript_store']:
+        services['transcript_store'].start()
+    openai_service = services['openai_service']
+    openai_service.prepare_in_background()
+    if app.config['HTTP_POOL_WARMUP_CONNECTIONS'] > 0:
+        services['http_pool'].warm_up_in_background(openai_service.azure_endpoint,
+                                                    app.config['HTTP_POOL_WARMUP_CONNECTIONS'])
+
 def create_app(config_name='default'):
     """Application factory pattern."""
     
@@ -16,29 +53,263 @@ def create_app(config_name='default'):
     
     app.config.from_object(config[config_name])
     
+    log_pipeline = None
+    if app.config['LOG_PIPELINE_ENABLED']:
+        log_pipeline = LogPipeline(
+            level=app.config['LOG_LEVEL'],
+            json_format=app.config['LOG_FORMAT'] != 'text',
+            log_file=app.config['LOG_FILE'],
+            sample_rates=app.config['LOG_SAMPLE_RATES'],
+            queue_size=app.config['LOG_QUEUE_SIZE']
+        ).install()
+    
     logger = logging.getLogger(__name__)
     logger.info(f"Starting application in {config_name} mode")
     logger.info(f"Static folder: {app.static_folder}")
     
     try:
         # Initialize services
+        http_pool = HttpConnectionPool(
+            max_connections=app.config['HTTP_MAX_CONNECTIONS'],
+            max_keepalive_connections=app.config['HTTP_MAX_KEEPALIVE_CONNECTIONS'],
+            keepalive_expiry=app.config['HTTP_KEEPALIVE_EXPIRY_SECONDS'],
+            http2=app.config['HTTP2_ENABLED'],
+            connect_timeout=app.config['HTTP_CONNECT_TIMEOUT_SECONDS'],
+            read_timeout=app.config['HTTP_READ_TIMEOUT_SECONDS'],
+            write_timeout=app.config['HTTP_WRITE_TIMEOUT_SECONDS'],
+            pool_timeout=app.config['HTTP_POOL_TIMEOUT_SECONDS']
+        )
+        
+        resilience = ResiliencePolicy(
+            max_attempts=app.config['LLM_RETRY_MAX_ATTEMPTS'],
+            base_delay=app.config['LLM_RETRY_BASE_DELAY_SECONDS'],
+            max_delay=app.config['LLM_RETRY_MAX_DELAY_SECONDS'],
+            hedging_enabled=app.config['LLM_HEDGING_ENABLED'],
+            hedge_percentile=app.config['LLM_HEDGE_PERCENTILE'],
+            hedge_min_delay=app.config['LLM_HEDGE_MIN_DELAY_SECONDS'],
+            breaker_failure_threshold=app.config['LLM_BREAKER_FAILURE_THRESHOLD'],
+            breaker_recovery_timeout=app.config['LLM_BREAKER_RECOVERY_SECONDS']
+        )
+        
+        usage_tracker = UsageTracker(prices=app.config['MODEL_PRICES'])
+        
+        single_flight = None
+        if app.config['SINGLE_FLIGHT_ENABLED']:
+            single_flight = SingleFlight(
+                scope=app.config['SINGLE_FLIGHT_SCOPE'],
+                timeout_seconds=app.config['SINGLE_FLIGHT_TIMEOUT_SECONDS'],
+                shared_path=app.config['SINGLE_FLIGHT_SHARED_PATH']
+            )
+        
+        def admission_for(deployment, rpm_limit, tpm_limit):
+            """An admission controller for one deployment's quota, or None when it has no limits."""
+            if not app.config['ADMISSION_ENABLED'] or not (rpm_limit or tpm_limit):
+                return None
+            return AdmissionController(
+                rpm_limit=rpm_limit,
+                tpm_limit=tpm_limit,
+                burst_seconds=app.config['ADMISSION_BURST_SECONDS'],
+                shared_path=app.config['ADMISSION_SHARED_PATH'],
+                key=deployment,
+                max_queue=app.config['ADMISSION_MAX_QUEUE'],
+                max_queue_per_user=app.config['ADMISSION_MAX_QUEUE_PER_USER'],
+                max_wait={
+                    "interactive": app.config['ADMISSION_INTERACTIVE_MAX_WAIT_SECONDS'],
+                    "batch": app.config['ADMISSION_BATCH_MAX_WAIT_SECONDS']
+                },
+                batch_reserve=app.config['ADMISSION_BATCH_RESERVE'],
+                completion_tokens=app.config['ADMISSION_COMPLETION_TOKENS']
+            )
+        
+        admission = admission_for(app.config['AZURE_OPENAI_DEPLOYMENT'], app.config['ADMISSION_RPM_LIMIT'],
+                                  app.config['ADMISSION_TPM_LIMIT'])
+        
+        deployments, tier_admission, tier_policy = {}, {}, None
+        if app.config['AZURE_OPENAI_FAST_DEPLOYMENT']:
+            deployments[FAST] = app.config['AZURE_OPENAI_FAST_DEPLOYMENT']
+            fast_admission = admission_for(deployments[FAST], app.config['ADMISSION_FAST_RPM_LIMIT'],
+                                           app.config['ADMISSION_FAST_TPM_LIMIT'])
+            if fast_admission:
+                tier_admission[FAST] = fast_admission
+            tier_policy = TierPolicy(
+                fast_max_history_messages=app.config['MODEL_TIER_FAST_MAX_HISTORY_MESSAGES'],
+                fast_max_question_chars=app.config['MODEL_TIER_FAST_MAX_QUESTION_CHARS'],
+                escalate_unsure=app.config['MODEL_TIER_ESCALATE_UNSURE']
+            )
+        
         openai_service = OpenAIService(
             api_key=app.config['AZURE_OPENAI_API_KEY'],
             endpoint=app.config['AZURE_OPENAI_ENDPOINT'],
             deployment=app.config['AZURE_OPENAI_DEPLOYMENT'],
-            api_version=app.config['AZURE_API_VERSION']
+            api_version=app.config['AZURE_API_VERSION'],
+            http_client=http_pool.client,
+            resilience=resilience,
+            usage_tracker=usage_tracker,
+            stream_include_usage=app.config['LLM_STREAM_INCLUDE_USAGE'],
+            single_flight=single_flight,
+            admission=admission,
+            deployments=deployments,
+            tier_admission=tier_admission
         )
         
-        chatbot_service = ChatbotService(openai_service)
+        response_cache = None
+        if app.config['RESPONSE_CACHE_ENABLED']:
+            response_cache = ResponseCache(
+                max_entries=app.config['RESPONSE_CACHE_MAX_ENTRIES'],
+                ttl_seconds=app.config['RESPONSE_CACHE_TTL_SECONDS'],
+                tail_messages=app.config['RESPONSE_CACHE_TAIL_MESSAGES'],
+                shared_path=app.config['RESPONSE_CACHE_SHARED_PATH']
+            )
+        
+        context_manager = None
+        if app.config['CONTEXT_BUDGET_ENABLED']:
+            context_manager = ContextManager(
+                max_prompt_tokens=app.config['CONTEXT_MAX_PROMPT_TOKENS'],
+                keep_recent_messages=app.config['CONTEXT_KEEP_RECENT_MESSAGES'],
+                summary_max_tokens=app.config['CONTEXT_SUMMARY_MAX_TOKENS'],
+                encoding_name=app.config['CONTEXT_TOKENIZER_ENCODING']
+            )
+        
+        if app.config['PRELOAD_APP']:
+            # Built once in the gunicorn master and shared copy-on-write by the forked workers
+            openai_service.prepare()
+            if context_manager:
+                context_manager.prepare()
+        
+        knowledge_index = None
+        if app.config['KB_RETRIEVAL_ENABLED']:
+            knowledge_index = KnowledgeIndex.load_or_build(
+                load_documents(app.config['KB_DOCUMENTS_PATH']),
+                app.config['KB_INDEX_PATH'] or None
+            )
+        
+        intent_router = None
+        if app.config['INTENT_ROUTER_ENABLED']:
+            intent_model = None
+            if app.config['INTENT_MODEL_PATH']:
+                intent_model = NaiveBayesIntentModel.load(app.config['INTENT_MODEL_PATH'])
+            intent_router = IntentRouter(app.config['INTENT_ROUTER_MIN_CONFIDENCE'], intent_model)
+        
+        repository_access = RepositoryAccess(
+            data_path=app.config['REPOSITORY_DATA_PATH'] or None,
+            reload_interval=app.config['REPOSITORY_RELOAD_INTERVAL_SECONDS']
+        )
+        
+        transcript_store = None
+        if app.config['TRANSCRIPT_PATH']:
+            transcript_store = TranscriptStore(
+                app.config['TRANSCRIPT_PATH'],
+                max_queue=app.config['TRANSCRIPT_MAX_QUEUE'],
+                batch_size=app.config['TRANSCRIPT_BATCH_SIZE'],
+                flush_interval=app.config['TRANSCRIPT_FLUSH_INTERVAL_SECONDS'],
+                block_seconds=app.config['TRANSCRIPT_BLOCK_SECONDS']
+            )
+        
+        chatbot_service = ChatbotService(
+            openai_service,
+            direct_answer_tools=app.config['DIRECT_ANSWER_TOOLS'],
+            response_cache=response_cache,
+            context_manager=context_manager,
+            max_tool_rounds=app.config['TOOL_MAX_ROUNDS'],
+            tool_workers=app.config['TOOL_MAX_WORKERS'],
+            tool_memo_conversations=app.config['TOOL_MEMO_MAX_CONVERSATIONS'],
+            knowledge_index=knowledge_index,
+            search_top_k=app.config['KB_SEARCH_TOP_K'],
+            search_direct_min_score=app.config['KB_DIRECT_ANSWER_MIN_SCORE'],
+            search_direct_min_margin=app.config['KB_DIRECT_ANSWER_MIN_MARGIN'],
+            intent_router=intent_router,
+            repository_access=repository_access,
+            transcript_store=transcript_store,
+            tier_policy=tier_policy
+        )
+        
+        session_store = None
+        if app.config['SESSIONS_ENABLED']:
+            session_store = SessionStore(
+                max_sessions=app.config['SESSION_MAX_SESSIONS'],
+                max_messages=app.config['SESSION_MAX_MESSAGES'],
+                idle_ttl_seconds=app.config['SESSION_IDLE_TTL_SECONDS'],
+                shared_path=app.config['SESSION_SHARED_PATH']
+            )
+        
+        metrics = None
+        if app.config['METRICS_ENABLED']:
+            metrics = MetricsRegistry(shared_dir=app.config['METRICS_SHARED_DIR'])
+        
+        batch_runner = None
+        if app.config['BATCH_ENABLED']:
+            batch_runner = BatchRunner(chatbot_service, max_concurrency=app.config['BATCH_MAX_CONCURRENCY'],
+                                       metrics=metrics)
+        
+        # Expose the services so other entry points (e.g. the ASGI app) can share them
+        app.extensions['chatbot_services'] = {
+            "log_pipeline": log_pipeline,
+            "http_pool": http_pool,
+            "resilience": resilience,
+            "usage_tracker": usage_tracker,
+            "single_flight": single_flight,
+            "admission": admission,
+            "tier_policy": tier_policy,
+            "openai_service": openai_service,
+            "chatbot_service": chatbot_service,
+            "response_cache": response_cache,
+            "context_manager": context_manager,
+            "knowledge_index": knowledge_index,
+            "intent_router": intent_router,
+            "repository_access": repository_access,
+            "session_store": session_store,
+            "metrics": metrics,
+            "batch_runner": batch_runner,
+            "transcript_store": transcript_store
+        }
+        
+        @app.before_request
+        def bind_request_id():
+            g.request_id = new_request_id(request.headers.get(REQUEST_ID_HEADER))
+            g.log_tokens = bind_request(g.request_id)
+        
+        @app.after_request
+        def echo_request_id(response):
+            g.status = response.status_code
+            response.headers.setdefault(REQUEST_ID_HEADER, g.request_id)
+            return response
+        
+        @app.teardown_request
+        def unbind_request_id(error=None):
+            # Runs after a streamed body is finished, so the access line covers the whole stream
+            if 'log_tokens' in g:
+                if app.config['LOG_REQUESTS']:
+                    log_access(request.method, request.path, getattr(g, 'status', 500 if error else 200))
+                unbind_request(g.log_tokens)
+        
+        static_assets = None
+        if app.config['STATIC_PIPELINE_ENABLED'] and os.path.isdir(app.static_folder):
+            static_assets = StaticAssetPipeline(app.static_folder)
+        
+        def serve_static(filename):
+            """Serve a precompressed, hashed asset from memory, or fall back to the static folder."""
+            if static_assets:
+                served = static_assets.serve(
+                    filename,
+                    accept_encoding=request.headers.get('Accept-Encoding', ''),
+                    if_none_match=request.headers.get('If-None-Match', '')
+                )
+                if served:
+                    body, status, headers = served
+                    return Response(body, status=status, headers=headers)
+            return send_from_directory(app.static_folder, filename)
         
         # Register API routes
-        app.register_blueprint(create_chat_routes(chatbot_service))
+        app.register_blueprint(create_chat_routes(
+            chatbot_service, session_store, metrics,
+            batch_runner=batch_runner, batch_max_items=app.config['BATCH_MAX_ITEMS'], admission=admission
+        ))
         
         # Static file routes
         @app.route('/')
         def index():
             try:
-                return send_from_directory(app.static_folder, 'index.html')
+                return serve_static('index.html')
             except FileNotFoundError:
                 return """
                 <html>
@@ -54,10 +325,13 @@ def create_app(config_name='default'):
         @app.route('/<path:filename>')
         def static_files(filename):
             try:
-                return send_from_directory(app.static_folder, filename)
+                return serve_static(filename)
             except FileNotFoundError:
                 return f"File '{filename}' not found", 404
         
+        # Flask's built-in static endpoint shares this URL rule and is matched first
+        app.view_functions['static'] = static_files
+        
         @app.route('/test')
         def test_page():
             return """
@@ -75,23 +349,53 @@ def create_app(config_name='default'):
         def favicon():
             return '', 204
         
+        @app.route('/metrics')
+        def metrics_endpoint():
+            if not metrics:
+                return jsonify({"error": "Metrics are not enabled"}), 404
+            return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+        
         @app.route('/health')
         def health_check():
             return jsonify({
                 "status": "healthy", 
                 "service": "informatica-access-chatbot",
                 "static_folder": app.static_folder,
+                "http_pool": http_pool.stats(),
+                "resilience": resilience.stats(),
+                "usage": usage_tracker.stats(),
+                "single_flight": single_flight.stats() if single_flight else None,
+                "admission": admission.stats() if admission else None,
+                "fast_admission": tier_admission[FAST].stats() if FAST in tier_admission else None,
+                "model_tiers": dict(tier_policy.stats(), deployments=openai_service.deployments)
+                               if tier_policy else None,
+                "logging": log_pipeline.stats() if log_pipeline else None,
+                "response_cache": response_cache.stats() if response_cache else None,
+                "sessions": session_store.stats() if session_store else None,
+                "transcripts": transcript_store.stats() if transcript_store else None,
+                "context": context_manager.stats() if context_manager else None,
+                "onboarding": chatbot_service.unix_checker.stats(),
+                "tool_memos": chatbot_service.tool_memos.stats(),
+                "intent_router": intent_router.stats() if intent_router else None,
+                "static_assets": static_assets.stats() if static_assets else None,
+                "knowledge_index": {"articles": len(knowledge_index), "version": knowledge_index.version}
+                                   if knowledge_index else None,
                 "endpoints": [
                     "GET  /",
                     "GET  /health", 
+                    "GET  /metrics",
                     "GET  /test",
-                    "POST /api/chat"
-                ]
+                    "POST /api/chat",
+                    "POST /api/chat/stream"
+                ] + (["POST /api/chat/batch"] if batch_runner else [])
             })
         
+        if not app.config['PRELOAD_APP']:
+            start_worker(app)
+        
         logger.info("Application initialized successfully")
         return app
-        
+    
     except Exception as e:
         logger.error(f"Failed to initialize application: {e}")
         raise
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+from typing import Callable, List, Optional
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+from app.api.chat_routes import (client_identity, overloaded_event, overloaded_response, request_priority,
+                                 resolve_conversation, sse_event, use_cache_requested)
+from app.services.admission import AdmissionController, request_class
+from app.services.async_chatbot_service import AsyncChatbotService
+from app.services.session_store import SessionStore
+from app.services.tracing import MetricsRegistry, end_trace, start_trace
+from app.utils.exceptions import AdmissionRejectedError, ChatbotServiceError
+
+logger = logging.getLogger(__name__)
+
+def create_async_chat_routes(chatbot_service: AsyncChatbotService,
+                             session_store: Optional[SessionStore] = None,
+                             metrics: Optional[MetricsRegistry] = None,
+                             admission: Optional[AdmissionController] = None) -> List[Route]:
+    """Create the async chat routes, mirroring the Flask chat blueprint.
+    
+    Sessions kept in SQLite (``shared_path``) are read and written on worker
+    threads so a busy database never blocks the event loop.
+    """
+    
+    async def read_json(request: Request):
+        if "application/json" not in request.headers.get("content-type", ""):
+            return None, JSONResponse({"error": "Request must be JSON"}, status_code=400)
+        try:
+            data = await request.json()
+        except ValueError:
+            return None, JSONResponse({"error": "Request must be JSON"}, status_code=400)
+        if not data:
+            return None, JSONResponse({"error": "Missing 'messages' field"}, status_code=400)
+        return data, None
+    
+    async def with_sessions(function: Callable, *args):
+        if session_store is not None and session_store.shared_path:
+            return await asyncio.to_thread(function, *args)
+        return function(*args)
+    
+    def client_of(request: Request) -> str:
+        return client_identity(request.headers, request.client.host if request.client else None)
+    
+    async def chat(request: Request):
+        """Handle chat API requests."""
+        with request_class(request_priority(request.headers), client_of(request)):
+            if metrics is None:
+                return await handle_chat(request)
+            
+            trace = start_trace("/api/chat")
+            try:
+                response = await handle_chat(request)
+            finally:
+                end_trace()
+        response.headers["Server-Timing"] = trace.server_timing()
+        metrics.observe(trace, response.status_code)
+        return response
+    
+    async def handle_chat(request: Request):
+        try:
+            data, error_response = await read_json(request)
+            if error_response:
+                return error_response
+            
+            chat_history, session_id, new_messages, error = await with_sessions(resolve_conversation, data, session_store)
+            if error:
+                return JSONResponse(error[0], status_code=error[1])
+            
+            response_content = await chatbot_service.process_chat(
+                chat_history, use_cache=use_cache_requested(data, request.headers), conversation_id=session_id
+            )
+            
+            result = {"choices": [{"message": {"content": response_content}}]}
+            if session_id:
+                await with_sessions(session_store.append, session_id,
+                                    new_messages + [{"role": "assistant", "content": response_content}])
+                result["session_id"] = session_id
+            
+            return JSONResponse(result)
+        
+        except AdmissionRejectedError as e:
+            body, headers = overloaded_response(e)
+            return JSONResponse(body, status_code=503, headers=headers)
+        except ChatbotServiceError as e:
+            # The failed turn is kept out of the session
+            return JSONResponse({"choices": [{"message": {"content": str(e)}}]}, status_code=500)
+        except Exception as e:
+            logger.error(f"Unexpected error in async chat API: {e}")
+            return JSONResponse({
+                "choices": [{"message": {"content": "An unexpected error occurred."}}]
+            }, status_code=500)
+    
+    async def chat_stream(request: Request):
+        """Handle chat API requests, streaming the reply as Server-Sent Events."""
+        data, error_response = await read_json(request)
+        if error_response:
+            return error_response
+        
+        chat_history, session_id, new_messages, error = await with_sessions(resolve_conversation, data, session_store)
+        if error:
+            return JSONResponse(error[0], status_code=error[1])
+        
+        use_cache = use_cache_requested(data, request.headers)
+        priority = request_priority(request.headers)
+        user = client_of(request)
+        
+        if admission is not None:
+            try:
+                with request_class(priority, user):
+                    admission.check()
+            except AdmissionRejectedError as e:
+                body, headers = overloaded_response(e)
+                return JSONResponse(body, status_code=503, headers=headers)
+        
+        async def generate():
+            trace = start_trace("/api/chat/stream") if metrics is not None else None
+            chunks = []
+            # The outcome recorded in /metrics; the HTTP status line already went out as 200
+            status = 200
+            try:
+                with request_class(priority, user):
+                    async for chunk in chatbot_service.process_chat_stream(chat_history, use_cache=use_cache,
+                                                                         conversation_id=session_id):
+                        chunks.append(chunk)
+                        yield sse_event({"content": chunk})
+                
+                # Only a completed answer joins (or opens) the session; a failed one would pollute later context
+                if session_id:
+                    await with_sessions(session_store.append, session_id,
+                                        new_messages + [{"role": "assistant", "content": "".join(chunks)}])
+                    yield sse_event({"session_id": session_id}, event="session")
+            except AdmissionRejectedError as e:
+                status = 503
+                yield overloaded_event(e)
+            except ChatbotServiceError as e:
+                status = 500
+                yield sse_event({"content": str(e)}, event="error")
+            except Exception as e:
+                status = 500
+                logger.error(f"Unexpected error in async chat stream API: {e}")
+                yield sse_event({"content": "An unexpected error occurred."}, event="error")
+            finally:
+                if trace is not None:
+                    end_trace()
+                    metrics.observe(trace, status)
+            yield sse_event({}, event="done")
+        
+        return StreamingResponse(
+            generate(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    
+    return [
+        Route("/api/chat", chat, methods=["POST"]),
+        Route("/api/chat/stream", chat_stream, methods=["POST"])
+    ]
@@ -1,40 +1,310 @@
+import json
 import logging
-from flask import Blueprint, request, jsonify
+from typing import Dict, List, Optional, Tuple
+from flask import Blueprint, Response, make_response, request, jsonify, stream_with_context
+from app.services.admission import PRIORITIES, AdmissionController, request_class, retry_after_header
+from app.services.batch_runner import BatchRunner, BatchSummary
 from app.services.chatbot_service import ChatbotService
+from app.services.session_store import SessionStore
+from app.services.tracing import MetricsRegistry, end_trace, start_trace
+from app.utils.exceptions import AdmissionRejectedError, ChatbotServiceError
 
 logger = logging.getLogger(__name__)
 
-def create_chat_routes(chatbot_service: ChatbotService) -> Blueprint:
-    """Create chat routes with dependency injection."""
+def create_chat_routes(chatbot_service: ChatbotService, session_store: Optional[SessionStore] = None,
+                       metrics: Optional[MetricsRegistry] = None, batch_runner: Optional[BatchRunner] = None,
+                       batch_max_items: int = 2000,
+                       admission: Optional[AdmissionController] = None) -> Blueprint:
+    """Create chat routes with dependency injection.
+    
+    With a metrics registry, each request is traced stage by stage: the totals
+    feed ``/metrics`` and non-streaming replies carry a ``Server-Timing`` header.
+    Requests the admission controller cannot fit into the Azure quota in time
+    get a 503 with ``Retry-After``.
+    """
     
     chat_bp = Blueprint('chat', __name__)
     
     @chat_bp.route('/api/chat', methods=['POST'])
     def chat():
         """Handle chat API requests."""
+        with request_class(request_priority(request.headers), client_identity(request.headers, request.remote_addr)):
+            if metrics is None:
+                return handle_chat()
+            
+            trace = start_trace('/api/chat')
+            try:
+                response = make_response(handle_chat())
+            finally:
+                end_trace()
+        response.headers['Server-Timing'] = trace.server_timing()
+        metrics.observe(trace, response.status_code)
+        return response
+    
+    def handle_chat():
         try:
             if not request.is_json:
                 return jsonify({"error": "Request must be JSON"}), 400
             
             data = request.get_json()
-            if not data or 'messages' not in data:
+            if not data:
                 return jsonify({"error": "Missing 'messages' field"}), 400
             
-            chat_history = data.get('messages', [])
-            
-            if not isinstance(chat_history, list):
-                return jsonify({"error": "Messages must be a list"}), 400
+            chat_history, session_id, new_messages, error = resolve_conversation(data, session_store)
+            if error:
+                return jsonify(error[0]), error[1]
             
-            response_content = chatbot_service.process_chat(chat_history)
+            response_content = chatbot_service.process_chat(
+                chat_history, use_cache=use_cache_requested(data, request.headers), conversation_id=session_id
+            )
             
-            return jsonify({
-                "choices": [{"message": {"content": response_content}}]
-            })
+            result = {"choices": [{"message": {"content": response_content}}]}
+            if session_id:
+                session_store.append(session_id, new_messages + [{"role": "assistant", "content": response_content}])
+                result["session_id"] = session_id
             
+            return jsonify(result)
+        
+        except AdmissionRejectedError as e:
+            body, headers = overloaded_response(e)
+            return jsonify(body), 503, headers
+        except ChatbotServiceError as e:
+            # The failed turn is kept out of the session
+            return jsonify({"choices": [{"message": {"content": str(e)}}]}), 500
         except Exception as e:
             logger.error(f"Unexpected error in chat API: {e}")
             return jsonify({
                 "choices": [{"message": {"content": "An unexpected error occurred."}}]
             }), 500
     
+    @chat_bp.route('/api/chat/stream', methods=['POST'])
+    def chat_stream():
+        """Handle chat API requests, streaming the reply as Server-Sent Events."""
+        if not request.is_json:
+            return jsonify({"error": "Request must be JSON"}), 400
+        
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "Missing 'messages' field"}), 400
+        
+        chat_history, session_id, new_messages, error = resolve_conversation(data, session_store)
+        if error:
+            return jsonify(error[0]), error[1]
+        
+        use_cache = use_cache_requested(data, request.headers)
+        priority = request_priority(request.headers)
+        user = client_identity(request.headers, request.remote_addr)
+        
+        if admission is not None:
+            # The status line goes out with the first event, so turn the request away now if it cannot fit
+            try:
+                with request_class(priority, user):
+                    admission.check()
+            except AdmissionRejectedError as e:
+                body, headers = overloaded_response(e)
+                return jsonify(body), 503, headers
+        
+        def generate():
+            # Headers are already sent once streaming starts, so stream timings only reach /metrics
+            trace = start_trace('/api/chat/stream') if metrics is not None else None
+            chunks = []
+            # The outcome recorded in /metrics; the HTTP status line already went out as 200
+            status = 200
+            try:
+                with request_class(priority, user):
+                    for chunk in chatbot_service.process_chat_stream(chat_history, use_cache=use_cache,
+                                                                   conversation_id=session_id):
+                        chunks.append(chunk)
+                        yield sse_event({"content": chunk})
+                
+                # Only a completed answer joins (or opens) the session; a failed one would pollute later context
+                if session_id:
+                    session_store.append(session_id, new_messages + [{"role": "assistant", "content": "".join(chunks)}])
+                    yield sse_event({"session_id": session_id}, event="session")
+            except AdmissionRejectedError as e:
+                status = 503
+                yield overloaded_event(e)
+            except ChatbotServiceError as e:
+                status = 500
+                yield sse_event({"content": str(e)}, event="error")
+            except Exception as e:
+                status = 500
+                logger.error(f"Unexpected error in chat stream API: {e}")
+                yield sse_event({"content": "An unexpected error occurred."}, event="error")
+            finally:
+                if trace is not None:
+                    end_trace()
+                    metrics.observe(trace, status)
+            yield sse_event({}, event="done")
+        
+        return Response(
+            stream_with_context(generate()),
+            mimetype='text/event-stream',
+            headers={
+                "Cache-Control": "no-cache",
+                # Stop Azure App Service / nginx front ends from buffering the stream
+                "X-Accel-Buffering": "no"
+            }
+        )
+    
+    @chat_bp.route('/api/chat/batch', methods=['POST'])
+    def chat_batch():
+        """Answer many saved conversations, streaming one NDJSON result line per conversation."""
+        if batch_runner is None:
+            return jsonify({"error": "Batch processing is not enabled"}), 404
+        
+        records, options, error = read_batch(request, batch_max_items)
+        if error:
+            return jsonify(error[0]), error[1]
+        
+        user = client_identity(request.headers, request.remote_addr)
+        
+        def generate():
+            summary = BatchSummary()
+            for result in batch_runner.run(records, use_cache=options['cache'], concurrency=options['concurrency'],
+                                           user=user):
+                yield json.dumps(summary.add(result)) + "\n"
+            yield json.dumps({"summary": summary.summary()}) + "\n"
+        
+        return Response(
+            stream_with_context(generate()),
+            mimetype='application/x-ndjson',
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    
     return chat_bp
+
+
+def read_batch(req, max_items: int) -> Tuple[List, Dict, Optional[Tuple[Dict, int]]]:
+    """Parse a batch request into (conversations, options, (error body, status)).
+    
+    The body is either JSON, ``{"conversations": [...], "concurrency": n, "cache": bool}``,
+    or NDJSON with one conversation per line and ``concurrency``/``cache`` as query
+    parameters. The response cache is bypassed unless asked for, so evaluations
+    see fresh answers.
+    """
+    options = {
+        "concurrency": req.args.get('concurrency', type=int),
+        "cache": req.args.get('cache', 'false').lower() == 'true'
+    }
+    
+    if req.mimetype in ('application/x-ndjson', 'application/jsonl', 'application/jsonlines'):
+        records = []
+        for number, line in enumerate(req.get_data(as_text=True).splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                return [], options, ({"error": f"Invalid JSON on line {number}"}, 400)
+    elif req.is_json:
+        data = req.get_json(silent=True)
+        if not isinstance(data, dict) or not isinstance(data.get('conversations'), list):
+            return [], options, ({"error": "Missing 'conversations' list"}, 400)
+        records = data['conversations']
+        if data.get('concurrency') is not None:
+            if not isinstance(data['concurrency'], int) or isinstance(data['concurrency'], bool):
+                return [], options, ({"error": "'concurrency' must be an integer"}, 400)
+            options['concurrency'] = data['concurrency']
+        if 'cache' in data:
+            options['cache'] = data['cache'] is True
+    else:
+        return [], options, ({"error": "Request must be JSON or NDJSON"}, 400)
+    
+    if not records:
+        return [], options, ({"error": "No conversations in the batch"}, 400)
+    if len(records) > max_items:
+        return [], options, ({"error": f"A batch holds at most {max_items} conversations"}, 413)
+    return records, options, None
+
+
+def resolve_conversation(data: dict, session_store: Optional[SessionStore]) -> Tuple[Optional[List[Dict]], Optional[str], List[Dict], Optional[Tuple[Dict, int]]]:
+    """Work out the conversation for a request.
+    
+    Clients either post the full ``messages`` history, or (session mode) a
+    ``session_id`` plus the new ``message``. Posting ``messages`` with
+    ``"session": true`` starts a session seeded with that history. Returns
+    (chat_history, session_id, messages to record in the session, (error body, status)).
+    A new session only gets its id here; it is stored once the turn is answered,
+    so failed requests leave nothing behind.
+    """
+    if 'message' in data or 'session_id' in data:
+        if session_store is None:
+            return None, None, [], ({"error": "Sessions are not enabled"}, 400)
+        
+        message = data.get('message')
+        if not isinstance(message, str) or not message.strip():
+            return None, None, [], ({"error": "Missing 'message' field"}, 400)
+        
+        session_id = data.get('session_id')
+        if session_id:
+            history = session_store.get_history(session_id)
+            if history is None:
+                return None, None, [], ({"error": "Unknown or expired session"}, 404)
+        else:
+            history = []
+            session_id = session_store.new_id()
+        
+        user_message = {"role": "user", "content": message}
+        return history + [user_message], session_id, [user_message], None
+    
+    if 'messages' not in data:
+        return None, None, [], ({"error": "Missing 'messages' field"}, 400)
+    
+    chat_history = data.get('messages', [])
+    
+    if not isinstance(chat_history, list):
+        return None, None, [], ({"error": "Messages must be a list"}, 400)
+    
+    if data.get('session') and session_store is not None:
+        return chat_history, session_store.new_id(), chat_history, None
+    
+    return chat_history, None, [], None
+
+
+def use_cache_requested(data: dict, headers) -> bool:
+    """Clients bypass the response cache with {"cache": false} or Cache-Control: no-cache."""
+    if data.get('cache') is False:
+        return False
+    return 'no-cache' not in headers.get('Cache-Control', '').lower()
+
+
+def request_priority(headers) -> str:
+    """Chat is interactive; clients such as eval scripts may lower theirs with ``X-Request-Priority: batch``."""
+    priority = headers.get('X-Request-Priority', '').strip().lower()
+    return priority if priority in PRIORITIES else PRIORITIES[0]
+
+
+def client_identity(headers, remote_addr: Optional[str]) -> str:
+    """Who a request is queued for: the App Service signed-in user, else the client address."""
+    principal = headers.get('X-MS-CLIENT-PRINCIPAL-NAME')
+    if principal:
+        return principal
+    client = headers.get('X-Forwarded-For', '').split(',')[0].strip()
+    if client.count(':') == 1:
+        # App Service forwards IPv4 clients as address:port
+        client = client.split(':')[0]
+    return client or remote_addr or 'anonymous'
+
+
+def overloaded_response(error: AdmissionRejectedError) -> Tuple[Dict, Dict]:
+    """Body and headers for a request turned away by admission control."""
+    retry_after = retry_after_header(error.retry_after)
+    body = {
+        "error": str(error),
+        "retry_after": int(retry_after),
+        "choices": [{"message": {"content": f"The assistant is busy right now. Please try again in {retry_after} seconds."}}]
+    }
+    return body, {"Retry-After": retry_after}
+
+
+def overloaded_event(error: AdmissionRejectedError) -> str:
+    """The SSE ``error`` event for a stream turned away by admission control; clients show its ``content``."""
+    body = overloaded_response(error)[0]
+    return sse_event({**body, "content": body["choices"][0]["message"]["content"]}, event="error")
+
+
+def sse_event(payload: dict, event: Optional[str] = None) -> str:
+    """Format a payload as a single Server-Sent Event."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(payload)}\n\n"
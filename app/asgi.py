@@ -0,0 +1,73 @@
+import logging
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.routing import Mount
+from app import create_app
+from app.api.async_chat_routes import create_async_chat_routes
+from app.services.async_chatbot_service import AsyncChatbotService
+from app.services.async_openai_service import AsyncOpenAIService
+from app.services.log_pipeline import RequestLogMiddleware
+
+logger = logging.getLogger(__name__)
+
+def create_asgi_app(config_name='default') -> Starlette:
+    """ASGI application factory.
+    
+    The chat endpoints are served natively on the event loop through
+    AsyncChatbotService, so one worker can hold many in-flight completions.
+    Every other route (static files, /health, /test) falls through to the Flask
+    app, which shares its cache, context manager and session store.
+    """
+    flask_app = create_app(config_name)
+    services = flask_app.extensions['chatbot_services']
+    
+    openai_service = AsyncOpenAIService(
+        api_key=flask_app.config['AZURE_OPENAI_API_KEY'],
+        endpoint=flask_app.config['AZURE_OPENAI_ENDPOINT'],
+        deployment=flask_app.config['AZURE_OPENAI_DEPLOYMENT'],
+        api_version=flask_app.config['AZURE_API_VERSION'],
+        http_client=services['http_pool'].create_async_client(),
+        resilience=services['resilience'],
+        usage_tracker=services['usage_tracker'],
+        stream_include_usage=flask_app.config['LLM_STREAM_INCLUDE_USAGE'],
+        single_flight=services['single_flight'],
+        admission=services['admission'],
+        deployments=services['openai_service'].deployments,
+        tier_admission=services['openai_service'].tier_admission
+    )
+    if flask_app.config['PRELOAD_APP']:
+        openai_service.prepare()
+    else:
+        openai_service.prepare_in_background()
+    
+    chatbot_service = AsyncChatbotService(
+        openai_service,
+        direct_answer_tools=flask_app.config['DIRECT_ANSWER_TOOLS'],
+        response_cache=services['response_cache'],
+        context_manager=services['context_manager'],
+        max_tool_rounds=flask_app.config['TOOL_MAX_ROUNDS'],
+        tool_workers=flask_app.config['TOOL_MAX_WORKERS'],
+        tool_memo_conversations=flask_app.config['TOOL_MEMO_MAX_CONVERSATIONS'],
+        knowledge_index=services['knowledge_index'],
+        search_top_k=flask_app.config['KB_SEARCH_TOP_K'],
+        search_direct_min_score=flask_app.config['KB_DIRECT_ANSWER_MIN_SCORE'],
+        search_direct_min_margin=flask_app.config['KB_DIRECT_ANSWER_MIN_MARGIN'],
+        intent_router=services['intent_router'],
+        repository_access=services['repository_access'],
+        transcript_store=services['transcript_store'],
+        tier_policy=services['tier_policy']
+    )
+    
+    routes = create_async_chat_routes(chatbot_service, services['session_store'], services['metrics'],
+                                      admission=services['admission'])
+    routes.append(Mount('/', app=WSGIMiddleware(flask_app)))
+    
+    # Request ids for the async routes, and access lines for every request including those handed to Flask
+    middleware = [Middleware(RequestLogMiddleware, log_requests=flask_app.config['LOG_REQUESTS'])]
+    flask_app.config['LOG_REQUESTS'] = False
+    application = Starlette(routes=routes, middleware=middleware)
+    # gunicorn's post_fork hook runs start_worker on the Flask app behind a preloaded ASGI app
+    application.state.flask_app = flask_app
+    logger.info("ASGI application initialized successfully")
+    return application
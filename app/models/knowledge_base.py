@@ -1,5 +1,16 @@
+import bisect
+import difflib
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
 from typing import Dict, List, Optional
 
+logger = logging.getLogger(__name__)
+
 class KnowledgeBase:
     """Manages the internal knowledge base for Informatica access."""
     
@@ -24,6 +35,11 @@ class KnowledgeBase:
     def get_all_keys(cls) -> List[str]:
         """Get all available knowledge base keys."""
         return list(cls.INTERNAL_KNOWLEDGE_BASE.keys())
+    
+    @classmethod
+    def get_data_version(cls) -> str:
+        """Get a fingerprint of the knowledge base content."""
+        return _fingerprint(cls.INTERNAL_KNOWLEDGE_BASE)
 
 
 class RepositoryAccess:
@@ -48,12 +64,134 @@ class RepositoryAccess:
         "P2": ["informatica_prod2_read", "db2_prod2_read", "yellowbrick_prod2_read"]
     }
     
-    @classmethod
-    def get_access_groups(cls, repository_id: str) -> Optional[List[str]]:
+    def __init__(self, data_path: Optional[str] = None, reload_interval: float = 2.0):
+        """Serve the built-in groups, or those in ``data_path`` (a JSON mapping or SQLite database).
+        
+        The file is checked for changes at most every ``reload_interval`` seconds.
+        A changed file is loaded into a new snapshot that replaces the old one in a
+        single assignment, so readers never wait on a reload.
+        """
+        self.data_path = data_path
+        self.reload_interval = reload_interval
+        self._reload_lock = threading.Lock()
+        self._next_check = 0.0
+        self._file_signature = None
+        self._snapshot = _RepositorySnapshot(self.REPOSITORY_ACCESS_GROUPS)
+        if data_path:
+            self.maybe_reload(force=True)
+    
+    def maybe_reload(self, force: bool = False) -> bool:
+        """Reload the data file if it changed; returns True when a new snapshot was swapped in."""
+        if not self.data_path:
+            return False
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return False
+        # Another thread is already checking; keep serving the current snapshot
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        try:
+            self._next_check = now + self.reload_interval
+            stat = os.stat(self.data_path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if signature == self._file_signature:
+                return False
+            # Recorded before parsing so a bad file is reported once, not on every check
+            self._file_signature = signature
+            snapshot = _RepositorySnapshot(_load_repository_file(self.data_path))
+            if snapshot.version == self._snapshot.version:
+                return False
+            self._snapshot = snapshot
+            logger.info(f"Loaded {len(snapshot.repository_ids)} repositories from {self.data_path}")
+            return True
+        except (OSError, ValueError, sqlite3.Error) as e:
+            # Keep serving the previous snapshot; the next write to the file is picked up
+            logger.warning(f"Could not load repository data from {self.data_path}: {e}")
+            return False
+        finally:
+            self._reload_lock.release()
+    
+    def _current(self) -> "_RepositorySnapshot":
+        self.maybe_reload()
+        return self._snapshot
+    
+    def get_access_groups(self, repository_id: str) -> Optional[List[str]]:
         """Get access groups for a specific repository."""
-        return cls.REPOSITORY_ACCESS_GROUPS.get(repository_id.upper())
+        return self._current().groups.get(repository_id.strip().upper())
     
-    @classmethod
-    def get_all_repositories(cls) -> List[str]:
+    def get_repositories_for_group(self, group_name: str) -> List[str]:
+        """Get the repositories a given access group grants, ignoring case."""
+        return self._current().repositories_by_group.get(group_name.strip().lower(), [])
+    
+    def find_repositories(self, query: str, limit: int = 10) -> List[str]:
+        """Repository IDs starting with ``query``, or the closest fuzzy matches when none do."""
+        snapshot = self._current()
+        query = query.strip().upper()
+        if not query:
+            return []
+        start = bisect.bisect_left(snapshot.sorted_ids, query)
+        matches = []
+        for repository_id in snapshot.sorted_ids[start:]:
+            if not repository_id.startswith(query) or len(matches) >= limit:
+                break
+            matches.append(repository_id)
+        return matches or difflib.get_close_matches(query, snapshot.sorted_ids, n=limit, cutoff=0.5)
+    
+    def get_all_repositories(self) -> List[str]:
         """Get all available repository IDs."""
-        return list(cls.REPOSITORY_ACCESS_GROUPS.keys())
+        return list(self._current().repository_ids)
+    
+    def get_data_version(self) -> str:
+        """Get a fingerprint of the repository access data."""
+        return self._current().version
+
+
+class _RepositorySnapshot:
+    """Immutable view of the repository data with forward, reverse and sorted-ID indexes."""
+    
+    def __init__(self, groups: Dict[str, List[str]]):
+        self.groups = {repository_id.upper(): list(group_names) for repository_id, group_names in groups.items()}
+        self.repository_ids = list(self.groups)
+        self.sorted_ids = sorted(self.repository_ids)
+        self.repositories_by_group: Dict[str, List[str]] = {}
+        for repository_id, group_names in self.groups.items():
+            for group_name in group_names:
+                self.repositories_by_group.setdefault(group_name.lower(), []).append(repository_id)
+        self.version = _fingerprint(self.groups)
+
+
+def _load_repository_file(path: str) -> Dict[str, List[str]]:
+    """Read ``{repository_id: [group, ...]}`` from a JSON file or a SQLite database.
+    
+    The database needs a ``repository_access_groups(repository_id, group_name)``
+    table; rows keep their insertion order within a repository.
+    """
+    if path.endswith((".db", ".sqlite", ".sqlite3")):
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            rows = conn.execute(
+                "SELECT repository_id, group_name FROM repository_access_groups ORDER BY rowid"
+            ).fetchall()
+        finally:
+            conn.close()
+        groups: Dict[str, List[str]] = {}
+        for repository_id, group_name in rows:
+            groups.setdefault(repository_id, []).append(group_name)
+    else:
+        with open(path, encoding="utf-8") as f:
+            groups = json.load(f)
+    
+    # Checked here so a malformed file is rejected like unreadable JSON, keeping the last good snapshot
+    if not isinstance(groups, dict) or not all(
+        isinstance(repository_id, str) and isinstance(group_names, list)
+        and all(isinstance(group_name, str) for group_name in group_names)
+        for repository_id, group_names in groups.items()
+    ):
+        raise ValueError("expected repository IDs mapped to lists of group names, all strings")
+    return groups
+
+
+def _fingerprint(data: Dict) -> str:
+    """Stable short hash of JSON-serializable data."""
+    serialized = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()[:16]
@@ -0,0 +1,462 @@
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import math
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.services.tracing import trace_stage
+from app.utils.exceptions import AdmissionRejectedError
+
+logger = logging.getLogger(__name__)
+
+# Request classes, most urgent first
+PRIORITIES = ("interactive", "batch")
+# Rough prompt size used to estimate TPM before a call; the quota is reconciled with real usage after it
+CHARS_PER_TOKEN = 4
+
+_current_request: ContextVar[Tuple[str, str]] = ContextVar("admission_request", default=("interactive", "anonymous"))
+
+
+def current_request_class() -> Tuple[str, str]:
+    """The ``(priority, user)`` Azure calls in this context are queued as."""
+    return _current_request.get()
+
+
+@contextmanager
+def request_class(priority: str, user: str):
+    """Queue Azure calls made in this block (thread or asyncio task) as ``priority`` on behalf of ``user``."""
+    token = _current_request.set((priority if priority in PRIORITIES else PRIORITIES[0], user or "anonymous"))
+    try:
+        yield
+    finally:
+        try:
+            _current_request.reset(token)
+        except ValueError:
+            # A streaming generator closed from another context (e.g. on client disconnect)
+            pass
+
+
+class TokenBuckets:
+    """Requests-per-minute and tokens-per-minute buckets for one deployment's quota.
+    
+    Each bucket refills at ``limit / 60`` per second and holds ``burst_seconds``
+    worth of quota, since Azure enforces its per-minute limits over short
+    windows. A call larger than the bucket is let through once the bucket is
+    full and leaves it in debt. ``reserve`` keeps a share of each bucket for more
+    urgent traffic.
+    """
+    
+    def __init__(self, rpm_limit: float = 0, tpm_limit: float = 0, burst_seconds: float = 10.0):
+        limits = {"requests": rpm_limit, "tokens": tpm_limit}
+        self.rates = {name: limit / 60.0 for name, limit in limits.items() if limit > 0}
+        self.capacities = {name: rate * burst_seconds for name, rate in self.rates.items()}
+        self._state = self._full_state()
+        self._lock = threading.Lock()
+        # Levels as of the last update, for cheap wait estimates that do not touch shared state
+        self.last_levels = dict(self.capacities)
+        self.last_updated = time.time()
+    
+    def _full_state(self) -> Dict[str, Any]:
+        return {"levels": dict(self.capacities), "updated": time.time(), "paused_until": 0.0}
+    
+    @contextmanager
+    def _state_for_update(self) -> Iterator[Dict[str, Any]]:
+        with self._lock:
+            yield self._state
+    
+    def _refill(self, state: Dict[str, Any], now: float) -> None:
+        elapsed = max(0.0, now - state["updated"])
+        for name, rate in self.rates.items():
+            level = state["levels"].get(name, self.capacities[name])
+            state["levels"][name] = min(self.capacities[name], level + elapsed * rate)
+        state["updated"] = now
+    
+    def take(self, costs: Dict[str, float], reserve: float = 0.0) -> float:
+        """Take ``costs`` if every bucket can cover them; otherwise return the seconds until they could."""
+        with self._state_for_update() as state:
+            now = time.time()
+            self._refill(state, now)
+            if state["paused_until"] > now:
+                return state["paused_until"] - now
+            
+            wait = 0.0
+            for name, rate in self.rates.items():
+                capacity = self.capacities[name]
+                needed = min(costs.get(name, 0.0), capacity * (1 - reserve)) + capacity * reserve
+                if state["levels"][name] < needed:
+                    wait = max(wait, (needed - state["levels"][name]) / rate)
+            if wait == 0.0:
+                for name in self.rates:
+                    state["levels"][name] -= costs.get(name, 0.0)
+            self.last_levels, self.last_updated = dict(state["levels"]), now
+            return wait
+    
+    def adjust(self, costs: Dict[str, float]) -> None:
+        """Return (or, when negative, charge more of) quota already taken."""
+        with self._state_for_update() as state:
+            self._refill(state, time.time())
+            for name in self.rates:
+                state["levels"][name] = min(self.capacities[name], state["levels"][name] + costs.get(name, 0.0))
+    
+    def pause(self, seconds: float) -> None:
+        """Stop granting quota for ``seconds``, e.g. after Azure answered 429."""
+        with self._state_for_update() as state:
+            state["paused_until"] = max(state["paused_until"], time.time() + seconds)
+    
+    def levels(self) -> Dict[str, float]:
+        with self._state_for_update() as state:
+            self._refill(state, time.time())
+            return {name: round(level, 1) for name, level in state["levels"].items()}
+
+
+class SharedTokenBuckets(TokenBuckets):
+    """TokenBuckets kept in a SQLite file, so every worker on the host draws on the same quota.
+    
+    Each update is one ``BEGIN IMMEDIATE`` transaction; if the file cannot be
+    used the worker falls back to its own in-process buckets.
+    """
+    
+    def __init__(self, shared_path: str, key: str, rpm_limit: float = 0, tpm_limit: float = 0,
+                 burst_seconds: float = 10.0):
+        super().__init__(rpm_limit, tpm_limit, burst_seconds)
+        self.shared_path = shared_path
+        self.key = key
+        self._initialize_shared_store()
+    
+    def _initialize_shared_store(self) -> None:
+        """Create the shared SQLite table if it does not exist."""
+        conn = sqlite3.connect(self.shared_path, timeout=2.0)
+        try:
+            with conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("CREATE TABLE IF NOT EXISTS admission_buckets (key TEXT PRIMARY KEY, state TEXT NOT NULL)")
+        finally:
+            conn.close()
+    
+    @contextmanager
+    def _state_for_update(self) -> Iterator[Dict[str, Any]]:
+        conn = None
+        try:
+            conn = sqlite3.connect(self.shared_path, timeout=2.0, isolation_level=None)
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT state FROM admission_buckets WHERE key = ?", (self.key,)).fetchone()
+        except sqlite3.Error as e:
+            if conn is not None:
+                conn.close()
+            logger.warning(f"Shared admission buckets unavailable, using this worker's own: {e}")
+            with super()._state_for_update() as state:
+                yield state
+            return
+        
+        try:
+            state = json.loads(row[0]) if row else self._full_state()
+            yield state
+            conn.execute("INSERT OR REPLACE INTO admission_buckets (key, state) VALUES (?, ?)",
+                         (self.key, json.dumps(state)))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+
+class _Waiter:
+    """A call waiting for quota, ordered by priority and then by its user's fair share."""
+    
+    __slots__ = ("sort_key", "priority", "user", "costs", "deadline", "rejection")
+    
+    def __init__(self, sort_key: Tuple, priority: str, user: str, costs: Dict[str, float], deadline: float):
+        self.sort_key = sort_key
+        self.priority = priority
+        self.user = user
+        self.costs = costs
+        self.deadline = deadline
+        self.rejection: Optional[AdmissionRejectedError] = None
+    
+    def __lt__(self, other: "_Waiter") -> bool:
+        return self.sort_key < other.sort_key
+
+
+class AdmissionController:
+    """Admits Azure OpenAI calls against the deployment's RPM/TPM quota.
+    
+    Calls queue in a bounded priority queue: interactive turns ahead of batch
+    and eval traffic, and within a class, users take turns (start-time fair
+    queueing weighted by each call's share of the quota), so one heavy user
+    cannot starve the others. Batch calls also leave ``batch_reserve`` of each
+    bucket untouched, which keeps headroom for interactive turns in every
+    worker. A call that cannot be admitted within its class's maximum wait is
+    rejected with ``AdmissionRejectedError`` and a Retry-After estimate as soon
+    as the queue shows it (on arrival, or when a more deserving call overtakes
+    it), rather than holding a worker until it times out.
+    
+    The queue is per worker; with ``shared_path`` the buckets are shared by all
+    workers on the host.
+    """
+    
+    def __init__(self, rpm_limit: float = 0, tpm_limit: float = 0, burst_seconds: float = 10.0,
+                 shared_path: Optional[str] = None, key: str = "default", max_queue: int = 200,
+                 max_queue_per_user: int = 20, max_wait: Optional[Dict[str, float]] = None,
+                 batch_reserve: float = 0.2, completion_tokens: int = 400, poll_interval: float = 0.05):
+        # Shared buckets live in SQLite, whose busy timeout must not be waited out on an event loop
+        self.shared = bool(shared_path)
+        if shared_path:
+            self.buckets = SharedTokenBuckets(shared_path, key, rpm_limit, tpm_limit, burst_seconds)
+        else:
+            self.buckets = TokenBuckets(rpm_limit, tpm_limit, burst_seconds)
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user
+        self.max_wait = {"interactive": 10.0, "batch": 120.0, **(max_wait or {})}
+        self.reserves = {"interactive": 0.0, "batch": min(max(batch_reserve, 0.0), 0.9)}
+        self.completion_tokens = completion_tokens
+        self.poll_interval = poll_interval
+        
+        self._queue: List[_Waiter] = []
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._sequence = itertools.count()
+        # Start-time fair queueing: a virtual clock per class and each user's last virtual finish time
+        self._virtual_time = {priority: 0.0 for priority in PRIORITIES}
+        self._finish_times: Dict[Tuple[str, str], float] = {}
+        self._typical_costs = {"requests": 1.0, "tokens": 1000.0 + completion_tokens}
+        self._stats = {"admitted": 0, "rejected_deadline": 0, "rejected_queue_full": 0,
+                       "rejected_user_limit": 0, "rejected_evicted": 0, "throttled": 0, "wait_seconds": 0.0}
+    
+    def estimate_costs(self, params: Dict[str, Any]) -> Dict[str, float]:
+        """Quota a chat completions request is expected to use: one request plus prompt and completion tokens."""
+        prompt_chars = len(json.dumps(params.get("messages", []), default=str))
+        if params.get("tools"):
+            prompt_chars += len(json.dumps(params["tools"], default=str))
+        completion = params.get("max_tokens") or self.completion_tokens
+        return {"requests": 1.0, "tokens": float(prompt_chars // CHARS_PER_TOKEN + completion)}
+    
+    def acquire(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Block until the call may go to Azure; returns a ticket for ``settle``."""
+        waiter = self._enqueue(self.estimate_costs(params))
+        start = time.monotonic()
+        with trace_stage("admission"), self._condition:
+            try:
+                while True:
+                    delay = self._attempt(waiter)
+                    if delay is None:
+                        break
+                    self._condition.wait(delay)
+            finally:
+                self._discard(waiter)
+        return self._ticket(waiter, start)
+    
+    async def acquire_async(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Asyncio variant of ``acquire``; waiters poll instead of blocking the event loop.
+        
+        With shared buckets each attempt runs on a worker thread, since taking
+        from them is a SQLite write transaction that may wait on other workers.
+        """
+        waiter = self._enqueue(self.estimate_costs(params))
+        start = time.monotonic()
+        with trace_stage("admission"):
+            try:
+                while True:
+                    if self.shared:
+                        delay = await asyncio.to_thread(self._locked_attempt, waiter)
+                    else:
+                        delay = self._locked_attempt(waiter)
+                    if delay is None:
+                        break
+                    await asyncio.sleep(delay)
+            finally:
+                with self._lock:
+                    self._discard(waiter)
+        return self._ticket(waiter, start)
+    
+    def check(self) -> None:
+        """Raise ``AdmissionRejectedError`` if a typical call in the current class would be rejected now.
+        
+        For responses that cannot change their status once they start, like
+        streams, so they can still be turned away with a 503.
+        """
+        priority, user = _current_request.get()
+        with self._lock:
+            sort_key = self._sort_key(priority, user, peek=True)
+            error = self._admission_error(priority, user, sort_key)
+            if error is None:
+                candidate = _Waiter(sort_key, priority, user, dict(self._typical_costs), 0.0)
+                estimate = dict(self._estimated_waits([candidate]))[candidate]
+                if estimate > self.max_wait[priority]:
+                    error = self._deadline_error(priority, estimate)
+            if error is not None:
+                self._stats[f"rejected_{error.reason}"] += 1
+                raise error
+    
+    def charge(self, ticket: Dict[str, Any]) -> None:
+        """Draw a retried or hedged attempt of an admitted call from the quota, without queueing it again."""
+        self.buckets.adjust({name: -cost for name, cost in ticket["costs"].items()})
+    
+    def settle(self, ticket: Dict[str, Any], usage: Dict[str, int]) -> None:
+        """Reconcile the estimated token cost with the usage Azure reported."""
+        if "tokens" not in self.buckets.rates:
+            return
+        actual = usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0)
+        self.buckets.adjust({"tokens": ticket["costs"]["tokens"] - actual})
+    
+    def throttled(self, retry_after: Optional[float]) -> None:
+        """Azure answered 429: hold every queued call until its Retry-After has passed."""
+        with self._lock:
+            self._stats["throttled"] += 1
+        self.buckets.pause(retry_after if retry_after is not None else 1.0)
+    
+    def _enqueue(self, costs: Dict[str, float]) -> _Waiter:
+        priority, user = _current_request.get()
+        with self._lock:
+            sort_key = self._sort_key(priority, user)
+            error = self._admission_error(priority, user, sort_key)
+            if error is not None:
+                self._stats[f"rejected_{error.reason}"] += 1
+                raise error
+            if len(self._queue) >= self.max_queue:
+                # A full queue makes room for a more urgent call by dropping its least urgent one
+                worst = max(self._queue)
+                self._reject(worst, AdmissionRejectedError("Dropped from the admission queue for a more urgent "
+                                                           "request", self._drain_seconds(), reason="evicted"))
+                self._queue.remove(worst)
+                heapq.heapify(self._queue)
+                self._condition.notify_all()
+            
+            waiter = _Waiter(sort_key, priority, user, costs, time.monotonic() + self.max_wait[priority])
+            heapq.heappush(self._queue, waiter)
+            # Fair queueing lets a newcomer overtake queued calls; turn away any that can no longer make it in time
+            now = time.monotonic()
+            for queued, estimate in self._estimated_waits():
+                if now + estimate > queued.deadline:
+                    self._reject(queued, self._deadline_error(queued.priority, estimate))
+            if waiter.rejection is not None:
+                self._queue.remove(waiter)
+                heapq.heapify(self._queue)
+                raise waiter.rejection
+            
+            self._finish_times[(priority, user)] = sort_key[1] + self._weight(costs)
+            return waiter
+    
+    def _sort_key(self, priority: str, user: str, peek: bool = False) -> Tuple:
+        start = max(self._virtual_time[priority], self._finish_times.get((priority, user), 0.0))
+        return PRIORITIES.index(priority), start, -1 if peek else next(self._sequence)
+    
+    def _weight(self, costs: Dict[str, float]) -> float:
+        """Seconds of quota a call uses, so users share the quota rather than the request count."""
+        return max([costs.get(name, 0.0) / rate for name, rate in self.buckets.rates.items()] or [1.0])
+    
+    def _admission_error(self, priority: str, user: str, sort_key: Tuple) -> Optional[AdmissionRejectedError]:
+        """Why a call would be turned away before queueing, if it would."""
+        if sum(1 for waiter in self._queue if waiter.user == user) >= self.max_queue_per_user:
+            return AdmissionRejectedError(f"Too many requests queued for {user}", self._drain_seconds(),
+                                          reason="user_limit")
+        if len(self._queue) >= self.max_queue and not sort_key < max(self._queue).sort_key:
+            return AdmissionRejectedError("Admission queue is full", self._drain_seconds(), reason="queue_full")
+        return None
+    
+    def _deadline_error(self, priority: str, estimate: float) -> AdmissionRejectedError:
+        return AdmissionRejectedError(f"Quota cannot serve this {priority} request within "
+                                      f"{self.max_wait[priority]:g}s", estimate, reason="deadline")
+    
+    def _estimated_waits(self, extra: Iterable[_Waiter] = ()) -> Iterator[Tuple[_Waiter, float]]:
+        """Each queued call (and ``extra``) in admission order, with roughly how long until its quota is there."""
+        elapsed = time.time() - self.buckets.last_updated
+        owed = {}
+        for name, rate in self.buckets.rates.items():
+            capacity = self.buckets.capacities[name]
+            owed[name] = -min(capacity, self.buckets.last_levels.get(name, capacity) + elapsed * rate)
+        for waiter in sorted([*self._queue, *extra]):
+            if waiter.rejection is not None:
+                continue
+            estimate = 0.0
+            for name, rate in self.buckets.rates.items():
+                owed[name] += waiter.costs.get(name, 0.0)
+                reserve = self.buckets.capacities[name] * self.reserves[waiter.priority]
+                estimate = max(estimate, (owed[name] + reserve) / rate)
+            yield waiter, estimate
+    
+    def _locked_attempt(self, waiter: _Waiter) -> Optional[float]:
+        with self._lock:
+            return self._attempt(waiter)
+    
+    def _attempt(self, waiter: _Waiter) -> Optional[float]:
+        """One admission attempt (lock held): None once admitted, else how long to wait before retrying."""
+        if waiter.rejection is not None:
+            raise waiter.rejection
+        now = time.monotonic()
+        if self._queue[0] is not waiter:
+            if now >= waiter.deadline:
+                self._stats["rejected_deadline"] += 1
+                raise self._deadline_error(waiter.priority, self._drain_seconds())
+            return min(self.poll_interval, waiter.deadline - now)
+        
+        wait = self.buckets.take(waiter.costs, self.reserves[waiter.priority])
+        if wait == 0.0:
+            heapq.heappop(self._queue)
+            self._admitted(waiter)
+            return None
+        if now + wait > waiter.deadline:
+            self._stats["rejected_deadline"] += 1
+            raise self._deadline_error(waiter.priority, wait)
+        return min(wait, self.poll_interval * 4)
+    
+    def _admitted(self, waiter: _Waiter) -> None:
+        self._stats["admitted"] += 1
+        self._virtual_time[waiter.priority] = max(self._virtual_time[waiter.priority], waiter.sort_key[1])
+        for name, cost in waiter.costs.items():
+            self._typical_costs[name] = 0.9 * self._typical_costs.get(name, cost) + 0.1 * cost
+        if len(self._finish_times) > 10000:
+            self._finish_times = {key: finish for key, finish in self._finish_times.items()
+                                  if finish > self._virtual_time[key[0]]}
+        self._condition.notify_all()
+    
+    def _discard(self, waiter: _Waiter) -> None:
+        """Remove a waiter that gave up, was rejected or was cancelled (lock held)."""
+        if waiter in self._queue:
+            self._queue.remove(waiter)
+            heapq.heapify(self._queue)
+            self._condition.notify_all()
+    
+    def _reject(self, waiter: _Waiter, error: AdmissionRejectedError) -> None:
+        """Turn away a queued call; its own thread or task raises ``error`` on its next attempt."""
+        self._stats[f"rejected_{error.reason}"] += 1
+        waiter.rejection = error
+    
+    def _drain_seconds(self) -> float:
+        """Roughly how long the queued calls will take to clear, as a Retry-After hint."""
+        drain = 1.0
+        for name, rate in self.buckets.rates.items():
+            drain = max(drain, sum(waiter.costs.get(name, 0.0) for waiter in self._queue) / rate)
+        return drain
+    
+    def _ticket(self, waiter: _Waiter, start: float) -> Dict[str, Any]:
+        waited = time.monotonic() - start
+        with self._lock:
+            self._stats["wait_seconds"] += waited
+        return {"costs": waiter.costs, "priority": waiter.priority, "waited": waited}
+    
+    def stats(self) -> Dict[str, Any]:
+        """Admissions, rejections by reason, queue depth by class and the current bucket levels."""
+        with self._lock:
+            stats = dict(self._stats)
+            queued = {priority: sum(1 for waiter in self._queue if waiter.priority == priority)
+                      for priority in PRIORITIES}
+        stats["mean_wait_seconds"] = round(stats.pop("wait_seconds") / stats["admitted"], 4) \
+            if stats["admitted"] else None
+        stats["queued"] = queued
+        stats["levels"] = self.buckets.levels()
+        stats["limits_per_minute"] = {name: round(rate * 60) for name, rate in self.buckets.rates.items()}
+        stats["shared"] = isinstance(self.buckets, SharedTokenBuckets)
+        return stats
+
+
+def retry_after_header(seconds: float) -> str:
+    """Whole seconds for a Retry-After header, at least 1."""
+    return str(max(1, math.ceil(seconds)))
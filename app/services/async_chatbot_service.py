@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import time
+from typing import List, Dict, Optional, AsyncIterator, Tuple
+from app.services.async_openai_service import AsyncOpenAIService
+from app.services.chatbot_service import ChatbotService
+from app.services.model_tiering import STRONG
+from app.services.tracing import trace_stage
+from app.utils.exceptions import AdmissionRejectedError, ChatbotServiceError
+
+logger = logging.getLogger(__name__)
+
+class AsyncChatbotService(ChatbotService):
+    """Asyncio variant of ChatbotService for the ASGI entry point.
+    
+    Prompt building, the UNIX prerequisite check, caching, context trimming and
+    tool execution are shared with ChatbotService; only the calls that wait on
+    Azure are awaited. A response cache with a shared SQLite tier is read and
+    written on worker threads, so its busy timeout never stalls the event loop.
+    """
+    
+    openai_service: AsyncOpenAIService
+    
+    async def process_chat(self, chat_history: List[Dict], use_cache: bool = True,
+                           conversation_id: Optional[str] = None) -> str:
+        """Process chat interaction and return response.
+        
+        A failure is recorded and then raised as ``ChatbotServiceError`` carrying
+        the message to show the user.
+        """
+        with self._transcript_turn(chat_history, conversation_id) as turn:
+            try:
+                turn["answer"] = await self.respond(chat_history, use_cache, conversation_id)
+            except AdmissionRejectedError as e:
+                # The route turns this into a 503 with Retry-After
+                turn.update(status="rejected", error=str(e))
+                raise
+            except Exception as e:
+                logger.error(f"Error in chat processing: {e}")
+                turn.update(status="error", error=f"{type(e).__name__}: {e}",
+                            answer="I am currently experiencing technical difficulties. Please try again later.")
+                # Raised rather than returned so the caller can tell the answer is not a real turn
+                raise ChatbotServiceError(turn["answer"]) from e
+            return turn["answer"]
+    
+    async def respond(self, chat_history: List[Dict], use_cache: bool = True,
+                      conversation_id: Optional[str] = None) -> str:
+        """Answer a conversation like ``process_chat``, but let errors propagate to the caller."""
+        self.refresh_if_stale()
+        unix_check_result = self._check_unix_prerequisite(chat_history, conversation_id)
+        if unix_check_result:
+            return unix_check_result
+        
+        routed_response = self._route_locally(chat_history)
+        if routed_response:
+            return routed_response
+        
+        cache_key = self._get_cache_key(chat_history, use_cache)
+        cached_response = await self._cached_response_async(cache_key)
+        if cached_response is not None:
+            return cached_response
+        
+        start = time.perf_counter()
+        response_content = await self._generate_response(chat_history, conversation_id)
+        self._record_llm_latency(start)
+        if not response_content:
+            return "I couldn't generate a response. Please try again."
+        
+        if cache_key:
+            await self._store_response_async(cache_key, response_content)
+        return response_content
+    
+    async def _cached_response_async(self, cache_key: Optional[str]) -> Optional[str]:
+        if cache_key and self.response_cache.shared_path:
+            return await asyncio.to_thread(self._cached_response, cache_key)
+        return self._cached_response(cache_key)
+    
+    async def _store_response_async(self, cache_key: str, response: str) -> None:
+        if self.response_cache.shared_path:
+            await asyncio.to_thread(self.response_cache.set, cache_key, response)
+        else:
+            self.response_cache.set(cache_key, response)
+    
+    async def _generate_response(self, chat_history: List[Dict],
+                                 conversation_id: Optional[str] = None) -> Optional[str]:
+        """Run the completion (and any tool round trip) for a conversation."""
+        messages = self._build_messages(chat_history, conversation_id)
+        
+        with trace_stage("completion"):
+            response = await self._chat_completion(
+                self._first_tier(chat_history),
+                messages=messages,
+                tools=self.available_tools,
+                tool_choice="auto"
+            )
+        
+        if response.get("tool_calls"):
+            return await self._handle_tool_calls(messages, response["tool_calls"],
+                                                 self.tool_memos.get(conversation_id))
+        
+        return response.get("content")
+    
+    async def _handle_tool_calls(self, messages: List[Dict], tool_calls: List[Dict],
+                                 memo: Optional[Dict] = None) -> str:
+        """Handle AI tool function calls, letting the model follow up for a bounded number of rounds."""
+        memo = memo if memo is not None else {}
+        round_number = 0
+        while True:
+            round_number += 1
+            tool_results = await self._execute_tool_calls_async(messages, tool_calls, memo)
+            direct_answer = self._render_direct_answer(tool_results)
+            if direct_answer:
+                return direct_answer
+            
+            with trace_stage("follow_up_completion"):
+                response = await self._chat_completion(
+                    self._follow_up_tier(tool_results, round_number),
+                    messages=messages,
+                    **self._follow_up_params(round_number)
+                )
+            if not response.get("tool_calls"):
+                return response.get("content", "I encountered an issue generating a response.")
+            tool_calls = response["tool_calls"]
+    
+    async def _chat_completion(self, tier: Optional[str], **params) -> Dict:
+        """One completion on ``tier``, redone on the strong tier when the fast answer does not hold up."""
+        response = await self.openai_service.chat_completion(tier=tier, **params)
+        if self._escalation_reason(tier, response):
+            response = await self.openai_service.chat_completion(tier=STRONG, **params)
+        return response
+    
+    async def _chat_completion_stream(self, tier: Optional[str], **params) -> AsyncIterator[Dict]:
+        """Stream one completion on ``tier``; see ``ChatbotService._chat_completion_stream``."""
+        streamed_text = False
+        async for event in self.openai_service.chat_completion_stream(tier=tier, **params):
+            if event.get("tool_calls") and not streamed_text and self._escalation_reason(tier, event):
+                async for strong_event in self.openai_service.chat_completion_stream(tier=STRONG, **params):
+                    yield strong_event
+                return
+            streamed_text = streamed_text or bool(event.get("content"))
+            yield event
+    
+    async def _execute_tool_calls_async(self, messages: List[Dict], tool_calls: List[Dict],
+                                        memo: Dict) -> List[Tuple[str, Dict]]:
+        """Run the requested tools concurrently off the event loop and append their results."""
+        with trace_stage("tools"):
+            results = await self.tool_executor.run_async(tool_calls, memo)
+        return self._append_tool_results(messages, tool_calls, results)
+    
+    async def process_chat_stream(self, chat_history: List[Dict], use_cache: bool = True,
+                                  conversation_id: Optional[str] = None) -> AsyncIterator[str]:
+        """Process chat interaction and yield the response text as it is generated.
+        
+        A failure is recorded and then raised as ``ChatbotServiceError`` carrying
+        the message to show the user.
+        """
+        with self._transcript_turn(chat_history, conversation_id) as turn:
+            chunks = []
+            try:
+                async for chunk in self.respond_stream(chat_history, use_cache, conversation_id):
+                    chunks.append(chunk)
+                    yield chunk
+            except AdmissionRejectedError as e:
+                turn.update(status="rejected", error=str(e))
+                raise
+            except GeneratorExit:
+                # The client went away mid-answer
+                turn["status"] = "disconnected"
+                raise
+            except Exception as e:
+                logger.error(f"Error in streaming chat processing: {e}")
+                turn.update(status="error", error=f"{type(e).__name__}: {e}")
+                chunks.append("I am currently experiencing technical difficulties. Please try again later.")
+                # Raised rather than yielded so the caller can tell the answer is not a real turn
+                raise ChatbotServiceError(chunks[-1]) from e
+            finally:
+                turn["answer"] = "".join(chunks)
+    
+    async def respond_stream(self, chat_history: List[Dict], use_cache: bool = True,
+                             conversation_id: Optional[str] = None) -> AsyncIterator[str]:
+        """Stream an answer like ``process_chat_stream``, but let errors propagate to the caller."""
+        self.refresh_if_stale()
+        unix_check_result = self._check_unix_prerequisite(chat_history, conversation_id)
+        if unix_check_result:
+            yield unix_check_result
+            return
+        
+        routed_response = self._route_locally(chat_history)
+        if routed_response:
+            yield routed_response
+            return
+        
+        cache_key = self._get_cache_key(chat_history, use_cache)
+        cached_response = await self._cached_response_async(cache_key)
+        if cached_response is not None:
+            yield cached_response
+            return
+        
+        start = time.perf_counter()
+        chunks = []
+        async for chunk in self._generate_response_stream(chat_history, conversation_id):
+            chunks.append(chunk)
+            yield chunk
+        self._record_llm_latency(start)
+        
+        if not chunks:
+            yield "I couldn't generate a response. Please try again."
+        elif cache_key:
+            await self._store_response_async(cache_key, "".join(chunks))
+    
+    async def _generate_response_stream(self, chat_history: List[Dict],
+                                        conversation_id: Optional[str] = None) -> AsyncIterator[str]:
+        """Stream the completion (and any tool round trip) for a conversation."""
+        messages = self._build_messages(chat_history, conversation_id)
+        
+        tool_calls = None
+        with trace_stage("completion"):
+            async for event in self._chat_completion_stream(
+                self._first_tier(chat_history),
+                messages=messages,
+                tools=self.available_tools,
+                tool_choice="auto"
+            ):
+                if event.get("tool_calls"):
+                    tool_calls = event["tool_calls"]
+                elif event.get("content"):
+                    yield event["content"]
+        
+        memo = self.tool_memos.get(conversation_id)
+        round_number = 0
+        while tool_calls:
+            round_number += 1
+            tool_results = await self._execute_tool_calls_async(messages, tool_calls, memo)
+            direct_answer = self._render_direct_answer(tool_results)
+            if direct_answer:
+                yield direct_answer
+                return
+            
+            tool_calls = None
+            with trace_stage("follow_up_completion"):
+                async for event in self._chat_completion_stream(
+                    self._follow_up_tier(tool_results, round_number),
+                    messages=messages,
+                    **self._follow_up_params(round_number)
+                ):
+                    if event.get("tool_calls"):
+                        tool_calls = event["tool_calls"]
+                    elif event.get("content"):
+                        yield event["content"]
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Any, AsyncIterator, Callable
+from app.services.admission import AdmissionController
+from app.services.openai_service import OpenAIService
+from app.services.resilience import ResiliencePolicy
+from app.utils.exceptions import AdmissionRejectedError, OpenAIServiceError
+
+if TYPE_CHECKING:
+    from openai import AsyncAzureOpenAI
+
+logger = logging.getLogger(__name__)
+
+class AsyncOpenAIService(OpenAIService):
+    """Asyncio variant of OpenAIService built on AsyncAzureOpenAI.
+    
+    Completions are awaited instead of blocking a worker, so a single event loop
+    can keep many requests in flight while they wait on Azure.
+    """
+    
+    def _initialize_client(self, api_key: str, endpoint: str, api_version: str) -> "AsyncAzureOpenAI":
+        """Initialize the async Azure OpenAI client."""
+        try:
+            from openai import AsyncAzureOpenAI
+            
+            return AsyncAzureOpenAI(
+                api_key=api_key,
+                api_version=api_version,
+                azure_endpoint=self.azure_endpoint,
+                http_client=self.http_client,
+                **self._client_options()
+            )
+        except Exception as e:
+            logger.error(f"Failed to initialize async OpenAI client: {e}")
+            raise OpenAIServiceError(f"OpenAI client initialization failed: {e}")
+    
+    async def _admit(self, params: Dict[str, Any]) -> Optional[Dict]:
+        admission = self._admission_for(params)
+        return await admission.acquire_async(params) if admission else None
+    
+    @staticmethod
+    async def _off_loop(admission: Optional[AdmissionController], function: Callable, *args) -> Any:
+        """Call ``function``, on a worker thread when it may write ``admission``'s shared SQLite buckets."""
+        if admission is not None and admission.shared:
+            return await asyncio.to_thread(function, *args)
+        return function(*args)
+    
+    async def _send(self, params: Dict[str, Any]):
+        try:
+            return await self.client.chat.completions.create(**params)
+        except Exception as e:
+            admission = self._admission_for(params)
+            if admission and getattr(e, "status_code", None) == 429:
+                await self._off_loop(admission, admission.throttled, ResiliencePolicy.retry_after(e))
+            raise
+    
+    def _attempts(self, params: Dict[str, Any], ticket: Optional[Dict], send):
+        """See ``OpenAIService._attempts``; the extra charge is awaited like the call itself."""
+        attempts = []
+        
+        async def attempt():
+            if attempts and ticket is not None:
+                admission = self._admission_for(params)
+                await self._off_loop(admission, admission.charge, ticket)
+            attempts.append(None)
+            return await send(params)
+        return attempt
+    
+    async def _record_usage_async(self, params: Dict[str, Any], usage, latency_seconds: float,
+                                  ticket: Optional[Dict]) -> None:
+        # Settling the ticket writes the admission buckets
+        await self._off_loop(self._admission_for(params) if ticket is not None else None,
+                             self._record_usage, params, usage, latency_seconds, ticket)
+    
+    async def _create(self, params: Dict[str, Any], hedge: bool = True, ticket: Optional[Dict] = None):
+        """Call the chat completions API, through the resilience policy when configured."""
+        if not self.resilience:
+            return await self._send(params)
+        return await self.resilience.call_async(self._attempts(params, ticket, self._send), hedge=hedge)
+    
+    async def _complete(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        ticket = await self._admit(params)
+        start = time.perf_counter()
+        response = await self._create(params, ticket=ticket)
+        await self._record_usage_async(params, getattr(response, "usage", None), time.perf_counter() - start, ticket)
+        return self._parse_response(response)
+    
+    async def chat_completion(self, messages: List[Dict], tools: Optional[List] = None,
+                              tool_choice: Optional[str] = None, temperature: float = 0.7,
+                              tier: Optional[str] = None) -> Dict[str, Any]:
+        """Generate chat completion on the deployment of ``tier`` (the default deployment if None)."""
+        try:
+            params = self._build_params(messages, tools, tool_choice, temperature, tier=tier)
+            if self.single_flight:
+                key = self.single_flight.make_key(self._flight_namespace(), params)
+                return await self.single_flight.run_async(key, lambda: self._complete(params))
+            return await self._complete(params)
+        
+        except AdmissionRejectedError:
+            raise
+        except Exception as e:
+            logger.error(f"Error in chat completion: {e}")
+            raise OpenAIServiceError(f"Chat completion failed: {e}")
+    
+    async def chat_completion_stream(self, messages: List[Dict], tools: Optional[List] = None,
+                                     tool_choice: Optional[str] = None, temperature: float = 0.7,
+                                     tier: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Generate a streaming chat completion; see ``OpenAIService.chat_completion_stream``."""
+        try:
+            params = self._build_params(messages, tools, tool_choice, temperature, stream=True, tier=tier)
+            ticket = await self._admit(params)
+            start = time.perf_counter()
+            stream = await self._create(params, hedge=False, ticket=ticket)
+            tool_calls: Dict[int, Dict] = {}
+            usage = None
+            
+            async for chunk in stream:
+                if getattr(chunk, "usage", None):
+                    usage = chunk.usage
+                content = self._parse_stream_chunk(chunk, tool_calls)
+                if content:
+                    yield {"content": content}
+            await self._record_usage_async(params, usage, time.perf_counter() - start, ticket)
+            
+            if tool_calls:
+                yield {"tool_calls": [tool_calls[index] for index in sorted(tool_calls)]}
+        
+        except AdmissionRejectedError:
+            raise
+        except Exception as e:
+            logger.error(f"Error in streaming chat completion: {e}")
+            raise OpenAIServiceError(f"Streaming chat completion failed: {e}")
@@ -0,0 +1,221 @@
+import argparse
+import json
+import logging
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.services.admission import request_class
+from app.services.chatbot_service import ChatbotService
+from app.services.tracing import MetricsRegistry, end_trace, start_trace
+from app.utils.exceptions import AdmissionRejectedError
+
+logger = logging.getLogger(__name__)
+
+# Fields holding a single user turn, for records without a "messages" history
+TEXT_FIELDS = ("message", "content", "text", "title", "body")
+ID_FIELDS = ("id", "request_id", "conversation_id")
+
+
+def parse_conversation(record: Dict, index: int) -> Tuple[str, List[Dict]]:
+    """Return ``(item id, chat history)`` for one saved conversation.
+    
+    A record either carries a ``messages`` history ending in the user turn to
+    answer, or a single user turn in one of ``TEXT_FIELDS`` (so backlog-style
+    ``{"request_id", "title", "body"}`` lines work as they are).
+    """
+    if not isinstance(record, dict):
+        raise ValueError("Each conversation must be a JSON object")
+    item_id = str(next((record[field] for field in ID_FIELDS if record.get(field) is not None), index))
+    
+    messages = record.get("messages")
+    if messages is not None:
+        if not isinstance(messages, list) or not messages:
+            raise ValueError("'messages' must be a non-empty list")
+        return item_id, messages
+    
+    text = next((record[field] for field in TEXT_FIELDS if isinstance(record.get(field), str) and record[field].strip()),
+                None)
+    if text is None:
+        raise ValueError(f"Conversation needs 'messages' or one of {', '.join(TEXT_FIELDS)}")
+    return item_id, [{"role": "user", "content": text}]
+
+
+class BatchRunner:
+    """Answers many saved conversations through ChatbotService with bounded concurrency.
+    
+    At most ``max_concurrency`` conversations run at once (callers may ask for
+    fewer) and only twice that many are read ahead, so long inputs run in
+    constant memory. Results are yielded as they complete, each carrying its
+    input ``index``, the reply or error, the wall time and the per-stage
+    timings, tokens and tools of that conversation. Azure calls queue for quota
+    as batch traffic on behalf of ``user``, behind interactive chat.
+    """
+    
+    def __init__(self, chatbot_service: ChatbotService, max_concurrency: int = 8,
+                 metrics: Optional[MetricsRegistry] = None):
+        self.chatbot_service = chatbot_service
+        self.max_concurrency = max(1, max_concurrency)
+        self.metrics = metrics
+    
+    def run(self, records: Iterable[Dict], use_cache: bool = False,
+            concurrency: Optional[int] = None, user: str = "batch") -> Iterator[Dict]:
+        """Yield one result per record, in completion order, running at most ``concurrency`` at once."""
+        concurrency = max(1, min(concurrency or self.max_concurrency, self.max_concurrency))
+        executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch")
+        pending = set()
+        try:
+            for index, record in enumerate(records):
+                pending.add(executor.submit(self._run_item, index, record, use_cache, user))
+                if len(pending) >= 2 * concurrency:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        finally:
+            # A client that disconnects mid-batch should not keep the queue running
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _run_item(self, index: int, record: Dict, use_cache: bool, user: str) -> Dict:
+        result = {"index": index}
+        try:
+            result["id"], chat_history = parse_conversation(record, index)
+        except ValueError as e:
+            result.update({"id": str(index), "status": "invalid", "error": str(e), "duration_ms": 0.0})
+            return result
+        
+        trace = start_trace("/api/chat/batch")
+        try:
+            with request_class("batch", user):
+                result["response"] = self.chatbot_service.respond(chat_history, use_cache=use_cache)
+            result["status"] = "ok"
+        except AdmissionRejectedError as e:
+            result["status"] = "rejected"
+            result["error"] = str(e)
+            result["retry_after"] = round(e.retry_after, 1)
+        except Exception as e:
+            logger.warning(f"Batch item {result['id']} failed: {e}")
+            result["status"] = "error"
+            result["error"] = f"{type(e).__name__}: {e}"
+        finally:
+            end_trace()
+        
+        result["duration_ms"] = round(trace.elapsed() * 1000, 1)
+        result["stages_ms"] = {name: round(seconds * 1000, 1) for name, seconds in trace.stages.items()}
+        if trace.tokens:
+            tokens: Dict[str, int] = {}
+            for (_, kind), count in trace.tokens.items():
+                tokens[kind] = tokens.get(kind, 0) + count
+            result["tokens"] = tokens
+        if trace.tools:
+            result["tools"] = trace.tools
+        if trace.context:
+            result["context"] = trace.context
+        if self.metrics:
+            self.metrics.observe(trace, {"ok": 200, "rejected": 503}.get(result["status"], 500))
+        return result
+
+
+class BatchSummary:
+    """Running totals for a batch, reported after the last result."""
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations: List[float] = []
+        self.statuses: Dict[str, int] = {}
+    
+    def add(self, result: Dict) -> Dict:
+        self.statuses[result["status"]] = self.statuses.get(result["status"], 0) + 1
+        if result["status"] == "ok":
+            self.durations.append(result["duration_ms"])
+        return result
+    
+    def summary(self) -> Dict:
+        wall = time.perf_counter() - self.started
+        ordered = sorted(self.durations)
+        
+        def percentile(fraction: float) -> Optional[float]:
+            return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else None
+        
+        total = sum(self.statuses.values())
+        return {
+            "items": total,
+            "statuses": self.statuses,
+            "wall_seconds": round(wall, 3),
+            "items_per_second": round(total / wall, 2) if wall > 0 else None,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "max_ms": ordered[-1] if ordered else None
+        }
+
+
+def _read_records(path: str) -> Iterator[Dict]:
+    """Read conversations from JSON lines (or a JSON array), ``-`` for stdin."""
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        lines = iter(stream)
+        for line in lines:
+            if not line.strip():
+                continue
+            if line.lstrip().startswith("["):
+                yield from json.loads(line + "".join(lines))
+                return
+            yield json.loads(line)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def _run_remote(url: str, path: str, concurrency: int, use_cache: bool, output) -> None:
+    """Stream the conversations to a running server's /api/chat/batch (BATCH_ENABLED=true) and copy its NDJSON back."""
+    import httpx
+    
+    def body() -> Iterator[bytes]:
+        for record in _read_records(path):
+            yield (json.dumps(record) + "\n").encode("utf-8")
+    
+    params = {"concurrency": concurrency, "cache": str(use_cache).lower()}
+    with httpx.stream("POST", f"{url.rstrip('/')}/api/chat/batch", params=params, content=body(),
+                      headers={"Content-Type": "application/x-ndjson"}, timeout=None) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if line:
+                output.write(line + "\n")
+                output.flush()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Answer saved conversations in bulk and write NDJSON results.")
+    parser.add_argument("conversations", help="JSON-lines file (or JSON array) of conversations, - for stdin")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--cache", action="store_true", help="allow answers from the response cache")
+    parser.add_argument("--output", help="results file (default: stdout)")
+    parser.add_argument("--url", help="send the batch to a running server instead of answering in-process")
+    args = parser.parse_args(argv)
+    
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        if args.url:
+            _run_remote(args.url, args.conversations, args.concurrency, args.cache, output)
+            return
+        
+        from app import create_app
+        chatbot_service = create_app().extensions["chatbot_services"]["chatbot_service"]
+        summary = BatchSummary()
+        runner = BatchRunner(chatbot_service, args.concurrency)
+        for result in runner.run(_read_records(args.conversations), use_cache=args.cache):
+            output.write(json.dumps(summary.add(result)) + "\n")
+            output.flush()
+        output.write(json.dumps({"summary": summary.summary()}) + "\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    # python -m app.services.batch_runner conversations.jsonl --concurrency 16 --output results.ndjson
+    main()
@@ -1,26 +1,118 @@
+import hashlib
 import json
 import logging
-from typing import List, Dict, Optional
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Iterator, Tuple
 from app.models.knowledge_base import KnowledgeBase, RepositoryAccess
+from app.services.context_manager import ContextManager
+from app.services.intent_router import IntentRouter
+from app.services.knowledge_index import KnowledgeIndex
+from app.services.model_tiering import FAST, STRONG, TierPolicy
+from app.services.onboarding import UnixPrerequisiteChecker
 from app.services.openai_service import OpenAIService
-from app.utils.exceptions import ChatbotServiceError
+from app.services.prompt_payload import PromptPayload
+from app.services.response_cache import ResponseCache
+from app.services.tool_registry import Tool, ToolExecutor, ToolMemos, ToolRegistry
+from app.services.tracing import (annotate, current_trace, end_trace, record_context, record_tool_calls,
+                                  record_tools, start_trace, trace_stage)
+from app.services.transcript_store import TranscriptStore
+from app.utils.exceptions import AdmissionRejectedError, ChatbotServiceError
 
 logger = logging.getLogger(__name__)
 
+# Above this many repositories the prompt and tool schema describe the IDs instead of listing them
+REPOSITORY_LIST_LIMIT = 50
+GREETING_RESPONSE = "Hello! How can I help you with access management today?"
+THANKS_RESPONSE = "You're welcome! Is there anything else I can help you with?"
+
 class ChatbotService:
     """Service for managing chatbot interactions and business logic."""
     
-    def __init__(self, openai_service: OpenAIService):
+    def __init__(self, openai_service: OpenAIService, direct_answer_tools: Optional[List[str]] = None,
+                 response_cache: Optional[ResponseCache] = None,
+                 context_manager: Optional[ContextManager] = None,
+                 max_tool_rounds: int = 3, tool_workers: int = 8, tool_memo_conversations: int = 1000,
+                 knowledge_index: Optional[KnowledgeIndex] = None, search_top_k: int = 3,
+                 search_direct_min_score: float = 2.0, search_direct_min_margin: float = 1.5,
+                 intent_router: Optional[IntentRouter] = None,
+                 repository_access: Optional[RepositoryAccess] = None,
+                 transcript_store: Optional[TranscriptStore] = None,
+                 tier_policy: Optional[TierPolicy] = None):
         self.openai_service = openai_service
+        self.direct_answer_tools = set(direct_answer_tools or [])
+        self.response_cache = response_cache
+        self.context_manager = context_manager
+        self.max_tool_rounds = max(1, max_tool_rounds)
+        self.intent_router = intent_router
         self.knowledge_base = KnowledgeBase()
-        self.repository_access = RepositoryAccess()
-        self.system_prompt = self._build_system_prompt()
-        self.available_tools = self._build_tools()
+        # With an index the model searches the knowledge base instead of being shown every key
+        self.knowledge_index = knowledge_index
+        self.search_top_k = search_top_k
+        self.search_direct_min_score = search_direct_min_score
+        self.search_direct_min_margin = search_direct_min_margin
+        self.repository_access = repository_access or RepositoryAccess()
+        self.transcript_store = transcript_store
+        # Picks the fast or strong deployment per completion; without it every call uses the default deployment
+        self.tier_policy = tier_policy
+        self._reload_lock = threading.Lock()
+        self.unix_checker = UnixPrerequisiteChecker()
+        self.tool_executor = ToolExecutor(ToolRegistry(), max_workers=tool_workers)
+        self.tool_memos = ToolMemos(max_conversations=tool_memo_conversations)
+        self.reload_data()
+    
+    def reload_data(self) -> None:
+        """Rebuild the prompt and tools from current data and invalidate cached responses."""
+        self.repository_version = self.repository_access.get_data_version()
+        self.tool_registry = self._build_tool_registry()
+        self.tool_executor.registry = self.tool_registry
+        # Memoized results were computed from the previous data
+        self.tool_memos.clear()
+        # Serialized once per data version so every request shares a byte-identical prefix
+        self.prompt_payload = PromptPayload(self._build_system_prompt(), self.tool_registry.schemas())
+        self.system_prompt = self.prompt_payload.system_prompt
+        self.available_tools = self.prompt_payload.tools
+        self.data_version = hashlib.sha256("|".join([
+            self.prompt_payload.fingerprint,
+            self.knowledge_index.version if self.knowledge_index else self.knowledge_base.get_data_version(),
+            self.repository_version
+        ]).encode("utf-8")).hexdigest()[:16]
+        
+        if self.response_cache:
+            self.response_cache.set_version(self.data_version)
+    
+    def refresh_if_stale(self) -> None:
+        """Rebuild the prompt and tools only when the repository data has changed since the last build."""
+        if self.repository_access.get_data_version() == self.repository_version:
+            return
+        # One request rebuilds; the others keep using the current prompt meanwhile
+        if self._reload_lock.acquire(blocking=False):
+            try:
+                if self.repository_access.get_data_version() != self.repository_version:
+                    logger.info("Repository data changed; rebuilding the prompt and tools")
+                    self.reload_data()
+            finally:
+                self._reload_lock.release()
+    
+    def _repository_summary(self) -> str:
+        """Every repository ID when there are few, otherwise a description of the ID format."""
+        repositories = self.repository_access.get_all_repositories()
+        if len(repositories) <= REPOSITORY_LIST_LIMIT:
+            return ", ".join(repositories)
+        return (f"{len(repositories)} repositories, with IDs such as {', '.join(repositories[:5])}; "
+                f"look them up with the tools rather than assuming one exists")
     
     def _build_system_prompt(self) -> str:
         """Build the system prompt for the AI assistant."""
-        available_keys = "\n".join([f"- '{key}'" for key in self.knowledge_base.get_all_keys()])
-        available_repos = ", ".join(self.repository_access.get_all_repositories())
+        available_repos = self._repository_summary()
+        if self.knowledge_index:
+            knowledge_tool = "- search_knowledge_base(query: str): Search the knowledge base articles for general Informatica information"
+            knowledge_section = f"The knowledge base holds {len(self.knowledge_index)} articles; search it rather than guessing."
+        else:
+            knowledge_tool = "- get_answer_from_knowledge_base(query_key: str): For general Informatica information"
+            available_keys = "\n".join([f"- '{key}'" for key in self.knowledge_base.get_all_keys()])
+            knowledge_section = f"Available knowledge base keys:\n{available_keys}"
         
         return f"""You are a helpful and knowledgeable Virtual Assistant.
 Your primary role is to help users understand tools like Yellowbrick, DB2, etc access requirements through natural, conversational interactions.
@@ -45,155 +137,522 @@ Your primary role is to help users understand tools like Yellowbrick, DB2, etc a
 5. **D1,D2... means Development repositories, Q1,Q2... means QA repositories, P1,P2... means Production repositories.**
 
 **Available Tools:**
-- get_answer_from_knowledge_base(query_key: str): For general Informatica information
+{knowledge_tool}
 - get_repository_access_groups(repository_id: str): For specific repository access groups
+- get_repositories_for_access_group(group_name: str): For which repositories an access group grants
 
-Available knowledge base keys:
-{available_keys}
+{knowledge_section}
 
 Available repositories: {available_repos}
 """
-    
-    def _build_tools(self) -> List[Dict]:
-        """Build tool definitions for OpenAI function calling."""
-        return [
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_answer_from_knowledge_base",
-                    "description": "Retrieves answer from internal knowledge base for Informatica access queries",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "query_key": {
-                                "type": "string",
-                                "description": f"Knowledge base key. Must be one of: {', '.join(self.knowledge_base.get_all_keys())}"
-                            }
+
+    def _build_tool_registry(self) -> ToolRegistry:
+        """Register the tools available to the model for OpenAI function calling."""
+        registry = ToolRegistry()
+        if self.knowledge_index:
+            registry.register(Tool(
+                name="search_knowledge_base",
+                handler=self._execute_knowledge_search,
+                description="Searches the internal knowledge base articles on Informatica access and returns the best matches",
+                parameters={
+                    "type": "object",
+                    "properties": {
+                        "query": {
+                            "type": "string",
+                            "description": "What to look up, in a few keywords"
                         },
-                        "required": ["query_key"]
+                        "k": {
+                            "type": "integer",
+                            "description": f"Number of articles to return (default {self.search_top_k})"
+                        }
+                    },
+                    "required": ["query"]
+                },
+                # A clear best match answers on its own, as a key lookup did
+                direct_answer_template="{results[0][answer]}",
+                direct_answer_when=self._is_clear_search_hit
+            ))
+        else:
+            registry.register(Tool(
+                name="get_answer_from_knowledge_base",
+                handler=self._execute_knowledge_base_lookup,
+                description="Retrieves answer from internal knowledge base for Informatica access queries",
+                parameters={
+                    "type": "object",
+                    "properties": {
+                        "query_key": {
+                            "type": "string",
+                            "description": f"Knowledge base key. Must be one of: {', '.join(self.knowledge_base.get_all_keys())}"
+                        }
+                    },
+                    "required": ["query_key"]
+                },
+                direct_answer_template="{answer}"
+            ))
+        registry.register(Tool(
+            name="get_repository_access_groups",
+            handler=self._execute_repository_lookup,
+            description="Retrieves the myAccess Groups for a specific repository ID",
+            parameters={
+                "type": "object",
+                "properties": {
+                    "repository_id": {
+                        "type": "string",
+                        "description": f"Repository ID. Available: {self._repository_summary()}"
                     }
-                }
+                },
+                "required": ["repository_id"]
             },
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_repository_access_groups",
-                    "description": "Retrieves the myAccess Groups for a specific repository ID",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "repository_id": {
-                                "type": "string",
-                                "description": f"Repository ID. Must be one of: {', '.join(self.repository_access.get_all_repositories())}"
-                            }
-                        },
-                        "required": ["repository_id"]
+            direct_answer_template="{answer}"
+        ))
+        registry.register(Tool(
+            name="get_repositories_for_access_group",
+            handler=self._execute_group_lookup,
+            description="Lists the repositories a given myAccess Group grants access to",
+            parameters={
+                "type": "object",
+                "properties": {
+                    "group_name": {
+                        "type": "string",
+                        "description": "The myAccess Group name, e.g. ZNA_INFA_PC_D1_RWX"
                     }
-                }
-            }
-        ]
+                },
+                "required": ["group_name"]
+            },
+            direct_answer_template="{answer}"
+        ))
+        return registry
+    
+    def process_chat(self, chat_history: List[Dict], use_cache: bool = True,
+                     conversation_id: Optional[str] = None) -> str:
+        """Process chat interaction and return response.
+        
+        A failure is recorded and then raised as ``ChatbotServiceError`` carrying
+        the message to show the user.
+        """
+        with self._transcript_turn(chat_history, conversation_id) as turn:
+            try:
+                turn["answer"] = self.respond(chat_history, use_cache, conversation_id)
+            except AdmissionRejectedError as e:
+                # The route turns this into a 503 with Retry-After
+                turn.update(status="rejected", error=str(e))
+                raise
+            except Exception as e:
+                logger.error(f"Error in chat processing: {e}")
+                turn.update(status="error", error=f"{type(e).__name__}: {e}",
+                            answer="I am currently experiencing technical difficulties. Please try again later.")
+                # Raised rather than returned so the caller can tell the answer is not a real turn
+                raise ChatbotServiceError(turn["answer"]) from e
+            return turn["answer"]
     
-    def process_chat(self, chat_history: List[Dict]) -> str:
-        """Process chat interaction and return response."""
+    @contextmanager
+    def _transcript_turn(self, chat_history: List[Dict], conversation_id: Optional[str]) -> Iterator[Dict]:
+        """Hand the turn answered in this block (``answer``, ``status``, ``error``) to the transcript store.
+        
+        The turn is recorded with the request's trace, so its timings, tokens and
+        tool calls come along; without a traced request one is started here.
+        """
+        turn = {"status": "ok"}
+        if self.transcript_store is None:
+            yield turn
+            return
+        
+        trace = current_trace()
+        own_trace = trace is None
+        if own_trace:
+            trace = start_trace("transcript")
         try:
-            unix_check_result = self._check_unix_prerequisite(chat_history)
-            if unix_check_result:
-                return unix_check_result
-            
-            messages = [{"role": "system", "content": self.system_prompt}] + chat_history
-            
-            response = self.openai_service.chat_completion(
+            yield turn
+        finally:
+            if own_trace:
+                end_trace()
+            self.transcript_store.record_turn(chat_history, turn, trace, conversation_id)
+    
+    def respond(self, chat_history: List[Dict], use_cache: bool = True,
+                conversation_id: Optional[str] = None) -> str:
+        """Answer a conversation like ``process_chat``, but let errors propagate to the caller."""
+        self.refresh_if_stale()
+        unix_check_result = self._check_unix_prerequisite(chat_history, conversation_id)
+        if unix_check_result:
+            return unix_check_result
+        
+        routed_response = self._route_locally(chat_history)
+        if routed_response:
+            return routed_response
+        
+        cache_key = self._get_cache_key(chat_history, use_cache)
+        cached_response = self._cached_response(cache_key)
+        if cached_response is not None:
+            return cached_response
+        
+        start = time.perf_counter()
+        response_content = self._generate_response(chat_history, conversation_id)
+        self._record_llm_latency(start)
+        if not response_content:
+            return "I couldn't generate a response. Please try again."
+        
+        if cache_key:
+            self.response_cache.set(cache_key, response_content)
+        return response_content
+    
+    def _generate_response(self, chat_history: List[Dict],
+                           conversation_id: Optional[str] = None) -> Optional[str]:
+        """Run the completion (and any tool round trip) for a conversation."""
+        messages = self._build_messages(chat_history, conversation_id)
+        
+        with trace_stage("completion"):
+            response = self._chat_completion(
+                self._first_tier(chat_history),
                 messages=messages, 
                 tools=self.available_tools, 
                 tool_choice="auto"
             )
-            
-            if response.get("tool_calls"):
-                return self._handle_tool_calls(messages, response["tool_calls"])
-            
-            return response.get("content", "I couldn't generate a response. Please try again.")
-            
-        except Exception as e:
-            logger.error(f"Error in chat processing: {e}")
-            return "I am currently experiencing technical difficulties. Please try again later."
+        
+        if response.get("tool_calls"):
+            return self._handle_tool_calls(messages, response["tool_calls"],
+                                           self.tool_memos.get(conversation_id))
+        
+        return response.get("content")
     
-    def _check_unix_prerequisite(self, chat_history: List[Dict]) -> Optional[str]:
-        """Check if new user has UNIX enabled."""
-        is_new_user = False
-        asked_unix = False
-        unix_answer = None
+    def process_chat_stream(self, chat_history: List[Dict], use_cache: bool = True,
+                            conversation_id: Optional[str] = None) -> Iterator[str]:
+        """Process chat interaction and yield the response text as it is generated.
+        
+        A failure is recorded and then raised as ``ChatbotServiceError`` carrying
+        the message to show the user.
+        """
+        with self._transcript_turn(chat_history, conversation_id) as turn:
+            chunks = []
+            try:
+                for chunk in self.respond_stream(chat_history, use_cache, conversation_id):
+                    chunks.append(chunk)
+                    yield chunk
+            except AdmissionRejectedError as e:
+                turn.update(status="rejected", error=str(e))
+                raise
+            except GeneratorExit:
+                # The client went away mid-answer
+                turn["status"] = "disconnected"
+                raise
+            except Exception as e:
+                logger.error(f"Error in streaming chat processing: {e}")
+                turn.update(status="error", error=f"{type(e).__name__}: {e}")
+                chunks.append("I am currently experiencing technical difficulties. Please try again later.")
+                # Raised rather than yielded so the caller can tell the answer is not a real turn
+                raise ChatbotServiceError(chunks[-1]) from e
+            finally:
+                turn["answer"] = "".join(chunks)
+    
+    def respond_stream(self, chat_history: List[Dict], use_cache: bool = True,
+                       conversation_id: Optional[str] = None) -> Iterator[str]:
+        """Stream an answer like ``process_chat_stream``, but let errors propagate to the caller."""
+        self.refresh_if_stale()
+        unix_check_result = self._check_unix_prerequisite(chat_history, conversation_id)
+        if unix_check_result:
+            yield unix_check_result
+            return
         
-        for message in chat_history:
-            content = message.get("content", "").lower()
-            role = message.get("role")
+        routed_response = self._route_locally(chat_history)
+        if routed_response:
+            yield routed_response
+            return
+        
+        cache_key = self._get_cache_key(chat_history, use_cache)
+        cached_response = self._cached_response(cache_key)
+        if cached_response is not None:
+            yield cached_response
+            return
+        
+        start = time.perf_counter()
+        chunks = []
+        for chunk in self._generate_response_stream(chat_history, conversation_id):
+            chunks.append(chunk)
+            yield chunk
+        self._record_llm_latency(start)
+        
+        if not chunks:
+            yield "I couldn't generate a response. Please try again."
+        elif cache_key:
+            self.response_cache.set(cache_key, "".join(chunks))
+    
+    def _generate_response_stream(self, chat_history: List[Dict],
+                                  conversation_id: Optional[str] = None) -> Iterator[str]:
+        """Stream the completion (and any tool round trip) for a conversation."""
+        messages = self._build_messages(chat_history, conversation_id)
+        
+        tool_calls = None
+        with trace_stage("completion"):
+            for event in self._chat_completion_stream(
+                self._first_tier(chat_history),
+                messages=messages,
+                tools=self.available_tools,
+                tool_choice="auto"
+            ):
+                if event.get("tool_calls"):
+                    tool_calls = event["tool_calls"]
+                elif event.get("content"):
+                    yield event["content"]
+        
+        memo = self.tool_memos.get(conversation_id)
+        round_number = 0
+        while tool_calls:
+            round_number += 1
+            tool_results = self._execute_tool_calls(messages, tool_calls, memo)
+            direct_answer = self._render_direct_answer(tool_results)
+            if direct_answer:
+                yield direct_answer
+                return
             
-            if role == "user" and any(phrase in content for phrase in ["new user", "i am new", "i'm new"]):
-                is_new_user = True
+            tool_calls = None
+            with trace_stage("follow_up_completion"):
+                for event in self._chat_completion_stream(
+                    self._follow_up_tier(tool_results, round_number),
+                    messages=messages,
+                    **self._follow_up_params(round_number)
+                ):
+                    if event.get("tool_calls"):
+                        tool_calls = event["tool_calls"]
+                    elif event.get("content"):
+                        yield event["content"]
+    
+    def _build_messages(self, chat_history: List[Dict], conversation_id: Optional[str] = None) -> List[Dict]:
+        """Prepend the system prompt, fitting the history into the token budget when configured."""
+        with trace_stage("build_messages"):
+            if not self.context_manager:
+                return self.prompt_payload.messages(chat_history)
             
-            if role == "assistant" and "unix enabled" in content:
-                asked_unix = True
+            messages, context = self.context_manager.build_messages(self.system_prompt, chat_history,
+                                                                    conversation_id)
+            record_context(context)
+            return messages
+    
+    def _get_cache_key(self, chat_history: List[Dict], use_cache: bool) -> Optional[str]:
+        """Return the response cache key, or None when caching does not apply."""
+        if not use_cache or not self.response_cache:
+            return None
+        return self.response_cache.make_key(chat_history)
+    
+    def _cached_response(self, cache_key: Optional[str]) -> Optional[str]:
+        if not cache_key:
+            return None
+        with trace_stage("cache_lookup"):
+            response = self.response_cache.get(cache_key)
+        if response is not None:
+            annotate(answered_by="cache")
+        return response
+    
+    def _route_locally(self, chat_history: List[Dict]) -> Optional[str]:
+        """Answer the latest turn without Azure when the intent router is confident, else None."""
+        if not self.intent_router:
+            return None
+        
+        start = time.perf_counter()
+        with trace_stage("intent_router"):
+            intent = self.intent_router.classify(chat_history)
+            response = self._answer_intent(intent) if intent else None
+        if response:
+            self.intent_router.record_routed(intent["name"], time.perf_counter() - start)
+            annotate(answered_by="local", intent=intent["name"])
+            logger.info("Answered locally: %s (confidence %.2f)", intent['name'], intent['confidence'])
+        return response
+    
+    def _answer_intent(self, intent: Dict) -> Optional[str]:
+        """Render a locally handled intent; None hands the turn to the model."""
+        if intent["name"] == "greeting":
+            return GREETING_RESPONSE
+        if intent["name"] == "thanks":
+            return THANKS_RESPONSE
+        if intent["name"] == "repository_lookup":
+            results = [self._execute_repository_lookup(repository_id)
+                       for repository_id in intent["slots"]["repository_ids"]]
+            record_tool_calls({"name": "get_repository_access_groups", "arguments": {"repository_id": repository_id},
+                               "status": result["status"]}
+                              for repository_id, result in zip(intent["slots"]["repository_ids"], results))
+            # An unknown repository ID is left to the model to clarify
+            if all(result["status"] == "success" for result in results):
+                return "\n\n".join(result["answer"] for result in results)
+        return None
+    
+    def _record_llm_latency(self, start: float) -> None:
+        if self.intent_router:
+            self.intent_router.record_llm(time.perf_counter() - start)
+    
+    def _check_unix_prerequisite(self, chat_history: List[Dict],
+                                 conversation_id: Optional[str] = None) -> Optional[str]:
+        """Check if new user has UNIX enabled."""
+        with trace_stage("unix_check"):
+            result = self.unix_checker.check(chat_history, conversation_id)
+        if result:
+            annotate(answered_by="unix_check")
+        return result
+    
+    def _handle_tool_calls(self, messages: List[Dict], tool_calls: List[Dict],
+                           memo: Optional[Dict] = None) -> str:
+        """Handle AI tool function calls, letting the model follow up for a bounded number of rounds."""
+        memo = memo if memo is not None else {}
+        round_number = 0
+        while True:
+            round_number += 1
+            tool_results = self._execute_tool_calls(messages, tool_calls, memo)
+            direct_answer = self._render_direct_answer(tool_results)
+            if direct_answer:
+                return direct_answer
             
-            if asked_unix and role == "user":
-                if any(word in content for word in ["yes", "yep", "yeah", "i do", "enabled", "have unix"]):
-                    unix_answer = "yes"
-                elif any(word in content for word in ["no", "not", "don't have", "haven't", "without unix", "no unix"]):
-                    unix_answer = "no"
+            with trace_stage("follow_up_completion"):
+                response = self._chat_completion(
+                    self._follow_up_tier(tool_results, round_number),
+                    messages=messages,
+                    **self._follow_up_params(round_number)
+                )
+            if not response.get("tool_calls"):
+                return response.get("content", "I encountered an issue generating a response.")
+            tool_calls = response["tool_calls"]
+    
+    def _first_tier(self, chat_history: List[Dict]) -> Optional[str]:
+        """Tier for the completion that answers the turn or picks its tools; None without tiering."""
+        if not self.tier_policy:
+            return None
+        return self._use_tier(*self.tier_policy.first_tier(chat_history))
+    
+    def _follow_up_tier(self, tool_results: List[Tuple[str, Dict]], round_number: int) -> Optional[str]:
+        """Tier for the completion after a round of tool results; None without tiering."""
+        if not self.tier_policy:
+            return None
+        return self._use_tier(*self.tier_policy.follow_up_tier(tool_results, round_number))
+    
+    def _use_tier(self, tier: str, reason: str) -> str:
+        self.tier_policy.record_route(tier, reason)
+        annotate(tier=tier)
+        return tier
+    
+    def _escalation_reason(self, tier: Optional[str], response: Dict) -> Optional[str]:
+        if tier != FAST:
+            return None
+        reason = self.tier_policy.escalation_reason(response, self.tool_registry)
+        if reason:
+            self.tier_policy.record_escalation(reason)
+            annotate(tier=STRONG, escalated=reason)
+            logger.info("Escalating a fast-tier completion to the strong tier: %s", reason)
+        return reason
+    
+    def _chat_completion(self, tier: Optional[str], **params) -> Dict:
+        """One completion on ``tier``, redone on the strong tier when the fast answer does not hold up."""
+        response = self.openai_service.chat_completion(tier=tier, **params)
+        if self._escalation_reason(tier, response):
+            response = self.openai_service.chat_completion(tier=STRONG, **params)
+        return response
+    
+    def _chat_completion_stream(self, tier: Optional[str], **params) -> Iterator[Dict]:
+        """Stream one completion on ``tier``, redone on the strong tier when its tool calls are malformed.
         
-        if is_new_user and not asked_unix:
-            return "You're a new user. Do you have UNIX enabled on your account? (You must have UNIX enabled before proceeding with Informatica access provisioning.)"
+        Only tool calls can be checked: they arrive whole at the end of the stream,
+        while text has already reached the user by the time it could be judged.
+        """
+        streamed_text = False
+        for event in self.openai_service.chat_completion_stream(tier=tier, **params):
+            if event.get("tool_calls") and not streamed_text and self._escalation_reason(tier, event):
+                yield from self.openai_service.chat_completion_stream(tier=STRONG, **params)
+                return
+            streamed_text = streamed_text or bool(event.get("content"))
+            yield event
+    
+    def _follow_up_params(self, round_number: int) -> Dict:
+        """Offer the tools again after a tool round; on the last allowed round, forbid calling them.
         
-        if asked_unix and unix_answer == "no":
-            return ("You must first enable UNIX on your account before requesting Informatica access. "
-                   "Please visit the ServiceNow portal and request UNIX enablement. "
-                   "Once UNIX is enabled, you can return here and proceed with Informatica access.")
+        The tools are still sent with ``tool_choice="none"`` so the request keeps the
+        same cacheable prompt prefix as every other call.
+        """
+        if round_number < self.max_tool_rounds:
+            return {"tools": self.available_tools, "tool_choice": "auto"}
+        return {"tools": self.available_tools, "tool_choice": "none"}
+    
+    def _execute_tool_calls(self, messages: List[Dict], tool_calls: List[Dict],
+                            memo: Optional[Dict] = None) -> List[Tuple[str, Dict]]:
+        """Run the requested tools concurrently and append their results to the message list.
         
-        return None
+        Returns the (function name, result) pairs in call order.
+        """
+        with trace_stage("tools"):
+            results = self.tool_executor.run(tool_calls, memo if memo is not None else {})
+        return self._append_tool_results(messages, tool_calls, results)
     
-    def _handle_tool_calls(self, messages: List[Dict], tool_calls: List[Dict]) -> str:
-        """Handle AI tool function calls."""
+    @staticmethod
+    def _append_tool_results(messages: List[Dict], tool_calls: List[Dict],
+                             results: List[Dict]) -> List[Tuple[str, Dict]]:
         messages.append({"role": "assistant", "tool_calls": tool_calls})
+        tool_results = []
         
-        for tool_call in tool_calls:
-            function_name = tool_call["function"]["name"]
-            
-            try:
-                function_args = json.loads(tool_call["function"]["arguments"])
-                
-                if function_name == "get_answer_from_knowledge_base":
-                    result = self._execute_knowledge_base_lookup(**function_args)
-                elif function_name == "get_repository_access_groups":
-                    result = self._execute_repository_lookup(**function_args)
-                else:
-                    result = {"status": "error", "message": f"Unknown function: {function_name}"}
-                
-                messages.append({
-                    "role": "tool",
-                    "tool_call_id": tool_call["id"],
-                    "content": json.dumps(result)
-                })
-                
-            except json.JSONDecodeError as e:
-                logger.error(f"Error parsing tool arguments: {e}")
-                messages.append({
-                    "role": "tool",
-                    "tool_call_id": tool_call["id"],
-                    "content": json.dumps({"status": "error", "message": "Invalid arguments"})
-                })
-        
-        final_response = self.openai_service.chat_completion(messages=messages)
-        return final_response.get("content", "I encountered an issue generating a response.")
+        for tool_call, result in zip(tool_calls, results):
+            messages.append({
+                "role": "tool",
+                "tool_call_id": tool_call["id"],
+                "content": json.dumps(result)
+            })
+            tool_results.append((tool_call["function"]["name"], result))
+        
+        record_tools(name for name, _ in tool_results)
+        record_tool_calls({"name": name, "arguments": parse_arguments(tool_call), "status": result.get("status")}
+                          for tool_call, (name, result) in zip(tool_calls, tool_results))
+        return tool_results
+    
+    def _render_direct_answer(self, tool_results: List[Tuple[str, Dict]]) -> Optional[str]:
+        """Render tool results without the model when every call succeeded and is allow-listed."""
+        if not tool_results or not self.direct_answer_tools:
+            return None
+        
+        for function_name, result in tool_results:
+            tool = self.tool_registry.get(function_name)
+            if function_name not in self.direct_answer_tools or not tool or not tool.direct_answer_template:
+                return None
+            if result.get("status") != "success":
+                return None
+            if tool.direct_answer_when and not tool.direct_answer_when(result):
+                return None
+        
+        logger.info("Direct answer from tools: %s", [name for name, _ in tool_results])
+        annotate(answered_by="tools")
+        # Identical calls (e.g. the same repository asked twice) are rendered once
+        rendered = [
+            self.tool_registry.get(function_name).direct_answer_template.format(**result)
+            for function_name, result in tool_results
+        ]
+        return "\n\n".join(dict.fromkeys(rendered))
     
     def _execute_knowledge_base_lookup(self, query_key: str) -> Dict:
         """Execute knowledge base lookup."""
-        logger.info(f"Knowledge base lookup: {query_key}")
+        # Lazy %-style arguments: the text is built on the log writer thread, and only if the record is kept
+        logger.info("Knowledge base lookup: %s", query_key)
         answer = self.knowledge_base.get_answer(query_key)
         if answer:
             return {"status": "success", "answer": answer}
         return {"status": "error", "message": f"Key '{query_key}' not found"}
     
+    def _execute_knowledge_search(self, query: str, k: Optional[int] = None) -> Dict:
+        """Execute knowledge base search."""
+        logger.info("Knowledge base search: %s", query)
+        results = self.knowledge_index.search(query, max(1, min(k or self.search_top_k, 10)))
+        if results:
+            return {"status": "success", "results": [
+                {"id": result["id"], "title": result["title"], "answer": result["text"], "score": result["score"]}
+                for result in results
+            ]}
+        return {"status": "error", "message": f"No knowledge base articles match '{query}'"}
+    
+    def _is_clear_search_hit(self, result: Dict) -> bool:
+        """Whether the top search hit is strong enough, and far enough ahead of the next, to answer alone.
+        
+        BM25 ranks anything sharing a word with the query ("vpn access" matches
+        every article mentioning access), so weak or close calls go to the model
+        with all the hits instead.
+        """
+        hits = result["results"]
+        if hits[0]["score"] < self.search_direct_min_score:
+            return False
+        return len(hits) == 1 or hits[0]["score"] >= hits[1]["score"] * self.search_direct_min_margin
+    
     def _execute_repository_lookup(self, repository_id: str) -> Dict:
         """Execute repository access group lookup."""
-        logger.info(f"Repository lookup: {repository_id}")
+        logger.info("Repository lookup: %s", repository_id)
         groups = self.repository_access.get_access_groups(repository_id)
         if groups:
             formatted_groups = "\n".join([f"• {group}" for group in groups])
@@ -201,4 +660,28 @@ Available repositories: {available_repos}
                 "status": "success", 
                 "answer": f"The myAccess Groups for repository {repository_id.upper()} are:\n{formatted_groups}"
             }
+        suggestions = self.repository_access.find_repositories(repository_id, limit=5)
+        if suggestions:
+            return {"status": "error", "message": f"Repository '{repository_id}' not found",
+                    "did_you_mean": suggestions}
         return {"status": "error", "message": f"Repository '{repository_id}' not found"}
+    
+    def _execute_group_lookup(self, group_name: str) -> Dict:
+        """Execute reverse lookup from an access group to its repositories."""
+        logger.info("Access group lookup: %s", group_name)
+        repositories = self.repository_access.get_repositories_for_group(group_name)
+        if repositories:
+            return {
+                "status": "success",
+                "answer": f"The myAccess Group {group_name} grants access to: {', '.join(repositories)}"
+            }
+        return {"status": "error", "message": f"Access group '{group_name}' not found"}
+
+
+def parse_arguments(tool_call: Dict):
+    """A tool call's arguments as sent by the model: parsed when they are valid JSON, else the raw text."""
+    arguments = tool_call["function"].get("arguments") or "{}"
+    try:
+        return json.loads(arguments)
+    except ValueError:
+        return arguments
@@ -0,0 +1,223 @@
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional dependency
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Rough per-message framing overhead used by the chat completions format
+MESSAGE_OVERHEAD_TOKENS = 4
+SUMMARY_LINE_CHARS = 160
+
+
+class TokenCounter:
+    """Counts tokens locally with tiktoken, falling back to a chars/4 estimate."""
+    
+    def __init__(self, encoding_name: str = "o200k_base"):
+        self.encoding_name = encoding_name
+        self._encoding = None
+        self._encoding_loaded = False
+        self._count_text = lru_cache(maxsize=4096)(self._count_uncached)
+    
+    def _get_encoding(self):
+        if not self._encoding_loaded:
+            self._encoding_loaded = True
+            if tiktoken is None:
+                logger.warning("tiktoken not installed; estimating token counts from text length")
+            else:
+                try:
+                    self._encoding = tiktoken.get_encoding(self.encoding_name)
+                except Exception as e:
+                    logger.warning(f"Could not load tokenizer '{self.encoding_name}', estimating instead: {e}")
+        return self._encoding
+    
+    def _count_uncached(self, text: str) -> int:
+        encoding = self._get_encoding()
+        if encoding is None:
+            return (len(text) + 3) // 4
+        return len(encoding.encode(text, disallowed_special=()))
+    
+    def count_text(self, text: str) -> int:
+        """Count the tokens in a piece of text."""
+        return self._count_text(text) if text else 0
+    
+    def count_message(self, message: Dict) -> int:
+        """Count the tokens a single chat message will cost, including framing."""
+        tokens = MESSAGE_OVERHEAD_TOKENS + self.count_text(message.get("content") or "")
+        for tool_call in message.get("tool_calls") or []:
+            function = tool_call.get("function", {})
+            tokens += self.count_text(function.get("name", "")) + self.count_text(function.get("arguments", ""))
+        return tokens
+
+
+class ContextManager:
+    """Fits a conversation into a prompt token budget.
+    
+    The system prompt and the most recent messages are always sent. Older messages
+    that carry tool results are kept while they fit; the rest are collapsed into a
+    short extractive summary. Summaries are extended incrementally and cached per
+    session, so each request only summarizes messages that newly fell out of the
+    window.
+    """
+    
+    def __init__(self, max_prompt_tokens: int = 6000, keep_recent_messages: int = 6,
+                 summary_max_tokens: int = 300, encoding_name: str = "o200k_base",
+                 max_cached_summaries: int = 1000):
+        self.max_prompt_tokens = max_prompt_tokens
+        self.keep_recent_messages = keep_recent_messages
+        self.summary_max_tokens = summary_max_tokens
+        self.max_cached_summaries = max_cached_summaries
+        self.token_counter = TokenCounter(encoding_name)
+        self._summaries: "OrderedDict[str, Tuple[int, str, List[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "trimmed": 0, "tokens_before": 0, "tokens_after": 0}
+    
+    def prepare(self) -> None:
+        """Load the tokenizer now rather than on the first request."""
+        self.token_counter._get_encoding()
+    
+    def build_messages(self, system_prompt: str, chat_history: List[Dict],
+                       conversation_id: Optional[str] = None) -> Tuple[List[Dict], Dict]:
+        """Return the messages to send and per-request token metrics."""
+        system_message = {"role": "system", "content": system_prompt}
+        system_tokens = self.token_counter.count_message(system_message)
+        message_tokens = [self.token_counter.count_message(message) for message in chat_history]
+        tokens_before = system_tokens + sum(message_tokens)
+        
+        if tokens_before <= self.max_prompt_tokens:
+            messages = [system_message] + chat_history
+            return messages, self._record(tokens_before, tokens_before, 0)
+        
+        units = self._group_units(chat_history)
+        budget = self.max_prompt_tokens - system_tokens - self.summary_max_tokens
+        
+        # Walk back from the newest unit, always keeping the recent window
+        keep = [False] * len(units)
+        recent_messages = 0
+        for index in range(len(units) - 1, -1, -1):
+            start, end = units[index]
+            unit_tokens = sum(message_tokens[start:end])
+            if recent_messages < self.keep_recent_messages or unit_tokens <= budget:
+                keep[index] = True
+                budget -= unit_tokens
+                recent_messages += end - start
+            else:
+                break
+        first_kept = keep.index(True) if True in keep else len(units)
+        
+        # Older units with tool results stay if they still fit
+        for index in range(first_kept):
+            start, end = units[index]
+            unit_tokens = sum(message_tokens[start:end])
+            if any(message.get("role") == "tool" for message in chat_history[start:end]) and unit_tokens <= budget:
+                keep[index] = True
+                budget -= unit_tokens
+        
+        dropped = [chat_history[i] for index, (start, end) in enumerate(units) if not keep[index]
+                   for i in range(start, end)]
+        kept = [chat_history[i] for index, (start, end) in enumerate(units) if keep[index]
+                for i in range(start, end)]
+        
+        messages = [system_message]
+        summary = self._summarize(dropped, conversation_id)
+        if summary:
+            messages.append({"role": "system", "content": summary})
+        messages.extend(kept)
+        
+        tokens_after = sum(self.token_counter.count_message(message) for message in messages)
+        return messages, self._record(tokens_before, tokens_after, len(dropped))
+    
+    @staticmethod
+    def _group_units(chat_history: List[Dict]) -> List[Tuple[int, int]]:
+        """Split history into (start, end) ranges; an assistant tool call and its results form one unit."""
+        units = []
+        index = 0
+        while index < len(chat_history):
+            end = index + 1
+            if chat_history[index].get("tool_calls"):
+                while end < len(chat_history) and chat_history[end].get("role") == "tool":
+                    end += 1
+            units.append((index, end))
+            index = end
+        return units
+    
+    @staticmethod
+    def _digest(messages: List[Dict]) -> str:
+        payload = json.dumps([[message.get("role"), message.get("content")] for message in messages])
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+    
+    def _summarize(self, dropped: List[Dict], conversation_id: Optional[str]) -> Optional[str]:
+        """Extend the cached summary for this conversation with newly dropped messages.
+        
+        Only session conversations have an id to cache under; without one the
+        summary is built from scratch.
+        """
+        if not dropped:
+            return None
+        
+        if not conversation_id:
+            return self._render_summary(self._fit_summary([self._summary_line(message) for message in dropped]))
+        
+        with self._lock:
+            summarized, digest, lines = self._summaries.get(conversation_id, (0, "", []))
+            if summarized > len(dropped) or self._digest(dropped[:summarized]) != digest:
+                # An edited history, or messages kept earlier for their tool results now dropped
+                summarized, lines = 0, []
+            lines = self._fit_summary(lines + [self._summary_line(message) for message in dropped[summarized:]])
+            
+            self._summaries[conversation_id] = (len(dropped), self._digest(dropped), lines)
+            self._summaries.move_to_end(conversation_id)
+            while len(self._summaries) > self.max_cached_summaries:
+                self._summaries.popitem(last=False)
+        
+        return self._render_summary(lines)
+    
+    def _fit_summary(self, lines: List[Optional[str]]) -> List[str]:
+        """Drop empty lines, then the oldest ones until the summary fits its token budget."""
+        lines = [line for line in lines if line]
+        while len(lines) > 1 and self.token_counter.count_text("\n".join(lines)) > self.summary_max_tokens:
+            lines.pop(0)
+        return lines
+    
+    @staticmethod
+    def _render_summary(lines: List[str]) -> Optional[str]:
+        if not lines:
+            return None
+        return "Summary of earlier conversation:\n" + "\n".join(lines)
+    
+    @staticmethod
+    def _summary_line(message: Dict) -> Optional[str]:
+        role = message.get("role")
+        if role not in ("user", "assistant"):
+            return None
+        content = " ".join((message.get("content") or "").split())
+        if not content:
+            return None
+        if len(content) > SUMMARY_LINE_CHARS:
+            content = content[:SUMMARY_LINE_CHARS - 3] + "..."
+        return f"- {role.capitalize()}: {content}"
+    
+    def _record(self, tokens_before: int, tokens_after: int, dropped: int) -> Dict:
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["tokens_before"] += tokens_before
+            self._stats["tokens_after"] += tokens_after
+            if dropped:
+                self._stats["trimmed"] += 1
+        
+        if dropped:
+            logger.info("Context trimmed: %d -> %d tokens, %d messages summarized", tokens_before, tokens_after, dropped)
+        return {"tokens_before": tokens_before, "tokens_after": tokens_after, "messages_summarized": dropped}
+    
+    def stats(self) -> Dict:
+        """Return aggregate token counters."""
+        with self._lock:
+            return dict(self._stats, cached_summaries=len(self._summaries))
@@ -0,0 +1,127 @@
+import importlib.util
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class _InstrumentedTransport(httpx.HTTPTransport):
+    """HTTP transport that counts requests in flight on the shared pool."""
+    
+    def __init__(self, pool: "HttpConnectionPool", **kwargs):
+        super().__init__(**kwargs)
+        self._owner = pool
+    
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self._owner._request_started()
+        try:
+            return super().handle_request(request)
+        except Exception:
+            self._owner._request_failed()
+            raise
+        finally:
+            self._owner._request_finished()
+
+
+class HttpConnectionPool:
+    """Tuned, shared HTTP connection pool for the Azure OpenAI clients.
+    
+    Controls pool size, keep-alive expiry, HTTP/2 and separate connect/read/write/
+    pool timeouts, can pre-open connections at startup so the first requests skip
+    the TCP/TLS handshake, and reports pool utilization.
+    """
+    
+    def __init__(self, max_connections: int = 100, max_keepalive_connections: int = 20,
+                 keepalive_expiry: float = 30.0, http2: bool = False,
+                 connect_timeout: float = 5.0, read_timeout: float = 60.0,
+                 write_timeout: float = 10.0, pool_timeout: float = 5.0):
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("HTTP/2 requested but the 'h2' package is not installed; using HTTP/1.1")
+            http2 = False
+        
+        self.http2 = http2
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.timeout = httpx.Timeout(
+            connect=connect_timeout,
+            read=read_timeout,
+            write=write_timeout,
+            pool=pool_timeout
+        )
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "failed": 0, "in_flight": 0, "peak_in_flight": 0, "warmed": 0}
+        self._transport = _InstrumentedTransport(self, limits=self.limits, http2=self.http2)
+        self.client = httpx.Client(transport=self._transport, timeout=self.timeout)
+    
+    def create_async_client(self) -> httpx.AsyncClient:
+        """Build an async client with the same limits and timeouts, for AsyncAzureOpenAI."""
+        return httpx.AsyncClient(limits=self.limits, timeout=self.timeout, http2=self.http2)
+    
+    def warm_up(self, url: str, connections: int = 1) -> None:
+        """Open ``connections`` keep-alive connections to ``url`` in parallel.
+        
+        Any HTTP status counts: the point is the completed handshake left in the pool.
+        """
+        def open_connection(_):
+            try:
+                self.client.head(url, timeout=self.timeout.connect)
+                return True
+            except httpx.HTTPError as e:
+                logger.warning(f"Connection pool warm-up to {url} failed: {e}")
+                return False
+        
+        with ThreadPoolExecutor(max_workers=max(connections, 1)) as executor:
+            warmed = sum(executor.map(open_connection, range(connections)))
+        
+        with self._lock:
+            self._stats["warmed"] += warmed
+        logger.info(f"Warmed {warmed}/{connections} connections to {url}")
+    
+    def warm_up_in_background(self, url: str, connections: int = 1) -> threading.Thread:
+        """Run ``warm_up`` on a daemon thread so application start is not delayed."""
+        thread = threading.Thread(target=self.warm_up, args=(url, connections), name="http-pool-warmup", daemon=True)
+        thread.start()
+        return thread
+    
+    def _request_started(self) -> None:
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["in_flight"] += 1
+            self._stats["peak_in_flight"] = max(self._stats["peak_in_flight"], self._stats["in_flight"])
+    
+    def _request_failed(self) -> None:
+        with self._lock:
+            self._stats["failed"] += 1
+    
+    def _request_finished(self) -> None:
+        with self._lock:
+            self._stats["in_flight"] -= 1
+    
+    def stats(self) -> Dict:
+        """Return request counters and current connection usage."""
+        with self._lock:
+            stats = dict(self._stats)
+        
+        connections = self._connections()
+        if connections is not None:
+            stats["connections"] = len(connections)
+            stats["idle_connections"] = sum(1 for connection in connections if connection.is_idle())
+        stats["max_connections"] = self.limits.max_connections
+        stats["http2"] = self.http2
+        return stats
+    
+    def _connections(self) -> Optional[list]:
+        # httpcore does not expose the pool on the httpx transport publicly
+        pool = getattr(self._transport, "_pool", None)
+        return list(getattr(pool, "connections", [])) if pool is not None else None
+    
+    def close(self) -> None:
+        """Close every pooled connection."""
+        self.client.close()
@@ -0,0 +1,193 @@
+import json
+import logging
+import math
+import re
+import sys
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+GREETING_PATTERN = re.compile(
+    r"^(hi+|hello|hey|hiya|howdy|good (morning|afternoon|evening))( there)?( team| bot)?[\s!.,:)]*$"
+)
+THANKS_PATTERN = re.compile(
+    r"^((ok(ay)?|great|perfect|awesome|cool)[\s,!.]*)?(thanks|thank you|thx|ty|cheers)"
+    r"( (so|very) much| a lot)?( for (the|your) help)?[\s!.,:)]*$"
+)
+REPOSITORY_ID_PATTERN = re.compile(r"\b([dqtp][1-9][0-9]?)\b")
+ACCESS_KEYWORD_PATTERN = re.compile(r"\b(groups?|myaccess|access|permissions?|roles?)\b")
+# Anything that needs reasoning (policy, process, comparisons) goes to the model
+COMPLEX_PATTERN = re.compile(r"\b(why|how|difference|compare|policy|approv\w*|should|unix|new user|i'?m new)\b")
+# So do negated or revoking requests ("I don't need D3", "no longer need Q1"): they must not get the groups
+NEGATION_PATTERN = re.compile(r"\b(not|no|never|without|dont|cannot|remov\w*|revok\w*|cancel\w*)\b|n't\b")
+TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+class NaiveBayesIntentModel:
+    """Small multinomial naive Bayes text classifier for intents, stored as JSON."""
+    
+    def __init__(self, priors: Dict[str, float], likelihoods: Dict[str, Dict[str, float]],
+                 unseen: Dict[str, float]):
+        self.priors = priors
+        self.likelihoods = likelihoods
+        self.unseen = unseen
+    
+    @classmethod
+    def train(cls, examples: List[Tuple[str, str]], alpha: float = 1.0) -> "NaiveBayesIntentModel":
+        """Train from ``(text, intent)`` pairs."""
+        documents = Counter(intent for _, intent in examples)
+        term_counts: Dict[str, Counter] = {intent: Counter() for intent in documents}
+        for text, intent in examples:
+            term_counts[intent].update(TOKEN_PATTERN.findall(text.lower()))
+        vocabulary = set().union(*term_counts.values()) if term_counts else set()
+        
+        priors, likelihoods, unseen = {}, {}, {}
+        for intent, count in documents.items():
+            total = sum(term_counts[intent].values()) + alpha * (len(vocabulary) + 1)
+            priors[intent] = math.log(count / len(examples))
+            likelihoods[intent] = {term: math.log((n + alpha) / total) for term, n in term_counts[intent].items()}
+            unseen[intent] = math.log(alpha / total)
+        return cls(priors, likelihoods, unseen)
+    
+    def predict(self, text: str) -> Tuple[Optional[str], float]:
+        """Return the most likely intent and its posterior probability."""
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        if not tokens or not self.priors:
+            return None, 0.0
+        scores = {
+            intent: prior + sum(self.likelihoods[intent].get(token, self.unseen[intent]) for token in tokens)
+            for intent, prior in self.priors.items()
+        }
+        best = max(scores, key=scores.get)
+        normalizer = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, 1.0 / normalizer
+    
+    def save(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"priors": self.priors, "likelihoods": self.likelihoods, "unseen": self.unseen}, f)
+    
+    @classmethod
+    def load(cls, path: str) -> "NaiveBayesIntentModel":
+        with open(path, encoding="utf-8") as f:
+            payload = json.load(f)
+        return cls(payload["priors"], payload["likelihoods"], payload["unseen"])
+
+
+class IntentRouter:
+    """Classifies the latest user turn so simple intents can be answered without Azure.
+    
+    Regex rules recognise greetings, thanks and repository access-group lookups.
+    An optional trained model covers phrasings the rules miss; only intents that
+    need no slots (greeting, thanks) are taken from it. An intent is returned only
+    when its confidence reaches ``min_confidence``; everything else goes to the LLM.
+    The router also keeps the counters behind the routed fraction and the
+    latency saved per intent.
+    """
+    
+    def __init__(self, min_confidence: float = 0.85, model: Optional[NaiveBayesIntentModel] = None):
+        self.min_confidence = min_confidence
+        self.model = model
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._llm_requests = 0
+        self._llm_seconds = 0.0
+        self._intents: Dict[str, Dict[str, float]] = {}
+    
+    def classify(self, chat_history: List[Dict]) -> Optional[Dict]:
+        """Return ``{"name", "confidence", "slots"}`` for a confidently recognised last turn, else None."""
+        if not chat_history or chat_history[-1].get("role") != "user":
+            return None
+        text = " ".join((chat_history[-1].get("content") or "").lower().split())
+        if not text:
+            return None
+        
+        intent = self._match_rules(text, self._previous_assistant_message(chat_history))
+        if intent is None and self.model is not None:
+            name, confidence = self.model.predict(text)
+            if name in ("greeting", "thanks"):
+                intent = {"name": name, "confidence": confidence, "slots": {}}
+        
+        if intent is None or intent["confidence"] < self.min_confidence:
+            return None
+        return intent
+    
+    @staticmethod
+    def _match_rules(text: str, previous_assistant: str) -> Optional[Dict]:
+        if GREETING_PATTERN.match(text):
+            return {"name": "greeting", "confidence": 0.95, "slots": {}}
+        if THANKS_PATTERN.match(text):
+            return {"name": "thanks", "confidence": 0.95, "slots": {}}
+        
+        repository_ids = list(dict.fromkeys(match.upper() for match in REPOSITORY_ID_PATTERN.findall(text)))
+        if repository_ids and not COMPLEX_PATTERN.search(text) and not NEGATION_PATTERN.search(text):
+            if ACCESS_KEYWORD_PATTERN.search(text):
+                confidence = 0.9
+            elif "repositor" in previous_assistant and len(text.split()) <= 3:
+                # A bare "D1" in reply to "which repository?"
+                confidence = 0.9
+            else:
+                confidence = 0.6
+            return {"name": "repository_lookup", "confidence": confidence, "slots": {"repository_ids": repository_ids}}
+        return None
+    
+    @staticmethod
+    def _previous_assistant_message(chat_history: List[Dict]) -> str:
+        for message in reversed(chat_history[:-1]):
+            if message.get("role") == "assistant" and message.get("content"):
+                return message["content"].lower()
+        return ""
+    
+    def record_routed(self, intent: str, seconds: float) -> None:
+        """Record a turn answered locally and how long that took."""
+        with self._lock:
+            self._requests += 1
+            stats = self._intents.setdefault(intent, {"count": 0, "seconds": 0.0})
+            stats["count"] += 1
+            stats["seconds"] += seconds
+    
+    def record_llm(self, seconds: float) -> None:
+        """Record a turn answered by the LLM; its mean is the baseline for latency saved."""
+        with self._lock:
+            self._requests += 1
+            self._llm_requests += 1
+            self._llm_seconds += seconds
+    
+    def stats(self) -> Dict:
+        """Routed fraction overall, and per intent the count, local latency and estimated time saved."""
+        with self._lock:
+            llm_mean = self._llm_seconds / self._llm_requests if self._llm_requests else None
+            routed = sum(int(stats["count"]) for stats in self._intents.values())
+            intents = {}
+            for name, stats in self._intents.items():
+                local_mean = stats["seconds"] / stats["count"]
+                intents[name] = {
+                    "count": int(stats["count"]),
+                    "mean_local_ms": round(local_mean * 1000, 3),
+                    "estimated_saved_seconds": round((llm_mean - local_mean) * stats["count"], 3)
+                    if llm_mean is not None else None
+                }
+            return {
+                "requests": self._requests,
+                "routed": routed,
+                "routed_fraction": round(routed / self._requests, 4) if self._requests else 0.0,
+                "llm_mean_seconds": round(llm_mean, 4) if llm_mean is not None else None,
+                "intents": intents
+            }
+
+
+def _train_from_file(examples_path: str, model_path: str) -> None:
+    """Train a model from JSON lines of ``{"text", "intent"}`` and save it."""
+    with open(examples_path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    examples = [(record["text"], record["intent"]) for record in records]
+    NaiveBayesIntentModel.train(examples).save(model_path)
+    print(f"Trained intent model on {len(examples)} examples -> {model_path}")
+
+
+if __name__ == "__main__":
+    # python -m app.services.intent_router examples.jsonl intent_model.json
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m app.services.intent_router EXAMPLES.jsonl MODEL.json")
+    _train_from_file(sys.argv[1], sys.argv[2])
@@ -0,0 +1,189 @@
+import hashlib
+import heapq
+import json
+import logging
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from app.models.knowledge_base import KnowledgeBase
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i in is it me my of on or our
+should the this to we what when where which who why will with you your
+""".split())
+INDEX_FORMAT_VERSION = 1
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with common English stopwords removed."""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def load_documents(documents_path: Optional[str] = None) -> Dict[str, Dict[str, str]]:
+    """Collect knowledge base articles as ``{id: {"title", "text"}}``.
+    
+    The built-in articles are always included. ``documents_path`` may be a
+    directory of ``.md``/``.txt`` files (one article each, id from the file name,
+    title from the first line) and ``.json``/``.jsonl`` files holding objects with
+    ``id``, ``title`` and ``text``.
+    """
+    documents = {
+        key: {"title": key.replace("_", " "), "text": answer}
+        for key, answer in KnowledgeBase.INTERNAL_KNOWLEDGE_BASE.items()
+    }
+    if not documents_path:
+        return documents
+    if not os.path.isdir(documents_path):
+        logger.warning(f"Knowledge base documents path not found: {documents_path}")
+        return documents
+    
+    for root, _, files in os.walk(documents_path):
+        for filename in sorted(files):
+            path = os.path.join(root, filename)
+            stem, extension = os.path.splitext(filename)
+            try:
+                with open(path, encoding="utf-8") as f:
+                    if extension in (".md", ".txt"):
+                        text = f.read().strip()
+                        title = text.splitlines()[0].lstrip("# ").strip() if text else stem
+                        documents[stem] = {"title": title, "text": text}
+                    elif extension == ".json":
+                        records = json.load(f)
+                        for record in records if isinstance(records, list) else [records]:
+                            documents[str(record["id"])] = {"title": record.get("title", ""), "text": record["text"]}
+                    elif extension == ".jsonl":
+                        for line in f:
+                            if line.strip():
+                                record = json.loads(line)
+                                documents[str(record["id"])] = {"title": record.get("title", ""), "text": record["text"]}
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Skipping knowledge base file {path}: {e}")
+    return documents
+
+
+class KnowledgeIndex:
+    """Offline BM25 inverted index over knowledge base articles.
+    
+    Term weights are computed once at build time, so a query only sums the
+    precomputed weights from each query term's posting list and takes the top k.
+    The index can be saved to and loaded from a JSON file; ``load_or_build``
+    reuses a saved index while the documents it was built from are unchanged.
+    """
+    
+    def __init__(self, doc_ids: List[str], titles: List[str], texts: List[str],
+                 postings: Dict[str, List[Tuple[int, float]]], version: str):
+        self.doc_ids = doc_ids
+        self.titles = titles
+        self.texts = texts
+        self.postings = postings
+        self.version = version
+    
+    @classmethod
+    def build(cls, documents: Dict[str, Dict[str, str]], k1: float = 1.5, b: float = 0.75) -> "KnowledgeIndex":
+        """Build the index from ``{id: {"title", "text"}}``."""
+        doc_ids = sorted(documents)
+        titles = [documents[doc_id].get("title", "") for doc_id in doc_ids]
+        texts = [documents[doc_id]["text"] for doc_id in doc_ids]
+        
+        # Titles and ids are indexed with the body so "db2 yellowbrick access" finds its article
+        term_counts = [Counter(tokenize(f"{doc_id.replace('_', ' ')} {title} {text}"))
+                       for doc_id, title, text in zip(doc_ids, titles, texts)]
+        lengths = [sum(counts.values()) for counts in term_counts]
+        average_length = (sum(lengths) / len(lengths)) if lengths else 0.0
+        
+        document_frequency = Counter()
+        for counts in term_counts:
+            document_frequency.update(counts.keys())
+        
+        total = len(doc_ids)
+        postings: Dict[str, List[Tuple[int, float]]] = {}
+        for index, counts in enumerate(term_counts):
+            norm = k1 * (1 - b + b * lengths[index] / average_length) if average_length else k1
+            for term, frequency in counts.items():
+                df = document_frequency[term]
+                idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+                weight = idf * frequency * (k1 + 1) / (frequency + norm)
+                postings.setdefault(term, []).append((index, round(weight, 6)))
+        
+        return cls(doc_ids, titles, texts, postings, cls.fingerprint(documents))
+    
+    @staticmethod
+    def fingerprint(documents: Dict[str, Dict[str, str]]) -> str:
+        """Short hash of the documents an index is built from."""
+        serialized = json.dumps(documents, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()[:16]
+    
+    def search(self, query: str, k: int = 3) -> List[Dict]:
+        """Return the ``k`` best matching articles, best first."""
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            for index, weight in self.postings.get(term, ()):
+                scores[index] = scores.get(index, 0.0) + weight
+        
+        best = heapq.nlargest(k, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [{
+            "id": self.doc_ids[index],
+            "title": self.titles[index],
+            "text": self.texts[index],
+            "score": round(score, 4)
+        } for index, score in best]
+    
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+    
+    def save(self, path: str) -> None:
+        """Write the index to ``path`` atomically."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        payload = {
+            "format": INDEX_FORMAT_VERSION,
+            "version": self.version,
+            "doc_ids": self.doc_ids,
+            "titles": self.titles,
+            "texts": self.texts,
+            "postings": self.postings
+        }
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, separators=(",", ":"))
+        os.replace(temporary_path, path)
+    
+    @classmethod
+    def load(cls, path: str) -> "KnowledgeIndex":
+        """Read an index written by ``save``."""
+        with open(path, encoding="utf-8") as f:
+            payload = json.load(f)
+        if payload.get("format") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported knowledge index format: {payload.get('format')}")
+        postings = {term: [tuple(entry) for entry in entries] for term, entries in payload["postings"].items()}
+        return cls(payload["doc_ids"], payload["titles"], payload["texts"], postings, payload["version"])
+    
+    @classmethod
+    def load_or_build(cls, documents: Dict[str, Dict[str, str]], index_path: Optional[str] = None) -> "KnowledgeIndex":
+        """Load the saved index if it matches ``documents``, otherwise build (and save) a new one."""
+        version = cls.fingerprint(documents)
+        if index_path and os.path.exists(index_path):
+            try:
+                index = cls.load(index_path)
+                if index.version == version:
+                    logger.info(f"Loaded knowledge index with {len(index)} articles from {index_path}")
+                    return index
+                logger.info("Knowledge base documents changed; rebuilding the index")
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Could not load knowledge index from {index_path}, rebuilding: {e}")
+        
+        index = cls.build(documents)
+        logger.info(f"Built knowledge index with {len(index)} articles")
+        if index_path:
+            try:
+                index.save(index_path)
+            except OSError as e:
+                logger.warning(f"Could not save knowledge index to {index_path}: {e}")
+        return index
@@ -0,0 +1,300 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+import zlib
+from contextvars import ContextVar, Token
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+access_logger = logging.getLogger("app.access")
+
+REQUEST_ID_HEADER = "X-Request-Id"
+
+_request_id: ContextVar[Optional[str]] = ContextVar("log_request_id", default=None)
+_request_started: ContextVar[Optional[float]] = ContextVar("log_request_started", default=None)
+
+# Attributes every LogRecord has; anything else came in through ``extra`` and is written as a field
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message", "asctime", "request_id", "elapsed_ms"
+}
+
+
+def new_request_id(supplied: Optional[str] = None) -> str:
+    """Keep a caller's request id when it is short and printable, otherwise generate one."""
+    if supplied and len(supplied) <= 64 and supplied.isprintable() and " " not in supplied:
+        return supplied
+    return uuid.uuid4().hex
+
+
+def bind_request(request_id: str) -> Tuple[Token, Token]:
+    """Tag log records from the current request (thread or asyncio task) with ``request_id``."""
+    return _request_id.set(request_id), _request_started.set(time.perf_counter())
+
+
+def unbind_request(tokens: Tuple[Token, Token]) -> None:
+    request_token, started_token = tokens
+    try:
+        _request_id.reset(request_token)
+        _request_started.reset(started_token)
+    except ValueError:
+        # Flask may tear a streamed request down in a different context than it set up
+        _request_id.set(None)
+        _request_started.set(None)
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+def request_elapsed_ms() -> Optional[float]:
+    started = _request_started.get()
+    return round((time.perf_counter() - started) * 1000, 1) if started is not None else None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message, request id, elapsed time and extras."""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+            entry["elapsed_ms"] = record.elapsed_ms
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps only a fraction of the records at the sampled levels.
+    
+    ``rates`` maps a level name to the share of records kept; other levels, and
+    warnings and above, are always kept. Inside a request the choice is made
+    from a hash of the request id, so a sampled request keeps all of its records
+    and a dropped one loses them all, rather than leaving scattered lines.
+    """
+    
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates: Dict[int, float] = {}
+        for name, rate in rates.items():
+            level = logging.getLevelName(name.upper())
+            if isinstance(level, int) and level < logging.WARNING and rate < 1.0:
+                self.rates[level] = max(rate, 0.0)
+        self.sampled_out = 0
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(record.levelno)
+        if rate is None:
+            return True
+        request_id = _request_id.get()
+        draw = zlib.crc32(request_id.encode("utf-8")) / 2 ** 32 if request_id else random.random()
+        if draw < rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """Queues records unformatted, tagged with the request, and never blocks the logging thread.
+    
+    The stock QueueHandler formats each record on the calling thread; here the
+    message is rendered by the writer thread instead, so arguments are only
+    turned into text for records that are actually written.
+    """
+    
+    def __init__(self, log_queue: queue.Queue, pipeline: "LogPipeline"):
+        super().__init__(log_queue)
+        self.pipeline = pipeline
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.request_id = _request_id.get()
+        record.elapsed_ms = request_elapsed_ms() if record.request_id else None
+        if record.exc_info:
+            # A traceback keeps its frames (and their locals) alive until written; render it now
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+    
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.pipeline._count_dropped()
+
+
+class _Writer(QueueListener):
+    """QueueListener whose stop waits for room in a full queue instead of failing."""
+    
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)
+
+
+class LogPipeline:
+    """Root logging through a bounded queue drained by a background writer thread.
+    
+    Request threads only filter, sample and enqueue; formatting and the writes
+    to stderr and ``log_file`` happen on the writer, so a slow disk delays log
+    lines instead of requests. When the queue is full, records are dropped and
+    counted rather than waited for. The writer does not survive a fork: a
+    forked worker gets an empty queue and restarts the writer with ``start``.
+    """
+    
+    def __init__(self, level: str = "INFO", json_format: bool = True, log_file: Optional[str] = None,
+                 sample_rates: Optional[Dict[str, float]] = None, queue_size: int = 10000):
+        self.level = logging.getLevelName(level.upper()) if isinstance(level, str) else level
+        formatter = JsonFormatter() if json_format else logging.Formatter(
+            "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s")
+        self.handlers: List[logging.Handler] = [logging.StreamHandler()]
+        if log_file:
+            os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+            self.handlers.append(logging.FileHandler(log_file, encoding="utf-8"))
+        for handler in self.handlers:
+            handler.setFormatter(formatter)
+        
+        self.queue_size = queue_size
+        self.handler = _DeferredQueueHandler(queue.Queue(queue_size), self)
+        self.sampler = SamplingFilter(sample_rates or {})
+        if self.sampler.rates:
+            self.handler.addFilter(self.sampler)
+        self._lock = threading.Lock()
+        self._listener: Optional[_Writer] = None
+        self._pid: Optional[int] = None
+        self._dropped = 0
+    
+    def install(self) -> "LogPipeline":
+        """Route the root logger through this pipeline, replacing any pipeline installed before."""
+        global _installed
+        previous, _installed = _installed, self
+        root = logging.getLogger()
+        if previous is not None:
+            root.removeHandler(previous.handler)
+            previous.stop()
+        root.addHandler(self.handler)
+        root.setLevel(self.level)
+        self.start()
+        return self
+    
+    def start(self) -> None:
+        """Start the writer thread in this process, if it is not running here already."""
+        with self._lock:
+            if self._listener is not None and self._pid == os.getpid():
+                return
+            self._listener = _Writer(self.handler.queue, *self.handlers, respect_handler_level=True)
+            self._listener.start()
+            self._pid = os.getpid()
+    
+    def stop(self) -> None:
+        """Write out what is queued and stop the writer."""
+        with self._lock:
+            listener, self._listener = self._listener, None
+            if listener is not None and self._pid == os.getpid():
+                listener.stop()
+        for handler in self.handlers:
+            handler.flush()
+    
+    def _after_fork(self) -> None:
+        # The parent's writer thread did not come along, and its queue may have been
+        # locked mid-put at the fork: start the child on a fresh one
+        self._lock = threading.Lock()
+        self.handler.queue = queue.Queue(self.queue_size)
+        self._listener = None
+    
+    def _count_dropped(self) -> None:
+        with self._lock:
+            self._dropped += 1
+    
+    def stats(self) -> Dict:
+        return {
+            "queued": self.handler.queue.qsize(),
+            "queue_size": self.queue_size,
+            "dropped": self._dropped,
+            "sampled_out": self.sampler.sampled_out,
+            "sample_rates": {logging.getLevelName(level): rate for level, rate in self.sampler.rates.items()},
+            "writing": self._listener is not None and self._pid == os.getpid()
+        }
+
+
+_installed: Optional[LogPipeline] = None
+
+
+def _reset_after_fork() -> None:
+    if _installed is not None:
+        _installed._after_fork()
+
+
+def _stop_installed() -> None:
+    if _installed is not None:
+        _installed.stop()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+atexit.register(_stop_installed)
+
+
+class RequestLogMiddleware:
+    """ASGI middleware giving each HTTP request a request id and, optionally, one access log line.
+    
+    The id (the caller's ``X-Request-Id`` when usable) is bound to the request's
+    log records, passed on to the app in the request headers, so the Flask app
+    behind the mount logs under the same id, and echoed in the response.
+    """
+    
+    def __init__(self, app, log_requests: bool = True):
+        self.app = app
+        self.log_requests = log_requests
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        header = REQUEST_ID_HEADER.lower().encode("latin-1")
+        supplied = next((value.decode("latin-1") for name, value in scope["headers"] if name == header), None)
+        request_id = new_request_id(supplied)
+        scope = dict(scope, headers=[(name, value) for name, value in scope["headers"] if name != header]
+                     + [(header, request_id.encode("latin-1"))])
+        status = 500
+        
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                if not any(name.lower() == header for name, _ in headers):
+                    headers.append((header, request_id.encode("latin-1")))
+                message = dict(message, headers=headers)
+            await send(message)
+        
+        tokens = bind_request(request_id)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            if self.log_requests:
+                log_access(scope["method"], scope["path"], status)
+            unbind_request(tokens)
+
+
+def log_access(method: str, path: str, status: int) -> None:
+    """One line per finished request, timed from when its request id was bound."""
+    if access_logger.isEnabledFor(logging.INFO):
+        access_logger.info("%s %s %s", method, path, status,
+                           extra={"method": method, "path": path, "status": status,
+                                  "duration_ms": request_elapsed_ms()})
@@ -0,0 +1,110 @@
+import json
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from app.services.tool_registry import ToolRegistry
+
+logger = logging.getLogger(__name__)
+
+FAST = "fast"
+STRONG = "strong"
+
+# Phrases that mark an answer the fast model was not confident in
+UNSURE_PHRASES = ("i'm not sure", "i am not sure", "i'm not certain", "i am not certain", "i don't know",
+                  "i do not know", "unable to determine", "cannot determine", "can't determine")
+
+
+class TierPolicy:
+    """Chooses the deployment tier, fast or strong, for each completion of a chat turn.
+    
+    The fast tier takes the turns a small model answers as well as a large one:
+    the first completion of a short conversation with a short question, and the
+    rephrasing of tool results that all succeeded. Long conversations or
+    questions, tool failures and further tool rounds go to the strong tier. A
+    fast completion is escalated, i.e. sent again to the strong tier, when its
+    tool calls are malformed (unknown tool, arguments that are not a JSON object,
+    missing required arguments) or, when ``escalate_unsure`` is set, when it
+    comes back empty or reads as unsure.
+    """
+    
+    def __init__(self, fast_max_history_messages: int = 6, fast_max_question_chars: int = 400,
+                 escalate_unsure: bool = True, unsure_phrases: Tuple[str, ...] = UNSURE_PHRASES):
+        self.fast_max_history_messages = fast_max_history_messages
+        self.fast_max_question_chars = fast_max_question_chars
+        self.escalate_unsure = escalate_unsure
+        self.unsure_phrases = tuple(phrase.lower() for phrase in unsure_phrases)
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {"routed": {}, "reasons": {}, "escalated": {}}
+    
+    def first_tier(self, chat_history: List[Dict]) -> Tuple[str, str]:
+        """Tier and reason for the completion that answers the turn or picks its tools."""
+        if len(chat_history) > self.fast_max_history_messages:
+            return STRONG, "long_history"
+        question = next((message.get("content") or "" for message in reversed(chat_history)
+                         if message.get("role") == "user"), "")
+        if not isinstance(question, str) or len(question) > self.fast_max_question_chars:
+            return STRONG, "long_question"
+        return FAST, "short_turn"
+    
+    def follow_up_tier(self, tool_results: List[Tuple[str, Dict]], round_number: int) -> Tuple[str, str]:
+        """Tier and reason for the completion after a round of tool results."""
+        if any(result.get("status") != "success" for _, result in tool_results):
+            # Recovering from an unknown ID or a failed lookup needs the stronger model
+            return STRONG, "tool_error"
+        if round_number > 1:
+            return STRONG, "multi_round_tools"
+        return FAST, "rephrase_tool_results"
+    
+    def escalation_reason(self, response: Dict, registry: ToolRegistry) -> Optional[str]:
+        """Why a fast-tier response must be redone by the strong tier, or None to keep it."""
+        if response.get("tool_calls"):
+            return self.malformed_tool_calls(response["tool_calls"], registry)
+        if not self.escalate_unsure:
+            return None
+        content = (response.get("content") or "").strip()
+        if not content:
+            return "empty_answer"
+        lowered = content.lower()
+        if any(phrase in lowered for phrase in self.unsure_phrases):
+            return "unsure_answer"
+        return None
+    
+    @staticmethod
+    def malformed_tool_calls(tool_calls: List[Dict], registry: ToolRegistry) -> Optional[str]:
+        """``malformed_tool_call`` when any call does not fit the schema of a registered tool."""
+        for tool_call in tool_calls:
+            function = tool_call.get("function") or {}
+            tool = registry.get(function.get("name"))
+            if tool is None:
+                return "malformed_tool_call"
+            try:
+                arguments = json.loads(function.get("arguments") or "{}")
+            except ValueError:
+                return "malformed_tool_call"
+            if not isinstance(arguments, dict):
+                return "malformed_tool_call"
+            if any(arguments.get(name) in (None, "") for name in tool.parameters.get("required", [])):
+                return "malformed_tool_call"
+        return None
+    
+    def record_route(self, tier: str, reason: str) -> None:
+        with self._lock:
+            self._count("routed", tier)
+            self._count("reasons", reason)
+    
+    def record_escalation(self, reason: str) -> None:
+        with self._lock:
+            self._count("escalated", reason)
+    
+    def _count(self, kind: str, key: str) -> None:
+        counts = self._stats[kind]
+        counts[key] = counts.get(key, 0) + 1
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = {kind: dict(counts) for kind, counts in self._stats.items()}
+        routed_fast = stats["routed"].get(FAST, 0)
+        stats["fast_share"] = round(routed_fast / sum(stats["routed"].values()), 4) if stats["routed"] else None
+        stats["escalation_rate"] = round(sum(stats["escalated"].values()) / routed_fast, 4) if routed_fast else None
+        return stats
@@ -0,0 +1,142 @@
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+NEW_USER_PHRASES = ["new user", "i am new", "i'm new"]
+ASKED_UNIX_PHRASES = ["unix enabled"]
+YES_PHRASES = ["yes", "yep", "yeah", "i do", "enabled", "have unix"]
+NO_PHRASES = ["no", "not", "don't have", "haven't", "without unix", "no unix"]
+
+ASK_UNIX_MESSAGE = ("You're a new user. Do you have UNIX enabled on your account? "
+                    "(You must have UNIX enabled before proceeding with Informatica access provisioning.)")
+ENABLE_UNIX_MESSAGE = ("You must first enable UNIX on your account before requesting Informatica access. "
+                       "Please visit the ServiceNow portal and request UNIX enablement. "
+                       "Once UNIX is enabled, you can return here and proceed with Informatica access.")
+
+
+def _phrase_group(name: str, phrases: List[str]) -> str:
+    # Longest first so a phrase is never shadowed by one of its own prefixes
+    alternatives = "|".join(re.escape(phrase) for phrase in sorted(phrases, key=len, reverse=True))
+    return f"(?P<{name}>{alternatives})"
+
+
+# One pass over a message finds every trigger phrase. The lookahead makes matches
+# zero-width, so overlapping phrases ("don't have unix" contains "have unix") are
+# all seen, exactly as the substring checks this replaces saw them.
+TRIGGER_PATTERN = re.compile("(?=" + "|".join([
+    _phrase_group("new_user", NEW_USER_PHRASES),
+    _phrase_group("asked_unix", ASKED_UNIX_PHRASES),
+    _phrase_group("yes", YES_PHRASES),
+    _phrase_group("no", NO_PHRASES)
+]) + ")")
+
+# (messages processed, fingerprint of the last one, is_new_user, asked_unix, unix_answer)
+OnboardingState = Tuple[int, str, bool, bool, Optional[str]]
+INITIAL_STATE: OnboardingState = (0, "", False, False, None)
+
+
+class UnixPrerequisiteChecker:
+    """Onboarding state machine enforcing that new users have UNIX enabled.
+    
+    States advance on each message: a user saying they are new, the assistant
+    asking whether UNIX is enabled, and the user's yes/no answer after that. The
+    state is kept per conversation id, so a request only feeds the messages added
+    since the previous one through the matcher instead of rescanning the history.
+    It is reused only while the history is at least as long as the messages it
+    was built from and the last of those is unchanged; without a conversation id
+    every check rescans.
+    """
+    
+    def __init__(self, max_conversations: int = 10000):
+        self.max_conversations = max_conversations
+        self._states: "OrderedDict[str, OnboardingState]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"checks": 0, "messages_scanned": 0, "rescans": 0}
+    
+    def check(self, chat_history: List[Dict], conversation_id: Optional[str] = None) -> Optional[str]:
+        """Return the message to send instead of calling the model, or None to continue."""
+        if not conversation_id:
+            state = INITIAL_STATE
+            for message in chat_history:
+                state = self.advance(state, message)
+            with self._lock:
+                self._stats["checks"] += 1
+                self._stats["messages_scanned"] += len(chat_history)
+            return self.decide(state)
+        
+        with self._lock:
+            state = self._states.get(conversation_id, INITIAL_STATE)
+        
+        processed = state[0]
+        # Session ids are server-generated, so the history only grows; checking the count and the last
+        # message processed catches a replaced or edited tail without rehashing the whole prefix
+        if processed and (processed > len(chat_history)
+                          or self._fingerprint(chat_history[processed - 1]) != state[1]):
+            state = INITIAL_STATE
+            self._count("rescans")
+        
+        new_messages = chat_history[state[0]:]
+        for message in new_messages:
+            state = self.advance(state, message)
+        if new_messages:
+            state = (state[0], self._fingerprint(new_messages[-1])) + state[2:]
+        
+        with self._lock:
+            self._stats["checks"] += 1
+            self._stats["messages_scanned"] += len(new_messages)
+            self._states[conversation_id] = state
+            self._states.move_to_end(conversation_id)
+            while len(self._states) > self.max_conversations:
+                self._states.popitem(last=False)
+        
+        return self.decide(state)
+    
+    @classmethod
+    def advance(cls, state: OnboardingState, message: Dict) -> OnboardingState:
+        """Apply one message to the state; ``check`` brings the fingerprint up to date."""
+        processed, digest, is_new_user, asked_unix, unix_answer = state
+        role = message.get("role")
+        content = (message.get("content") or "").lower()
+        
+        if role in ("user", "assistant") and content:
+            found = {group for match in TRIGGER_PATTERN.finditer(content)
+                     for group, value in match.groupdict().items() if value is not None}
+            
+            if role == "user" and "new_user" in found:
+                is_new_user = True
+            if role == "assistant" and "asked_unix" in found:
+                asked_unix = True
+            if asked_unix and role == "user":
+                if "yes" in found:
+                    unix_answer = "yes"
+                elif "no" in found:
+                    unix_answer = "no"
+        
+        return processed + 1, digest, is_new_user, asked_unix, unix_answer
+    
+    @staticmethod
+    def decide(state: OnboardingState) -> Optional[str]:
+        _, _, is_new_user, asked_unix, unix_answer = state
+        if is_new_user and not asked_unix:
+            return ASK_UNIX_MESSAGE
+        if asked_unix and unix_answer == "no":
+            return ENABLE_UNIX_MESSAGE
+        return None
+    
+    @staticmethod
+    def _fingerprint(message: Dict) -> str:
+        return hashlib.sha1(f"{message.get('role')}\x1f{message.get('content')}".encode("utf-8")).hexdigest()
+    
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+    
+    def stats(self) -> Dict:
+        """Return check counters and the number of tracked conversations."""
+        with self._lock:
+            return dict(self._stats, conversations=len(self._states))
@@ -1,71 +1,311 @@
 import logging
-from typing import Dict, List, Optional, Any
-from openai import AzureOpenAI
-from app.utils.exceptions import OpenAIServiceError
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Any, Iterator, Union
+import httpx
+from app.services import tracing
+from app.services.admission import AdmissionController
+from app.services.resilience import ResiliencePolicy
+from app.services.single_flight import SingleFlight
+from app.services.usage_tracker import UsageTracker
+from app.utils.exceptions import AdmissionRejectedError, OpenAIServiceError
+
+if TYPE_CHECKING:
+    from openai import AzureOpenAI
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_TIER = "strong"
+
 class OpenAIService:
-    """Service for managing OpenAI API interactions."""
+    """Service for managing OpenAI API interactions.
+    
+    ``deployment`` serves the default (strong) tier; ``deployments`` adds other
+    tiers, e.g. ``{"fast": "gpt-4o-mini"}``, picked per call with ``tier``. Each
+    deployment has its own Azure quota, so ``admission`` applies to the default
+    deployment and ``tier_admission`` maps other tiers to their own controllers.
+    """
     
-    def __init__(self, api_key: str, endpoint: str, deployment: str, api_version: str):
+    def __init__(self, api_key: str, endpoint: str, deployment: str, api_version: str,
+                 http_client: Optional[Union[httpx.Client, httpx.AsyncClient]] = None,
+                 resilience: Optional[ResiliencePolicy] = None,
+                 usage_tracker: Optional[UsageTracker] = None, stream_include_usage: bool = False,
+                 single_flight: Optional[SingleFlight] = None,
+                 admission: Optional[AdmissionController] = None,
+                 deployments: Optional[Dict[str, str]] = None,
+                 tier_admission: Optional[Dict[str, AdmissionController]] = None):
         if not api_key or not endpoint or not deployment:
             raise OpenAIServiceError("Missing required OpenAI configuration")
         
         self.deployment = deployment
-        self.client = self._initialize_client(api_key, endpoint, api_version)
+        self.deployments = {**(deployments or {}), DEFAULT_TIER: deployment}
+        self._tiers = {name: tier for tier, name in self.deployments.items()}
+        self.tier_admission = dict(tier_admission or {})
+        self._admission_by_deployment = {
+            self.deployments[tier]: controller for tier, controller in self.tier_admission.items()
+            if tier in self.deployments
+        }
+        self.azure_endpoint = self._azure_endpoint(endpoint)
+        # Optional pre-configured (pooled) HTTP client; the SDK builds its own otherwise
+        self.http_client = http_client
+        self.resilience = resilience
+        self.usage_tracker = usage_tracker
+        self.stream_include_usage = stream_include_usage
+        self.single_flight = single_flight
+        self.admission = admission
+        self._client_args = (api_key, endpoint, api_version)
+        self._client = None
+        self._client_lock = threading.Lock()
     
-    def _initialize_client(self, api_key: str, endpoint: str, api_version: str) -> AzureOpenAI:
+    @property
+    def client(self):
+        """The SDK client, built on first use unless ``prepare`` already built it."""
+        if self._client is None:
+            self.prepare()
+        return self._client
+    
+    @client.setter
+    def client(self, client) -> None:
+        self._client = client
+    
+    def prepare(self) -> None:
+        """Import the openai SDK and build the client now.
+        
+        The SDK is most of a worker's import time, so it is kept off the start-up
+        path: a gunicorn master preloading the app calls this before forking, and
+        a worker started without preload calls it on a background thread.
+        """
+        with self._client_lock:
+            if self._client is None:
+                self._client = self._initialize_client(*self._client_args)
+    
+    def prepare_in_background(self) -> threading.Thread:
+        """Run ``prepare`` on a daemon thread; a failure is left for the first call to raise."""
+        def prepare():
+            try:
+                self.prepare()
+            except OpenAIServiceError:
+                pass
+        
+        thread = threading.Thread(target=prepare, name="openai-client-init", daemon=True)
+        thread.start()
+        return thread
+    
+    def _initialize_client(self, api_key: str, endpoint: str, api_version: str) -> "AzureOpenAI":
         """Initialize Azure OpenAI client with latest SDK."""
         try:
-            # Extract base endpoint from full endpoint URL
-            if "/openai/deployments/" in endpoint:
-                azure_endpoint = endpoint.split("/openai/deployments/")[0]
-            else:
-                azure_endpoint = endpoint.rstrip("/")
+            from openai import AzureOpenAI
             
             # Use the latest AzureOpenAI client initialization
             return AzureOpenAI(
                 api_key=api_key,
                 api_version=api_version,
-                azure_endpoint=azure_endpoint
+                azure_endpoint=self.azure_endpoint,
+                http_client=self.http_client,
+                **self._client_options()
             )
         except Exception as e:
             logger.error(f"Failed to initialize OpenAI client: {e}")
             raise OpenAIServiceError(f"OpenAI client initialization failed: {e}")
     
-    def chat_completion(self, messages: List[Dict], tools: Optional[List] = None, 
-                       tool_choice: Optional[str] = None, temperature: float = 0.7) -> Dict[str, Any]:
-        """Generate chat completion."""
-        try:
-            params = {
-                "model": self.deployment,
-                "messages": messages,
-                "temperature": temperature
+    def _client_options(self) -> Dict[str, Any]:
+        """Extra SDK client options."""
+        if self.resilience:
+            # Retries are handled by the resilience policy; SDK retries would multiply them
+            return {"max_retries": 0}
+        return {}
+    
+    @staticmethod
+    def _azure_endpoint(endpoint: str) -> str:
+        """Extract base endpoint from full endpoint URL."""
+        if "/openai/deployments/" in endpoint:
+            return endpoint.split("/openai/deployments/")[0]
+        return endpoint.rstrip("/")
+    
+    def has_tier(self, tier: str) -> bool:
+        return tier in self.deployments
+    
+    def deployment_for(self, tier: Optional[str]) -> str:
+        """The deployment serving ``tier``; the default deployment for None or an unknown tier."""
+        return self.deployments.get(tier, self.deployment) if tier else self.deployment
+    
+    def _build_params(self, messages: List[Dict], tools: Optional[List], tool_choice: Optional[str],
+                      temperature: float, stream: bool = False, tier: Optional[str] = None) -> Dict[str, Any]:
+        """Build the chat completions request parameters."""
+        params = {
+            "model": self.deployment_for(tier),
+            "messages": messages,
+            "temperature": temperature
+        }
+        
+        if stream:
+            params["stream"] = True
+            if self.stream_include_usage:
+                # Usage arrives on a final chunk with no choices
+                params["stream_options"] = {"include_usage": True}
+        if tools:
+            params["tools"] = tools
+        if tool_choice:
+            params["tool_choice"] = tool_choice
+        return params
+    
+    @staticmethod
+    def _parse_response(response) -> Dict[str, Any]:
+        """Convert an SDK completion into the service's response dict."""
+        message = response.choices[0].message
+        
+        if hasattr(message, "tool_calls") and message.tool_calls:
+            return {
+                "tool_calls": [{
+                    "id": tc.id,
+                    "function": {
+                        "name": tc.function.name,
+                        "arguments": tc.function.arguments
+                    },
+                    "type": "function"
+                } for tc in message.tool_calls]
             }
-            
-            if tools:
-                params["tools"] = tools
-            if tool_choice:
-                params["tool_choice"] = tool_choice
-            
-            response = self.client.chat.completions.create(**params)
-            message = response.choices[0].message
-            
-            if hasattr(message, "tool_calls") and message.tool_calls:
-                return {
-                    "tool_calls": [{
-                        "id": tc.id,
-                        "function": {
-                            "name": tc.function.name,
-                            "arguments": tc.function.arguments
-                        },
-                        "type": "function"
-                    } for tc in message.tool_calls]
-                }
-            else:
-                return {"content": message.content}
-                
+        else:
+            return {"content": message.content}
+    
+    @staticmethod
+    def _parse_stream_chunk(chunk, tool_calls: Dict[int, Dict]) -> Optional[str]:
+        """Merge a chunk's tool call deltas into ``tool_calls`` and return its text delta."""
+        # Azure sends an initial chunk with prompt filter results and no choices
+        if not chunk.choices:
+            return None
+        delta = chunk.choices[0].delta
+        if delta is None:
+            return None
+        
+        for tc in getattr(delta, "tool_calls", None) or []:
+            entry = tool_calls.setdefault(tc.index, {
+                "id": None,
+                "function": {"name": "", "arguments": ""},
+                "type": "function"
+            })
+            if tc.id:
+                entry["id"] = tc.id
+            if tc.function:
+                if tc.function.name:
+                    entry["function"]["name"] += tc.function.name
+                if tc.function.arguments:
+                    entry["function"]["arguments"] += tc.function.arguments
+        
+        return delta.content or None
+    
+    def _record_usage(self, params: Dict[str, Any], usage, latency_seconds: float,
+                      ticket: Optional[Dict] = None) -> None:
+        """Record a completion's latency and token usage (including cached prompt tokens) for its deployment."""
+        deployment = params["model"]
+        parsed = UsageTracker.parse_usage(usage)
+        cost = 0.0
+        if parsed is not None:
+            tracing.record_usage(deployment, parsed)
+            if self.usage_tracker:
+                self.usage_tracker.record(deployment, parsed, latency_seconds)
+                cost = self.usage_tracker.cost(deployment, parsed)
+            if ticket is not None:
+                self._admission_for(params).settle(ticket, parsed)
+        tracing.record_completion(self._tiers.get(deployment, DEFAULT_TIER), latency_seconds, cost)
+    
+    def _admission_for(self, params: Dict[str, Any]) -> Optional[AdmissionController]:
+        """The admission controller guarding the quota of the call's deployment, if any."""
+        if params["model"] == self.deployment:
+            return self.admission
+        return self._admission_by_deployment.get(params["model"])
+    
+    def _admit(self, params: Dict[str, Any]) -> Optional[Dict]:
+        """Wait for quota when admission control is on; returns the admission ticket."""
+        admission = self._admission_for(params)
+        return admission.acquire(params) if admission else None
+    
+    def _send(self, params: Dict[str, Any]):
+        try:
+            return self.client.chat.completions.create(**params)
+        except Exception as e:
+            admission = self._admission_for(params)
+            if admission and getattr(e, "status_code", None) == 429:
+                # Hold every queued call, in every worker sharing the buckets, until Azure's Retry-After
+                admission.throttled(ResiliencePolicy.retry_after(e))
+            raise
+    
+    def _create(self, params: Dict[str, Any], hedge: bool = True, ticket: Optional[Dict] = None):
+        """Call the chat completions API, through the resilience policy when configured."""
+        if not self.resilience:
+            return self._send(params)
+        return self.resilience.call(self._attempts(params, ticket, self._send), hedge=hedge)
+    
+    def _attempts(self, params: Dict[str, Any], ticket: Optional[Dict], send):
+        """Wrap ``send`` so retries and hedges, which are requests too, are charged to the admitted quota."""
+        attempts = []
+        
+        def attempt():
+            if attempts and ticket is not None:
+                self._admission_for(params).charge(ticket)
+            attempts.append(None)
+            return send(params)
+        return attempt
+    
+    def _complete(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        ticket = self._admit(params)
+        start = time.perf_counter()
+        response = self._create(params, ticket=ticket)
+        self._record_usage(params, getattr(response, "usage", None), time.perf_counter() - start, ticket)
+        return self._parse_response(response)
+    
+    def _flight_namespace(self) -> str:
+        return f"{self.azure_endpoint}|{self.deployment}"
+    
+    def chat_completion(self, messages: List[Dict], tools: Optional[List] = None,
+                       tool_choice: Optional[str] = None, temperature: float = 0.7,
+                       tier: Optional[str] = None) -> Dict[str, Any]:
+        """Generate chat completion on the deployment of ``tier`` (the default deployment if None)."""
+        try:
+            params = self._build_params(messages, tools, tool_choice, temperature, tier=tier)
+            if self.single_flight:
+                # Identical concurrent requests share one upstream call
+                key = self.single_flight.make_key(self._flight_namespace(), params)
+                return self.single_flight.run(key, lambda: self._complete(params))
+            return self._complete(params)
+        
+        except AdmissionRejectedError:
+            raise
         except Exception as e:
             logger.error(f"Error in chat completion: {e}")
             raise OpenAIServiceError(f"Chat completion failed: {e}")
+    
+    def chat_completion_stream(self, messages: List[Dict], tools: Optional[List] = None,
+                               tool_choice: Optional[str] = None, temperature: float = 0.7,
+                               tier: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Generate a streaming chat completion.
+        
+        Yields ``{"content": delta}`` for each text fragment as it arrives. Tool call
+        deltas are assembled across chunks and yielded once, at the end of the stream,
+        as ``{"tool_calls": [...]}`` in the same shape returned by ``chat_completion``.
+        """
+        try:
+            params = self._build_params(messages, tools, tool_choice, temperature, stream=True, tier=tier)
+            ticket = self._admit(params)
+            start = time.perf_counter()
+            # Only the request up to the first byte is retried; a stream is never hedged
+            stream = self._create(params, hedge=False, ticket=ticket)
+            tool_calls: Dict[int, Dict] = {}
+            usage = None
+            
+            for chunk in stream:
+                if getattr(chunk, "usage", None):
+                    usage = chunk.usage
+                content = self._parse_stream_chunk(chunk, tool_calls)
+                if content:
+                    yield {"content": content}
+            self._record_usage(params, usage, time.perf_counter() - start, ticket)
+            
+            if tool_calls:
+                yield {"tool_calls": [tool_calls[index] for index in sorted(tool_calls)]}
+        
+        except AdmissionRejectedError:
+            raise
+        except Exception as e:
+            logger.error(f"Error in streaming chat completion: {e}")
+            raise OpenAIServiceError(f"Streaming chat completion failed: {e}")
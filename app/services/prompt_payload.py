@@ -0,0 +1,44 @@
+import hashlib
+import json
+import logging
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class PromptPayload:
+    """Pre-serialized, byte-stable prompt prefix: the tool schemas and the system prompt.
+    
+    Azure only serves a cached prompt prefix when it is byte-identical to an
+    earlier request, starting from the tools and then the system message. The
+    payload is built once per data version: the system prompt has its line
+    endings and trailing whitespace normalized, the tool schemas are sorted by
+    name with sorted keys, and the same objects are reused on every request so
+    nothing request-specific ever lands inside the prefix.
+    """
+    
+    def __init__(self, system_prompt: str, tools: List[Dict]):
+        self.system_prompt = self._normalize_text(system_prompt)
+        self.tools = self._canonical_tools(tools)
+        self.system_message = {"role": "system", "content": self.system_prompt}
+        self.serialized_prefix = json.dumps(
+            {"tools": self.tools, "messages": [self.system_message]},
+            separators=(",", ":"), ensure_ascii=False
+        )
+        self.fingerprint = hashlib.sha256(self.serialized_prefix.encode("utf-8")).hexdigest()[:16]
+        logger.info(f"Prompt prefix built: {len(self.serialized_prefix)} bytes, fingerprint {self.fingerprint}")
+    
+    @staticmethod
+    def _normalize_text(text: str) -> str:
+        lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+        return "\n".join(line.rstrip() for line in lines).strip() + "\n"
+    
+    @staticmethod
+    def _canonical_tools(tools: List[Dict]) -> List[Dict]:
+        # A JSON round trip with sorted keys pins the key order the SDK will serialize
+        ordered = sorted(tools, key=lambda tool: tool.get("function", {}).get("name", ""))
+        return json.loads(json.dumps(ordered, sort_keys=True))
+    
+    def messages(self, conversation: List[Dict]) -> List[Dict]:
+        """The shared system message followed by the conversation."""
+        return [self.system_message] + conversation
@@ -0,0 +1,288 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.utils.exceptions import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class CircuitBreaker:
+    """Fails fast after repeated upstream failures, probing again after a cool-down.
+    
+    Closed: calls go through. Open: calls are rejected until ``recovery_timeout``
+    has passed. Half-open: a single probe call is let through; success closes the
+    circuit, failure opens it again.
+    """
+    
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+    
+    def allow(self) -> bool:
+        """Return True if a call may proceed."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.recovery_timeout:
+                self.state = "half_open"
+                self._probe_in_flight = False
+            if self.state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+    
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._probe_in_flight = False
+    
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.warning(f"Circuit breaker opened after {self._failures} consecutive failures")
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies, used to pick the hedge delay."""
+    
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+    
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+    
+    def percentile(self, percentile: float, min_samples: int = 1) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percentile))]
+
+
+class ResiliencePolicy:
+    """Retries, hedged requests and a circuit breaker around Azure OpenAI calls.
+    
+    Retries use full-jitter exponential backoff and honour ``Retry-After`` /
+    ``retry-after-ms`` when Azure sends them; a wait longer than ``max_delay`` is
+    not worth holding a chat request for, so the error is raised instead. When
+    hedging is enabled, a duplicate request is fired if the first has not
+    answered within the observed p95 latency, and whichever returns first wins.
+    """
+    
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0,
+                 hedging_enabled: bool = False, hedge_percentile: float = 0.95,
+                 hedge_min_delay: float = 1.0, hedge_min_samples: int = 20, hedge_max_workers: int = 32,
+                 breaker_failure_threshold: int = 5, breaker_recovery_timeout: float = 30.0):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedging_enabled = hedging_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = CircuitBreaker(breaker_failure_threshold, breaker_recovery_timeout)
+        self.latency = LatencyTracker()
+        self._executor = ThreadPoolExecutor(max_workers=hedge_max_workers, thread_name_prefix="hedge") \
+            if hedging_enabled else None
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "attempts": 0, "retries": 0, "failures": 0,
+                       "hedges": 0, "hedge_wins": 0, "rejected_open": 0}
+    
+    def call(self, fn: Callable[[], Any], hedge: bool = True) -> Any:
+        """Run ``fn`` with retries, optional hedging and the circuit breaker."""
+        self._count("calls")
+        for attempt in range(self.max_attempts):
+            self._check_breaker()
+            try:
+                result = self._hedged(fn) if hedge and self._executor else self._timed(fn, record=hedge)
+                self.breaker.record_success()
+                return result
+            except Exception as e:
+                self._handle_failure(e, attempt)
+                time.sleep(self._backoff(attempt, e))
+                self._count("retries")
+    
+    async def call_async(self, fn: Callable[[], Awaitable[Any]], hedge: bool = True) -> Any:
+        """Async counterpart of ``call``; ``fn`` returns a new awaitable each time."""
+        self._count("calls")
+        for attempt in range(self.max_attempts):
+            self._check_breaker()
+            try:
+                result = await (self._hedged_async(fn) if hedge and self.hedging_enabled
+                                else self._timed_async(fn, record=hedge))
+                self.breaker.record_success()
+                return result
+            except Exception as e:
+                self._handle_failure(e, attempt)
+                await asyncio.sleep(self._backoff(attempt, e))
+                self._count("retries")
+    
+    def _check_breaker(self) -> None:
+        if not self.breaker.allow():
+            self._count("rejected_open")
+            raise CircuitOpenError("Azure OpenAI circuit breaker is open; failing fast")
+    
+    def _handle_failure(self, error: Exception, attempt: int) -> None:
+        """Record a failed attempt and re-raise it unless another attempt is worthwhile."""
+        retryable = self.is_retryable(error)
+        if retryable:
+            self.breaker.record_failure()
+        else:
+            # The deployment answered; a bad request says nothing about its health
+            self.breaker.record_success()
+        
+        retry_after = self.retry_after(error)
+        if not retryable or attempt + 1 >= self.max_attempts or (retry_after or 0) > self.max_delay:
+            self._count("failures")
+            raise error
+        logger.warning(f"Azure OpenAI attempt {attempt + 1}/{self.max_attempts} failed, retrying: {error}")
+    
+    def _timed(self, fn: Callable[[], Any], record: bool = True) -> Any:
+        """Run one attempt; ``record`` adds its latency to the hedging window (not for streams)."""
+        self._count("attempts")
+        start = time.perf_counter()
+        result = fn()
+        if record:
+            self.latency.record(time.perf_counter() - start)
+        return result
+    
+    async def _timed_async(self, fn: Callable[[], Awaitable[Any]], record: bool = True) -> Any:
+        self._count("attempts")
+        start = time.perf_counter()
+        result = await fn()
+        if record:
+            self.latency.record(time.perf_counter() - start)
+        return result
+    
+    def hedge_delay(self) -> Optional[float]:
+        """Delay before firing a hedge, or None until enough latencies are known."""
+        p = self.latency.percentile(self.hedge_percentile, self.hedge_min_samples)
+        return None if p is None else max(p, self.hedge_min_delay)
+    
+    def _hedged(self, fn: Callable[[], Any]) -> Any:
+        delay = self.hedge_delay()
+        if delay is None:
+            return self._timed(fn)
+        
+        primary = self._executor.submit(self._timed, fn)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        
+        self._count("hedges")
+        hedge = self._executor.submit(self._timed, fn)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if future is hedge:
+                    self._count("hedge_wins")
+                # The slower request cannot be cancelled mid-flight; its result is discarded
+                return result
+        raise error
+    
+    async def _hedged_async(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        delay = self.hedge_delay()
+        if delay is None:
+            return await self._timed_async(fn)
+        
+        primary = asyncio.ensure_future(self._timed_async(fn))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+        
+        self._count("hedges")
+        hedge = asyncio.ensure_future(self._timed_async(fn))
+        pending = {primary, hedge}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception():
+                        error = task.exception()
+                        continue
+                    if task is hedge:
+                        self._count("hedge_wins")
+                    return task.result()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        # Imported here to keep the SDK off the start-up path; it is loaded by the time a call fails
+        import openai
+        
+        if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+            return True
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code in RETRYABLE_STATUS_CODES
+        return False
+    
+    @staticmethod
+    def retry_after(error: Exception) -> Optional[float]:
+        """Seconds the server asked us to wait, from retry-after-ms or retry-after."""
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None)
+        if not headers:
+            return None
+        for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+            value = headers.get(header)
+            if value is None:
+                continue
+            try:
+                return float(value) * scale
+            except ValueError:
+                # HTTP-date form; fall back to our own backoff
+                continue
+        return None
+    
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        retry_after = self.retry_after(error)
+        if retry_after is not None:
+            # Small jitter so workers told the same Retry-After do not stampede together
+            return retry_after + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+    
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+    
+    def stats(self) -> Dict:
+        """Return retry/hedge/breaker counters and the current latency percentiles."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["breaker_state"] = self.breaker.state
+        stats["p50_seconds"] = self.latency.percentile(0.5)
+        stats["p95_seconds"] = self.latency.percentile(0.95)
+        stats["hedge_delay_seconds"] = self.hedge_delay() if self.hedging_enabled else None
+        return stats
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.,;:]+$")
+
+
+class ResponseCache:
+    """Two-tier cache of chatbot responses keyed on the normalized conversation tail.
+    
+    Tier one is a bounded in-process LRU with a TTL. Tier two is an optional SQLite
+    file shared by every gunicorn worker on the host, so a response generated by one
+    worker can be served by the others.
+    """
+    
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 3600,
+                 tail_messages: int = 4, shared_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.tail_messages = tail_messages
+        self.shared_path = shared_path
+        self.version = ""
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "shared_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        
+        if self.shared_path:
+            self._initialize_shared_store()
+    
+    def _initialize_shared_store(self) -> None:
+        """Create the shared SQLite table if it does not exist."""
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+    
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a short-lived connection that commits on success and always closes."""
+        conn = sqlite3.connect(self.shared_path, timeout=1.0)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    def set_version(self, version: str) -> None:
+        """Set the prompt/tools/data version; entries from other versions stop matching."""
+        if version != self.version:
+            self.version = version
+            # Shared entries carry the version in their key and simply age out
+            with self._lock:
+                self._entries.clear()
+    
+    def make_key(self, chat_history: List[Dict]) -> Optional[str]:
+        """Build the cache key for a conversation, or None if it should not be cached."""
+        if not chat_history or chat_history[-1].get("role") != "user":
+            return None
+        
+        tail = [
+            [message.get("role"), self._normalize(message.get("content") or "")]
+            for message in chat_history[-self.tail_messages:]
+        ]
+        payload = json.dumps([self.version, tail], separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def _normalize(content: str) -> str:
+        """Lowercase, collapse whitespace and drop trailing punctuation."""
+        content = _WHITESPACE.sub(" ", content.strip().lower())
+        return _TRAILING_PUNCTUATION.sub("", content)
+    
+    def get(self, key: str) -> Optional[str]:
+        """Look up a response, checking the in-process tier before the shared store."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[1]
+            if entry:
+                del self._entries[key]
+        
+        response = self._get_shared(key, now)
+        with self._lock:
+            if response is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["shared_hits"] += 1
+            self._store_local(key, response, now)
+        return response
+    
+    def set(self, key: str, response: str) -> None:
+        """Store a response in both tiers."""
+        now = time.time()
+        with self._lock:
+            self._store_local(key, response, now)
+            self._stats["stores"] += 1
+        self._set_shared(key, response, now)
+    
+    def _store_local(self, key: str, response: str, now: float) -> None:
+        self._entries[key] = (now + self.ttl_seconds, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+    
+    def _get_shared(self, key: str, now: float) -> Optional[str]:
+        if not self.shared_path:
+            return None
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT response FROM response_cache WHERE key = ? AND expires_at > ?",
+                    (key, now)
+                ).fetchone()
+            return row[0] if row else None
+        except sqlite3.Error as e:
+            logger.warning(f"Shared response cache read failed: {e}")
+            return None
+    
+    def _set_shared(self, key: str, response: str, now: float) -> None:
+        if not self.shared_path:
+            return
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO response_cache (key, response, expires_at) VALUES (?, ?, ?)",
+                    (key, response, now + self.ttl_seconds)
+                )
+                conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (now,))
+        except sqlite3.Error as e:
+            logger.warning(f"Shared response cache write failed: {e}")
+    
+    def clear(self) -> None:
+        """Drop every cached entry in both tiers."""
+        with self._lock:
+            self._entries.clear()
+        if not self.shared_path:
+            return
+        try:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM response_cache")
+        except sqlite3.Error as e:
+            logger.warning(f"Shared response cache clear failed: {e}")
+    
+    def stats(self) -> Dict:
+        """Return hit/miss counters and the current in-process size."""
+        with self._lock:
+            return dict(self._stats, size=len(self._entries), version=self.version)
@@ -0,0 +1,176 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SessionStore:
+    """Bounded server-side store of conversation histories keyed by session id.
+    
+    Sessions live in an in-process LRU by default. When ``shared_path`` is set they
+    are kept in a SQLite file instead, so every gunicorn worker on the host sees the
+    same conversations. Either way, sessions idle for longer than ``idle_ttl_seconds``
+    are evicted, at most ``max_sessions`` are kept and each keeps only its last
+    ``max_messages`` messages.
+    """
+    
+    def __init__(self, max_sessions: int = 1000, max_messages: int = 50,
+                 idle_ttl_seconds: float = 1800, shared_path: Optional[str] = None):
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.shared_path = shared_path
+        self._sessions: "OrderedDict[str, Tuple[float, List[Dict]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"created": 0, "evicted": 0, "expired": 0}
+        
+        if self.shared_path:
+            self._initialize_shared_store()
+    
+    def _initialize_shared_store(self) -> None:
+        """Create the shared SQLite table if it does not exist."""
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chat_sessions ("
+                "id TEXT PRIMARY KEY, messages TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_sessions_updated ON chat_sessions (updated_at)")
+    
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a short-lived connection that commits on success and always closes."""
+        conn = sqlite3.connect(self.shared_path, timeout=2.0)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def new_id() -> str:
+        """A fresh session id; the session itself is stored by the first ``append``."""
+        return uuid.uuid4().hex
+    
+    def create(self, messages: Optional[List[Dict]] = None) -> str:
+        """Create a session, optionally seeded with prior messages, and return its id."""
+        session_id = self.new_id()
+        messages = self._trim(list(messages or []))
+        now = time.time()
+        
+        if self.shared_path:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT INTO chat_sessions (id, messages, updated_at) VALUES (?, ?, ?)",
+                    (session_id, json.dumps(messages), now)
+                )
+                self._evict_shared(conn, now)
+        else:
+            with self._lock:
+                self._sessions[session_id] = (now, messages)
+                self._evict_local(now)
+        
+        with self._lock:
+            self._stats["created"] += 1
+        return session_id
+    
+    def get_history(self, session_id: str) -> Optional[List[Dict]]:
+        """Return a copy of the session's messages, or None if it is unknown or expired."""
+        cutoff = time.time() - self.idle_ttl_seconds
+        
+        if self.shared_path:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT messages FROM chat_sessions WHERE id = ? AND updated_at > ?",
+                    (session_id, cutoff)
+                ).fetchone()
+            return json.loads(row[0]) if row else None
+        
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if not entry:
+                return None
+            if entry[0] <= cutoff:
+                del self._sessions[session_id]
+                self._stats["expired"] += 1
+                return None
+            return list(entry[1])
+    
+    def append(self, session_id: str, messages: List[Dict]) -> None:
+        """Append messages to a session, creating it if needed, and mark it as recently used."""
+        now = time.time()
+        
+        if self.shared_path:
+            with self._connect() as conn:
+                # Take the write lock up front so concurrent appends cannot interleave
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute("SELECT messages FROM chat_sessions WHERE id = ?", (session_id,)).fetchone()
+                history = json.loads(row[0]) if row else []
+                conn.execute(
+                    "INSERT OR REPLACE INTO chat_sessions (id, messages, updated_at) VALUES (?, ?, ?)",
+                    (session_id, json.dumps(self._trim(history + messages)), now)
+                )
+                if row is None:
+                    self._evict_shared(conn, now)
+            created = row is None
+        else:
+            with self._lock:
+                entry = self._sessions.pop(session_id, None)
+                history = entry[1] if entry else []
+                self._sessions[session_id] = (now, self._trim(history + messages))
+                self._evict_local(now)
+            created = entry is None
+        
+        if created:
+            with self._lock:
+                self._stats["created"] += 1
+    
+    def delete(self, session_id: str) -> None:
+        """Remove a session."""
+        if self.shared_path:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM chat_sessions WHERE id = ?", (session_id,))
+            return
+        
+        with self._lock:
+            self._sessions.pop(session_id, None)
+    
+    def _trim(self, messages: List[Dict]) -> List[Dict]:
+        return messages[-self.max_messages:] if self.max_messages else messages
+    
+    def _evict_local(self, now: float) -> None:
+        """Drop idle sessions, then the least recently used ones above the cap. Caller holds the lock."""
+        cutoff = now - self.idle_ttl_seconds
+        while self._sessions:
+            session_id, (updated_at, _) = next(iter(self._sessions.items()))
+            if updated_at > cutoff and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[session_id]
+            self._stats["expired" if updated_at <= cutoff else "evicted"] += 1
+    
+    def _evict_shared(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM chat_sessions WHERE updated_at <= ?", (now - self.idle_ttl_seconds,))
+        conn.execute(
+            "DELETE FROM chat_sessions WHERE id NOT IN "
+            "(SELECT id FROM chat_sessions ORDER BY updated_at DESC LIMIT ?)",
+            (self.max_sessions,)
+        )
+    
+    def stats(self) -> Dict:
+        """Return session counters and the current number of live sessions."""
+        if self.shared_path:
+            with self._connect() as conn:
+                active = conn.execute("SELECT COUNT(*) FROM chat_sessions").fetchone()[0]
+        else:
+            with self._lock:
+                active = len(self._sessions)
+        
+        with self._lock:
+            return dict(self._stats, active=active)
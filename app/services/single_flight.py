@@ -0,0 +1,299 @@
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, Tuple
+
+from app.utils.exceptions import OpenAIServiceError
+
+logger = logging.getLogger(__name__)
+
+KEY_SCOPES = ("exact", "normalized")
+# Request fields that only change sampling, ignored by the "normalized" scope
+SAMPLING_PARAMS = ("temperature", "top_p", "seed")
+
+
+class _Flight:
+    """One in-process upstream call and the threads waiting on it."""
+    
+    __slots__ = ("done", "result", "error")
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[Dict] = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Coalesces concurrent identical completions into one upstream call.
+    
+    The first caller for a key (the leader) makes the call; callers arriving while
+    it is in flight wait for it and get a copy of its result, or its error. Keys
+    come from the canonical request payload: ``exact`` uses it as sent, while
+    ``normalized`` also case-folds and collapses whitespace in message text and
+    ignores sampling parameters, so near-identical questions share a call too.
+    A waiter gives up after ``timeout_seconds`` and calls Azure itself.
+    
+    With ``shared_path`` set, in-process leaders also coordinate through a SQLite
+    file, so identical calls in different gunicorn workers on the host share one
+    upstream call: one worker claims the key, the others poll for its result.
+    """
+    
+    def __init__(self, scope: str = "exact", timeout_seconds: float = 30.0,
+                 shared_path: Optional[str] = None, poll_interval: float = 0.02):
+        if scope not in KEY_SCOPES:
+            raise ValueError(f"Unknown single-flight key scope '{scope}' (expected one of {KEY_SCOPES})")
+        self.scope = scope
+        self.timeout_seconds = timeout_seconds
+        self.shared_path = shared_path
+        self.poll_interval = poll_interval
+        self._flights: Dict[str, _Flight] = {}
+        self._async_flights: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self._stats = {"upstream_calls": 0, "coalesced": 0, "shared_coalesced": 0, "timeouts": 0, "errors_shared": 0}
+        self._last_sweep = 0.0
+        
+        if self.shared_path:
+            self._initialize_shared_store()
+    
+    def make_key(self, namespace: str, params: Dict[str, Any]) -> str:
+        """Hash the request payload (within ``namespace``, e.g. endpoint and deployment) into a key."""
+        if self.scope == "normalized":
+            params = {name: value for name, value in params.items() if name not in SAMPLING_PARAMS}
+            params["messages"] = [
+                {**message, "content": " ".join(message["content"].lower().split())}
+                if isinstance(message.get("content"), str) else message
+                for message in params.get("messages", [])
+            ]
+        canonical = json.dumps(params, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+        return hashlib.sha256(f"{namespace}\0{canonical}".encode("utf-8")).hexdigest()
+    
+    def run(self, key: str, call: Callable[[], Dict]) -> Dict:
+        """Return ``call()``'s result, sharing it with concurrent callers for the same key."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        
+        if not leader:
+            if not flight.done.wait(self.timeout_seconds):
+                self._count("timeouts")
+                return self._call(call)
+            return self._shared_outcome(flight.result, flight.error)
+        
+        try:
+            flight.result = self._lead(key, call)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+    
+    async def run_async(self, key: str, call: Callable[[], Awaitable[Dict]]) -> Dict:
+        """Asyncio variant of ``run`` for callers on one event loop."""
+        future = self._async_flights.get(key)
+        if future is not None:
+            try:
+                result = await asyncio.wait_for(asyncio.shield(future), self.timeout_seconds)
+            except asyncio.TimeoutError:
+                self._count("timeouts")
+                return await self._call_async(call)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The leader was cancelled, not us
+                return await self._call_async(call)
+            except Exception as e:
+                return self._shared_outcome(None, e)
+            return self._shared_outcome(result, None)
+        
+        future = self._async_flights[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await self._lead_async(key, call)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody may be waiting; retrieving the exception keeps asyncio from logging it
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            self._async_flights.pop(key, None)
+    
+    def _call(self, call: Callable[[], Dict]) -> Dict:
+        self._count("upstream_calls")
+        return call()
+    
+    async def _call_async(self, call: Callable[[], Awaitable[Dict]]) -> Dict:
+        self._count("upstream_calls")
+        return await call()
+    
+    def _shared_outcome(self, result: Optional[Dict], error: Optional[BaseException]) -> Dict:
+        self._count("coalesced")
+        if error is not None:
+            self._count("errors_shared")
+            raise error
+        return copy.deepcopy(result)
+    
+    def _lead(self, key: str, call: Callable[[], Dict]) -> Dict:
+        if not self.shared_path:
+            return self._call(call)
+        
+        owner, leader = self._claim(key)
+        if not leader:
+            deadline = time.monotonic() + self.timeout_seconds
+            while time.monotonic() < deadline:
+                time.sleep(self.poll_interval)
+                outcome, owner = self._poll(key, owner)
+                if outcome is not None:
+                    return self._shared_process_outcome(outcome)
+            self._count("timeouts")
+            return self._call(call)
+        
+        try:
+            result = self._call(call)
+        except Exception as e:
+            self._publish(key, owner, error=str(e))
+            raise
+        self._publish(key, owner, result=result)
+        return result
+    
+    async def _lead_async(self, key: str, call: Callable[[], Awaitable[Dict]]) -> Dict:
+        if not self.shared_path:
+            return await self._call_async(call)
+        
+        # The shared store is SQLite; its busy timeout is waited out on a worker thread, not the event loop
+        owner, leader = await asyncio.to_thread(self._claim, key)
+        if not leader:
+            deadline = time.monotonic() + self.timeout_seconds
+            while time.monotonic() < deadline:
+                await asyncio.sleep(self.poll_interval)
+                outcome, owner = await asyncio.to_thread(self._poll, key, owner)
+                if outcome is not None:
+                    return self._shared_process_outcome(outcome)
+            self._count("timeouts")
+            return await self._call_async(call)
+        
+        try:
+            result = await self._call_async(call)
+        except Exception as e:
+            await asyncio.to_thread(self._publish, key, owner, error=str(e))
+            raise
+        await asyncio.to_thread(self._publish, key, owner, result=result)
+        return result
+    
+    def _shared_process_outcome(self, outcome: Dict) -> Dict:
+        self._count("shared_coalesced")
+        if "error" in outcome:
+            self._count("errors_shared")
+            raise OpenAIServiceError(f"Coalesced completion failed in another worker: {outcome['error']}")
+        return outcome["result"]
+    
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+    
+    # Cross-process coordination
+    
+    def _initialize_shared_store(self) -> None:
+        """Create the shared SQLite table if it does not exist."""
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS single_flight ("
+                "key TEXT PRIMARY KEY, owner TEXT NOT NULL, started_at REAL NOT NULL, "
+                "outcome TEXT, finished_at REAL)"
+            )
+    
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a short-lived connection that commits on success and always closes."""
+        conn = sqlite3.connect(self.shared_path, timeout=2.0)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    def _claim(self, key: str) -> Tuple[str, bool]:
+        """Claim ``key`` unless another worker's call is in flight; returns (owner, whether we lead)."""
+        owner = uuid.uuid4().hex
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                # A finished flight, or one whose leader has gone quiet, is taken over
+                conn.execute(
+                    "INSERT INTO single_flight (key, owner, started_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, started_at = excluded.started_at, "
+                    "outcome = NULL, finished_at = NULL "
+                    "WHERE single_flight.finished_at IS NOT NULL OR single_flight.started_at < ?",
+                    (key, owner, now, now - self.timeout_seconds)
+                )
+                current = conn.execute("SELECT owner FROM single_flight WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Single-flight store unavailable, calling Azure directly: {e}")
+            return owner, True
+        self._sweep(now)
+        return current[0], current[0] == owner
+    
+    def _poll(self, key: str, owner: str) -> Tuple[Optional[Dict], str]:
+        """Return the outcome of ``owner``'s flight once it is published, and the current owner."""
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT owner, outcome FROM single_flight WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error:
+            return None, owner
+        if row is None:
+            return None, owner
+        current, outcome = row
+        if current == owner and outcome is not None:
+            return json.loads(outcome), owner
+        # Another worker took the key over; wait for its flight instead
+        return None, current
+    
+    def _publish(self, key: str, owner: str, result: Optional[Dict] = None, error: Optional[str] = None) -> None:
+        outcome = {"error": error} if error is not None else {"result": result}
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "UPDATE single_flight SET outcome = ?, finished_at = ? WHERE key = ? AND owner = ?",
+                    (json.dumps(outcome), time.time(), key, owner)
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Could not publish single-flight result: {e}")
+    
+    def _sweep(self, now: float) -> None:
+        """Delete long-finished or abandoned flights, at most once a minute per worker."""
+        if now - self._last_sweep < 60:
+            return
+        self._last_sweep = now
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "DELETE FROM single_flight WHERE finished_at < ? OR started_at < ?",
+                    (now - 60, now - 10 * self.timeout_seconds)
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Could not sweep single-flight store: {e}")
+    
+    def stats(self) -> Dict:
+        """Upstream calls made, and calls served by another caller's result in this or another worker."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._flights) + len(self._async_flights)
+        stats["scope"] = self.scope
+        stats["shared"] = bool(self.shared_path)
+        return stats
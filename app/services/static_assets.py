@@ -0,0 +1,199 @@
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+import sys
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+# Only keep a compressed variant when it saves at least this fraction of the bytes
+MIN_COMPRESSION_SAVING = 0.05
+REFERENCE_PATTERN = re.compile(r'(?P<attr>\b(?:href|src))="(?P<path>[^"#?:]+)"')
+
+
+class StaticAsset:
+    """One static file held in memory with its precompressed variants."""
+    
+    def __init__(self, name: str, content: bytes, content_type: str):
+        self.name = name
+        self.content_type = content_type
+        self.digest = hashlib.sha256(content).hexdigest()
+        stem, extension = os.path.splitext(name)
+        self.fingerprinted_name = f"{stem}.{self.digest[:12]}{extension}"
+        self.variants: Dict[str, bytes] = {"identity": content}
+        
+        if content_type.startswith(COMPRESSIBLE_TYPES):
+            candidates = {"gzip": gzip.compress(content, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                candidates["br"] = brotli.compress(content, quality=11)
+            for encoding, compressed in candidates.items():
+                if len(compressed) <= len(content) * (1 - MIN_COMPRESSION_SAVING):
+                    self.variants[encoding] = compressed
+    
+    def etag(self, encoding: str) -> str:
+        # Strong ETags must differ between byte-different representations
+        return f'"{self.digest[:20]}-{encoding}"' if encoding != "identity" else f'"{self.digest[:20]}"'
+
+
+class StaticAssetPipeline:
+    """Serves ``static/`` from memory with precompressed, content-hashed assets.
+    
+    At startup every file is read once, gzip (and brotli, when installed)
+    variants are computed for text types, and each file gets a content-hashed
+    name. HTML pages are rewritten to reference the hashed names, which are
+    served with an ``immutable`` one-year cache lifetime; HTML and unhashed names
+    are served with ``no-cache`` so browsers revalidate them with the strong
+    ETag and get a 304. ``write`` exports the same files, plus a manifest, for a
+    front proxy to serve without touching Python.
+    """
+    
+    def __init__(self, static_folder: str, html_files: Tuple[str, ...] = ("index.html",)):
+        self.static_folder = static_folder
+        self.html_files = html_files
+        self.assets: Dict[str, StaticAsset] = {}
+        self.fingerprinted: Dict[str, StaticAsset] = {}
+        self._build()
+    
+    def _build(self) -> None:
+        contents = {}
+        for root, _, files in os.walk(self.static_folder):
+            for filename in files:
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, self.static_folder).replace(os.sep, "/")
+                with open(path, "rb") as f:
+                    contents[name] = f.read()
+        
+        for name, content in contents.items():
+            if name not in self.html_files:
+                self._add(name, content)
+        # Pages are built last so they can point at the hashed names of everything else
+        for name in self.html_files:
+            if name in contents:
+                self._add(name, self._rewrite_references(name, contents[name]))
+        
+        logger.info(f"Static assets prepared: {len(self.assets)} files, "
+                    f"brotli {'enabled' if brotli is not None else 'unavailable'}")
+    
+    def _add(self, name: str, content: bytes) -> None:
+        content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        if content_type.startswith("text/") or content_type == "application/javascript":
+            content_type += "; charset=utf-8"
+        asset = StaticAsset(name, content, content_type)
+        self.assets[name] = asset
+        self.fingerprinted[asset.fingerprinted_name] = asset
+    
+    def _rewrite_references(self, page: str, content: bytes) -> bytes:
+        base = os.path.dirname(page)
+        
+        def replace(match):
+            path = match.group("path")
+            target = os.path.normpath(os.path.join(base, path)).replace(os.sep, "/")
+            asset = self.assets.get(target.lstrip("/"))
+            if asset is None:
+                return match.group(0)
+            hashed_path = path[:len(path) - len(os.path.basename(path))] + os.path.basename(asset.fingerprinted_name)
+            return f'{match.group("attr")}="{hashed_path}"'
+        
+        return REFERENCE_PATTERN.sub(replace, content.decode("utf-8")).encode("utf-8")
+    
+    def url_for(self, name: str) -> Optional[str]:
+        """Content-hashed URL path for a static file."""
+        asset = self.assets.get(name)
+        return f"/{asset.fingerprinted_name}" if asset else None
+    
+    def serve(self, name: str, accept_encoding: str = "",
+              if_none_match: str = "") -> Optional[Tuple[bytes, int, Dict[str, str]]]:
+        """Return ``(body, status, headers)`` for a static file, or None if there is no such file."""
+        asset = self.fingerprinted.get(name)
+        immutable = asset is not None
+        if asset is None:
+            asset = self.assets.get(name)
+        if asset is None:
+            return None
+        
+        encoding = self._negotiate(asset, accept_encoding)
+        etag = asset.etag(encoding)
+        headers = {
+            "ETag": etag,
+            "Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+            "Vary": "Accept-Encoding"
+        }
+        if etag in self._parse_etags(if_none_match) or if_none_match.strip() == "*":
+            return b"", 304, headers
+        
+        headers["Content-Type"] = asset.content_type
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return asset.variants[encoding], 200, headers
+    
+    @staticmethod
+    def _negotiate(asset: StaticAsset, accept_encoding: str) -> str:
+        accepted = {}
+        for part in accept_encoding.lower().split(","):
+            token, _, params = part.strip().partition(";")
+            quality = 1.0
+            match = re.search(r"q=([0-9.]+)", params)
+            if match:
+                try:
+                    quality = float(match.group(1))
+                except ValueError:
+                    quality = 0.0
+            if token:
+                accepted[token] = quality
+        for encoding in ("br", "gzip"):
+            quality = accepted.get(encoding, accepted.get("*", 0.0))
+            if encoding in asset.variants and quality > 0:
+                return encoding
+        return "identity"
+    
+    @staticmethod
+    def _parse_etags(header: str) -> List[str]:
+        return [tag.strip()[2:] if tag.strip().startswith("W/") else tag.strip() for tag in header.split(",")]
+    
+    def write(self, output_folder: str) -> str:
+        """Write every file under its hashed and original name, with .gz/.br variants and manifest.json.
+        
+        Returns the manifest path. A proxy such as nginx (``gzip_static``/``brotli_static``)
+        can then serve the directory directly, caching the hashed names as immutable.
+        """
+        for asset in self.assets.values():
+            for name in (asset.fingerprinted_name, asset.name):
+                path = os.path.join(output_folder, name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                for encoding, suffix in (("identity", ""), ("gzip", ".gz"), ("br", ".br")):
+                    if encoding in asset.variants:
+                        with open(path + suffix, "wb") as f:
+                            f.write(asset.variants[encoding])
+        
+        manifest_path = os.path.join(output_folder, "manifest.json")
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump({name: asset.fingerprinted_name for name, asset in self.assets.items()}, f, indent=2)
+        return manifest_path
+    
+    def stats(self) -> Dict:
+        """Asset count and total bytes per encoding."""
+        totals: Dict[str, int] = {}
+        for asset in self.assets.values():
+            for encoding in ("identity", "gzip", "br"):
+                body = asset.variants.get(encoding, asset.variants["identity"])
+                totals[encoding] = totals.get(encoding, 0) + len(body)
+        return {"assets": len(self.assets), "brotli": brotli is not None, "bytes": totals}
+
+
+if __name__ == "__main__":
+    # python -m app.services.static_assets static/ build/static/
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m app.services.static_assets STATIC_DIR OUTPUT_DIR")
+    print(f"Wrote {StaticAssetPipeline(sys.argv[1]).write(sys.argv[2])}")
@@ -0,0 +1,191 @@
+import asyncio
+import json
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class Tool:
+    """A function the model can call, with its JSON schema and optional direct-answer template.
+    
+    ``direct_answer_when`` narrows the template to the successful results it
+    returns true for; the others go back to the model.
+    """
+    
+    def __init__(self, name: str, handler: Callable[..., Dict], description: str,
+                 parameters: Dict, direct_answer_template: Optional[str] = None,
+                 direct_answer_when: Optional[Callable[[Dict], bool]] = None):
+        self.name = name
+        self.handler = handler
+        self.description = description
+        self.parameters = parameters
+        self.direct_answer_template = direct_answer_template
+        self.direct_answer_when = direct_answer_when
+    
+    def schema(self) -> Dict:
+        """Tool definition in the OpenAI function calling format."""
+        return {
+            "type": "function",
+            "function": {
+                "name": self.name,
+                "description": self.description,
+                "parameters": self.parameters
+            }
+        }
+
+
+class ToolRegistry:
+    """Registry of callable tools, replacing a hard-coded dispatch chain."""
+    
+    def __init__(self):
+        self._tools: Dict[str, Tool] = {}
+    
+    def register(self, tool: Tool) -> None:
+        self._tools[tool.name] = tool
+    
+    def get(self, name: str) -> Optional[Tool]:
+        return self._tools.get(name)
+    
+    def schemas(self) -> List[Dict]:
+        """Tool definitions for every registered tool, in registration order."""
+        return [tool.schema() for tool in self._tools.values()]
+
+
+class ToolExecutor:
+    """Runs the tool calls from one assistant turn concurrently.
+    
+    Successful results are memoized per (tool, arguments) in a dict owned by the
+    caller, so a multi-round tool loop never runs the same lookup twice; with a
+    memo from ``ToolMemos`` that holds across the turns of a conversation.
+    """
+    
+    def __init__(self, registry: ToolRegistry, max_workers: int = 8):
+        self.registry = registry
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+    
+    @staticmethod
+    def _memo_key(tool_call: Dict) -> Tuple[str, str]:
+        function = tool_call["function"]
+        try:
+            # Canonicalize so {"a":1,"b":2} and {"b": 2, "a": 1} share an entry
+            arguments = json.dumps(json.loads(function["arguments"] or "{}"), sort_keys=True)
+        except (TypeError, ValueError):
+            arguments = function["arguments"]
+        return function["name"], arguments
+    
+    def run_one(self, tool_call: Dict) -> Dict:
+        """Execute a single tool call, converting every failure into an error result."""
+        function_name = tool_call["function"]["name"]
+        tool = self.registry.get(function_name)
+        if tool is None:
+            return {"status": "error", "message": f"Unknown function: {function_name}"}
+        
+        try:
+            function_args = json.loads(tool_call["function"]["arguments"] or "{}")
+        except json.JSONDecodeError as e:
+            logger.error(f"Error parsing tool arguments: {e}")
+            return {"status": "error", "message": "Invalid arguments"}
+        if not isinstance(function_args, dict):
+            return {"status": "error", "message": "Invalid arguments"}
+        
+        try:
+            return tool.handler(**function_args)
+        except TypeError as e:
+            logger.error(f"Bad arguments for tool {function_name}: {e}")
+            return {"status": "error", "message": "Invalid arguments"}
+        except Exception as e:
+            logger.error(f"Tool {function_name} failed: {e}")
+            return {"status": "error", "message": f"Tool '{function_name}' failed"}
+    
+    def run(self, tool_calls: List[Dict], memo: Dict[Tuple[str, str], Dict]) -> List[Dict]:
+        """Execute tool calls in parallel, returning results in call order."""
+        keys, pending = self._pending(tool_calls, memo)
+        
+        if len(pending) == 1:
+            key, tool_call = next(iter(pending.items()))
+            results = {key: self.run_one(tool_call)}
+        else:
+            # Each call runs in a copy of the request's context, so tool logs keep its request id and trace
+            futures = {key: self._executor.submit(copy_context().run, self.run_one, tool_call)
+                       for key, tool_call in pending.items()}
+            results = {key: future.result() for key, future in futures.items()}
+        
+        return self._collect(keys, results, memo)
+    
+    async def run_async(self, tool_calls: List[Dict], memo: Dict[Tuple[str, str], Dict]) -> List[Dict]:
+        """Async counterpart of ``run``; tools run on the thread pool, off the event loop."""
+        keys, pending = self._pending(tool_calls, memo)
+        
+        results = {}
+        if pending:
+            loop = asyncio.get_running_loop()
+            results = dict(zip(pending.keys(), await asyncio.gather(*(
+                loop.run_in_executor(self._executor, copy_context().run, self.run_one, tool_call)
+                for tool_call in pending.values()
+            ))))
+        
+        return self._collect(keys, results, memo)
+    
+    def _pending(self, tool_calls: List[Dict],
+                 memo: Dict[Tuple[str, str], Dict]) -> Tuple[List[Tuple[str, str]], Dict[Tuple[str, str], Dict]]:
+        """Memo keys in call order, and one call per key that still has to run."""
+        keys = [self._memo_key(tool_call) for tool_call in tool_calls]
+        pending = {}
+        for key, tool_call in zip(keys, tool_calls):
+            if key not in memo and key not in pending:
+                pending[key] = tool_call
+        return keys, pending
+    
+    @staticmethod
+    def _collect(keys: List[Tuple[str, str]], results: Dict[Tuple[str, str], Dict],
+                 memo: Dict[Tuple[str, str], Dict]) -> List[Dict]:
+        # Only successes are memoized; a failure may be transient, so a later round or turn runs the tool again
+        for key, result in results.items():
+            if result.get("status") == "success":
+                memo[key] = result
+        return [results[key] if key in results else memo[key] for key in keys]
+
+
+class ToolMemos:
+    """Per-conversation tool memos for ``ToolExecutor``, kept for the most recent conversations.
+    
+    A successful lookup repeated on a later turn of the same conversation is
+    answered from its memo instead of running the tool again. Each memo keeps its newest
+    ``max_entries`` results; ``clear`` drops them all when the data behind the
+    tools changes.
+    """
+    
+    def __init__(self, max_conversations: int = 1000, max_entries: int = 64):
+        self.max_conversations = max_conversations
+        self.max_entries = max_entries
+        self._memos: "OrderedDict[str, Dict[Tuple[str, str], Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, conversation_id: Optional[str]) -> Dict[Tuple[str, str], Dict]:
+        """The memo for a conversation; a fresh one for a request without a conversation id."""
+        if not conversation_id or self.max_conversations <= 0:
+            return {}
+        with self._lock:
+            memo = self._memos.get(conversation_id)
+            if memo is None:
+                memo = self._memos[conversation_id] = {}
+                while len(self._memos) > self.max_conversations:
+                    self._memos.popitem(last=False)
+            else:
+                self._memos.move_to_end(conversation_id)
+                for key in list(memo)[:max(0, len(memo) - self.max_entries)]:
+                    memo.pop(key, None)
+            return memo
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._memos.clear()
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"conversations": len(self._memos), "results": sum(len(memo) for memo in self._memos.values())}
@@ -0,0 +1,278 @@
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current_trace: ContextVar[Optional["RequestTrace"]] = ContextVar("request_trace", default=None)
+
+
+class RequestTrace:
+    """Per-request record of stage durations, token usage and tools called."""
+    
+    __slots__ = ("route", "started", "stages", "tokens", "tools", "tool_calls", "annotations", "completions",
+                 "context")
+    
+    def __init__(self, route: str):
+        self.route = route
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.tokens: Dict[Tuple[str, str], int] = {}
+        self.tools: List[str] = []
+        # Tool calls with their arguments and outcome, including lookups answered without the model
+        self.tool_calls: List[Dict] = []
+        self.annotations: Dict[str, str] = {}
+        # (model tier, seconds, estimated USD cost) per Azure completion
+        self.completions: List[Tuple[str, float, float]] = []
+        # Prompt tokens before and after fitting the history into the budget, and messages summarized
+        self.context: Dict[str, int] = {}
+    
+    def add_stage(self, name: str, seconds: float) -> None:
+        # Repeated stages (e.g. several tool rounds) accumulate
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+    
+    def add_usage(self, deployment: str, usage: Dict[str, int]) -> None:
+        for kind in ("prompt_tokens", "completion_tokens", "cached_tokens"):
+            key = (deployment, kind)
+            self.tokens[key] = self.tokens.get(key, 0) + usage.get(kind, 0)
+    
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+    
+    def server_timing(self) -> str:
+        """Stage durations as a Server-Timing header value, in milliseconds."""
+        entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.stages.items()]
+        entries.append(f"total;dur={self.elapsed() * 1000:.2f}")
+        return ", ".join(entries)
+
+
+def start_trace(route: str) -> RequestTrace:
+    """Begin tracing the current request (thread or asyncio task)."""
+    trace = RequestTrace(route)
+    _current_trace.set(trace)
+    return trace
+
+
+def end_trace() -> None:
+    _current_trace.set(None)
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def trace_stage(name: str):
+    """Time a block as a stage of the current request; a no-op outside a traced request."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_stage(name, time.perf_counter() - start)
+
+
+def record_usage(deployment: str, usage: Optional[Dict[str, int]]) -> None:
+    trace = _current_trace.get()
+    if trace is not None and usage:
+        trace.add_usage(deployment, usage)
+
+
+def record_completion(tier: str, seconds: float, cost_usd: float = 0.0) -> None:
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.completions.append((tier, seconds, cost_usd))
+
+
+def record_tools(names: Iterable[str]) -> None:
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.tools.extend(names)
+
+
+def record_tool_calls(calls: Iterable[Dict]) -> None:
+    """Record ``{"name", "arguments", "status"}`` for each tool call of the current request."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.tool_calls.extend(calls)
+
+
+def record_context(metrics: Dict[str, int]) -> None:
+    """Record the context manager's ``tokens_before``/``tokens_after``/``messages_summarized`` for this request."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.context = dict(metrics)
+
+
+def annotate(**fields: str) -> None:
+    """Attach fields (e.g. how the turn was answered) to the current request's trace."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.annotations.update(fields)
+
+
+class MetricsRegistry:
+    """Aggregates finished request traces into Prometheus histograms and counters.
+    
+    With ``shared_dir`` set, each worker process writes its totals to its own
+    file there (at most every ``flush_interval`` seconds, and before rendering)
+    and ``render`` sums every worker's file, so a scrape through any gunicorn
+    worker sees the whole server.
+    """
+    
+    def __init__(self, shared_dir: Optional[str] = None, flush_interval: float = 1.0):
+        self.shared_dir = shared_dir
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._histograms: Dict[str, Dict] = {}
+        self._counters: Dict[str, float] = {}
+        self._series_names: Dict[Tuple, str] = {}
+        self._last_flush = 0.0
+        if shared_dir:
+            os.makedirs(shared_dir, exist_ok=True)
+    
+    def observe(self, trace: RequestTrace, status: int) -> None:
+        """Fold a finished request into the aggregates."""
+        total = trace.elapsed()
+        with self._lock:
+            self._observe("chatbot_request_duration_seconds", (("route", trace.route),), total)
+            for stage, seconds in trace.stages.items():
+                self._observe("chatbot_stage_duration_seconds", (("stage", stage),), seconds)
+            self._increment("chatbot_requests_total", (("route", trace.route), ("status", status)))
+            for (deployment, kind), count in trace.tokens.items():
+                self._increment("chatbot_tokens_total", (("deployment", deployment), ("kind", kind)), count)
+            for tool in trace.tools:
+                self._increment("chatbot_tool_calls_total", (("tool", tool),))
+            if trace.context:
+                for kind in ("tokens_before", "tokens_after"):
+                    self._increment("chatbot_context_tokens_total", (("kind", kind),), trace.context[kind])
+                if trace.context["messages_summarized"]:
+                    self._increment("chatbot_context_trimmed_total", (("route", trace.route),))
+            for tier, seconds, cost in trace.completions:
+                self._observe("chatbot_completion_duration_seconds", (("tier", tier),), seconds)
+                if cost:
+                    self._increment("chatbot_completion_cost_usd_total", (("tier", tier),), cost)
+        self._maybe_flush()
+    
+    def _series(self, name: str, labels: Tuple[Tuple[str, object], ...]) -> str:
+        # Label sets repeat on every request, so each series name is formatted once
+        key = (name, labels)
+        series = self._series_names.get(key)
+        if series is None:
+            rendered = ",".join(f'{label}="{_escape(value)}"' for label, value in labels)
+            series = self._series_names[key] = f"{name}{{{rendered}}}"
+        return series
+    
+    def _observe(self, name: str, labels: Tuple[Tuple[str, object], ...], value: float) -> None:
+        series = self._series(name, labels)
+        histogram = self._histograms.get(series)
+        if histogram is None:
+            histogram = self._histograms[series] = {"buckets": [0] * (len(DURATION_BUCKETS) + 1), "sum": 0.0, "count": 0}
+        histogram["buckets"][bisect_left(DURATION_BUCKETS, value)] += 1
+        histogram["sum"] += value
+        histogram["count"] += 1
+    
+    def _increment(self, name: str, labels: Tuple[Tuple[str, object], ...], amount: float = 1) -> None:
+        series = self._series(name, labels)
+        self._counters[series] = self._counters.get(series, 0) + amount
+    
+    def _snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "histograms": {series: {"buckets": list(h["buckets"]), "sum": h["sum"], "count": h["count"]}
+                               for series, h in self._histograms.items()},
+                "counters": dict(self._counters)
+            }
+    
+    def _worker_path(self) -> str:
+        return os.path.join(self.shared_dir, f"metrics-{os.getpid()}.json")
+    
+    def _maybe_flush(self, force: bool = False) -> None:
+        if not self.shared_dir:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.flush_interval:
+            return
+        # Threads of one worker share its file; a forced flush (a scrape) waits for the writer
+        if not self._flush_lock.acquire(blocking=force):
+            return
+        try:
+            self._last_flush = now
+            path = self._worker_path()
+            with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+                json.dump(self._snapshot(), f)
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            logger.warning(f"Could not write worker metrics to {self.shared_dir}: {e}")
+        finally:
+            self._flush_lock.release()
+    
+    def _merged(self) -> Dict:
+        if not self.shared_dir:
+            return self._snapshot()
+        
+        self._maybe_flush(force=True)
+        merged = {"histograms": {}, "counters": {}}
+        for path in glob.glob(os.path.join(self.shared_dir, "metrics-*.json")):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for series, histogram in snapshot["histograms"].items():
+                target = merged["histograms"].setdefault(
+                    series, {"buckets": [0] * len(histogram["buckets"]), "sum": 0.0, "count": 0})
+                target["buckets"] = [a + b for a, b in zip(target["buckets"], histogram["buckets"])]
+                target["sum"] += histogram["sum"]
+                target["count"] += histogram["count"]
+            for series, value in snapshot["counters"].items():
+                merged["counters"][series] = merged["counters"].get(series, 0) + value
+        return merged
+    
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        data = self._merged()
+        lines = []
+        emitted = set()
+        
+        for series in sorted(data["histograms"]):
+            histogram = data["histograms"][series]
+            name, labels = series.split("{", 1)
+            labels = labels[:-1]
+            if name not in emitted:
+                emitted.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, count in zip(DURATION_BUCKETS + (float("inf"),), histogram["buckets"]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                separator = "," if labels else ""
+                lines.append(f'{name}_bucket{{{labels}{separator}le="{le}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{labels}}} {histogram['sum']:.6f}")
+            lines.append(f"{name}_count{{{labels}}} {histogram['count']}")
+        
+        for series in sorted(data["counters"]):
+            name = series.split("{", 1)[0]
+            if name not in emitted:
+                emitted.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{series} {data['counters'][series]:.15g}")
+        
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,319 @@
+import argparse
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from app.services.admission import current_request_class
+from app.services.log_pipeline import current_request_id
+from app.services.tracing import RequestTrace
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS turns ("
+    "id INTEGER PRIMARY KEY, created_at REAL NOT NULL, request_id TEXT, conversation_id TEXT, "
+    "user TEXT, priority TEXT, status TEXT NOT NULL, answered_by TEXT, question TEXT, answer TEXT, "
+    "error TEXT, history_messages INTEGER, duration_ms REAL, prompt_tokens INTEGER, "
+    "completion_tokens INTEGER, cached_tokens INTEGER, stages TEXT)",
+    "CREATE INDEX IF NOT EXISTS idx_turns_created ON turns (created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_turns_duration ON turns (duration_ms)",
+    "CREATE INDEX IF NOT EXISTS idx_turns_conversation ON turns (conversation_id, created_at)",
+    "CREATE TABLE IF NOT EXISTS tool_calls ("
+    "turn_id INTEGER NOT NULL REFERENCES turns (id), position INTEGER NOT NULL, name TEXT NOT NULL, "
+    "arguments TEXT, status TEXT, repository_id TEXT)",
+    "CREATE INDEX IF NOT EXISTS idx_tool_calls_turn ON tool_calls (turn_id)",
+    "CREATE INDEX IF NOT EXISTS idx_tool_calls_repository ON tool_calls (repository_id)",
+    "CREATE INDEX IF NOT EXISTS idx_tool_calls_name ON tool_calls (name)"
+)
+
+TURN_COLUMNS = ("created_at", "request_id", "conversation_id", "user", "priority", "status", "answered_by",
+                "question", "answer", "error", "history_messages", "duration_ms", "prompt_tokens",
+                "completion_tokens", "cached_tokens", "stages")
+
+
+class TranscriptStore:
+    """Write-behind store of every answered chat turn, for audits and analytics.
+    
+    ``record`` only puts the turn on a bounded in-memory queue; a background
+    writer inserts turns in batches of up to ``batch_size`` (one transaction
+    each) into a SQLite file in WAL mode, so readers never block it and it
+    never blocks serving. When the queue is full a turn waits at most
+    ``block_seconds`` for room and is then dropped and counted. Workers on a
+    host can share one file. The writer does not survive a fork and is started
+    with ``start`` in the process that serves.
+    
+    The query helpers open their own read-only connection, for offline analysis
+    while the writer keeps going.
+    """
+    
+    def __init__(self, path: str, max_queue: int = 10000, batch_size: int = 200,
+                 flush_interval: float = 1.0, block_seconds: float = 0.0):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.block_seconds = block_seconds
+        self._queue: "queue.Queue[Optional[Dict]]" = queue.Queue(max_queue)
+        self._lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._stats = {"recorded": 0, "written": 0, "dropped": 0, "failed": 0, "batches": 0}
+        
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in SCHEMA:
+                conn.execute(statement)
+    
+    @contextmanager
+    def _connect(self, read_only: bool = False) -> Iterator[sqlite3.Connection]:
+        """Open a short-lived connection that commits on success and always closes."""
+        if read_only:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=5.0)
+        else:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    def record_turn(self, chat_history: List[Dict], turn: Dict, trace: Optional[RequestTrace] = None,
+                    conversation_id: Optional[str] = None) -> bool:
+        """Queue one answered turn, with the timings, tokens and tool calls of its trace."""
+        question = next((message.get("content") for message in reversed(chat_history)
+                         if message.get("role") == "user"), None)
+        priority, user = current_request_class()
+        entry = {
+            "created_at": time.time(),
+            "request_id": current_request_id(),
+            "conversation_id": conversation_id,
+            "user": user,
+            "priority": priority,
+            "status": turn.get("status", "ok"),
+            "question": question,
+            "answer": turn.get("answer"),
+            "error": turn.get("error"),
+            "history_messages": len(chat_history),
+            "tool_calls": []
+        }
+        if trace is not None:
+            entry["duration_ms"] = round(trace.elapsed() * 1000, 1)
+            entry["stages"] = {name: round(seconds * 1000, 2) for name, seconds in trace.stages.items()}
+            entry["answered_by"] = trace.annotations.get("answered_by") or (
+                "model" if "completion" in trace.stages else None)
+            for (_, kind), count in trace.tokens.items():
+                entry[kind] = entry.get(kind, 0) + count
+            entry["tool_calls"] = list(trace.tool_calls)
+            if trace.context:
+                entry["context"] = dict(trace.context)
+        return self.record(entry)
+    
+    def record(self, entry: Dict) -> bool:
+        """Queue a turn for the writer; False when the queue stayed full and it was dropped."""
+        try:
+            if self.block_seconds > 0:
+                self._queue.put(entry, timeout=self.block_seconds)
+            else:
+                self._queue.put_nowait(entry)
+        except queue.Full:
+            with self._lock:
+                self._stats["dropped"] += 1
+            return False
+        with self._lock:
+            self._stats["recorded"] += 1
+        return True
+    
+    def start(self) -> None:
+        """Start the writer thread in this process, if it is not running here already."""
+        with self._lock:
+            if self._writer is not None and self._pid == os.getpid():
+                return
+            self._writer = threading.Thread(target=self._write_loop, name="transcript-writer", daemon=True)
+            self._writer.start()
+            if self._pid is None:
+                atexit.register(self.close)
+            self._pid = os.getpid()
+    
+    def close(self, timeout: float = 5.0) -> None:
+        """Write out what is queued (waiting up to ``timeout`` seconds) and stop the writer."""
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer is None or self._pid != os.getpid():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            logger.warning("Transcript queue still full at shutdown; unwritten turns are lost")
+            return
+        writer.join(timeout)
+    
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until every queued turn has been written; False on timeout."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._queue.unfinished_tasks == 0:
+                return True
+            time.sleep(0.01)
+        return False
+    
+    def _write_loop(self) -> None:
+        conn = sqlite3.connect(self.path, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL with synchronous=NORMAL stays consistent on a crash and fsyncs only at checkpoints
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            while True:
+                batch = self._next_batch()
+                stop = None in batch
+                batch = [entry for entry in batch if entry is not None]
+                if batch:
+                    self._write(conn, batch)
+                for _ in range(len(batch) + stop):
+                    self._queue.task_done()
+                if stop:
+                    return
+        finally:
+            conn.close()
+    
+    def _next_batch(self) -> List[Optional[Dict]]:
+        """Block for the first turn, then take what else is queued, up to ``batch_size``."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size and batch[-1] is not None:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                # Give a trickle of turns a moment to fill the batch, without holding any back for long
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or len(batch) > 1:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=min(remaining, 0.05)))
+                except queue.Empty:
+                    break
+        return batch
+    
+    def _write(self, conn: sqlite3.Connection, batch: List[Dict]) -> None:
+        try:
+            with conn:
+                for entry in batch:
+                    row = [entry.get(column) for column in TURN_COLUMNS]
+                    row[-1] = json.dumps(entry["stages"]) if entry.get("stages") else None
+                    cursor = conn.execute(
+                        f"INSERT INTO turns ({', '.join(TURN_COLUMNS)}) VALUES ({', '.join('?' * len(row))})", row)
+                    conn.executemany(
+                        "INSERT INTO tool_calls (turn_id, position, name, arguments, status, repository_id) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        [(cursor.lastrowid, position, call.get("name"), json.dumps(call.get("arguments")),
+                          call.get("status"), self._repository_id(call.get("arguments")))
+                         for position, call in enumerate(entry["tool_calls"])]
+                    )
+        except sqlite3.Error as e:
+            logger.warning(f"Could not write {len(batch)} transcript turns to {self.path}: {e}")
+            with self._lock:
+                self._stats["failed"] += len(batch)
+            return
+        with self._lock:
+            self._stats["written"] += len(batch)
+            self._stats["batches"] += 1
+    
+    @staticmethod
+    def _repository_id(arguments) -> Optional[str]:
+        if isinstance(arguments, dict) and isinstance(arguments.get("repository_id"), str):
+            return arguments["repository_id"].strip().upper() or None
+        return None
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["queued"] = self._queue.qsize()
+        stats["writing"] = self._writer is not None and self._pid == os.getpid()
+        return stats
+    
+    # Query helpers for offline analysis
+    
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict]:
+        with self._connect(read_only=True) as conn:
+            conn.row_factory = sqlite3.Row
+            return [dict(row) for row in conn.execute(sql, params)]
+    
+    def top_repositories(self, limit: int = 10, since: Optional[float] = None) -> List[Dict]:
+        """Repositories asked about most, from repository lookups by the model or the local router."""
+        return self._query(
+            "SELECT tool_calls.repository_id, COUNT(*) AS lookups, COUNT(DISTINCT turns.id) AS turns "
+            "FROM tool_calls JOIN turns ON turns.id = tool_calls.turn_id "
+            "WHERE tool_calls.repository_id IS NOT NULL AND turns.created_at >= ? "
+            "GROUP BY tool_calls.repository_id ORDER BY lookups DESC LIMIT ?",
+            (since or 0, limit)
+        )
+    
+    def slowest_turns(self, limit: int = 10, since: Optional[float] = None) -> List[Dict]:
+        """The slowest turns, with how they were answered and where the time went."""
+        rows = self._query(
+            "SELECT id, created_at, request_id, answered_by, status, question, duration_ms, stages, "
+            "prompt_tokens, completion_tokens FROM turns "
+            "WHERE duration_ms IS NOT NULL AND created_at >= ? ORDER BY duration_ms DESC LIMIT ?",
+            (since or 0, limit)
+        )
+        for row in rows:
+            row["stages"] = json.loads(row["stages"]) if row["stages"] else {}
+        return rows
+    
+    def tool_usage(self, since: Optional[float] = None) -> List[Dict]:
+        """Calls and failures per tool."""
+        return self._query(
+            "SELECT name, COUNT(*) AS calls, SUM(tool_calls.status IS NOT 'success') AS unsuccessful "
+            "FROM tool_calls JOIN turns ON turns.id = tool_calls.turn_id WHERE turns.created_at >= ? "
+            "GROUP BY name ORDER BY calls DESC",
+            (since or 0,)
+        )
+    
+    def summary(self, since: Optional[float] = None) -> Dict:
+        """Turns, how they were answered, mean latency and tokens."""
+        since = since or 0
+        totals = self._query(
+            "SELECT COUNT(*) AS turns, COUNT(DISTINCT conversation_id) AS conversations, "
+            "ROUND(AVG(duration_ms), 1) AS mean_duration_ms, SUM(prompt_tokens) AS prompt_tokens, "
+            "SUM(completion_tokens) AS completion_tokens, SUM(cached_tokens) AS cached_tokens "
+            "FROM turns WHERE created_at >= ?", (since,)
+        )[0]
+        totals["answered_by"] = {row["answered_by"] or "unknown": row["turns"] for row in self._query(
+            "SELECT answered_by, COUNT(*) AS turns FROM turns WHERE created_at >= ? GROUP BY answered_by",
+            (since,))}
+        totals["statuses"] = {row["status"]: row["turns"] for row in self._query(
+            "SELECT status, COUNT(*) AS turns FROM turns WHERE created_at >= ? GROUP BY status", (since,))}
+        return totals
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Query a transcript database without disturbing the servers writing it.")
+    parser.add_argument("database", help="TRANSCRIPT_PATH of the servers")
+    parser.add_argument("report", choices=("summary", "top-repositories", "slowest-turns", "tool-usage"))
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--hours", type=float, help="only turns from the last N hours")
+    args = parser.parse_args(argv)
+    
+    if not os.path.exists(args.database):
+        parser.error(f"{args.database} does not exist")
+    store = TranscriptStore(args.database)
+    since = time.time() - args.hours * 3600 if args.hours else None
+    reports = {
+        "summary": lambda: store.summary(since),
+        "top-repositories": lambda: store.top_repositories(args.limit, since),
+        "slowest-turns": lambda: store.slowest_turns(args.limit, since),
+        "tool-usage": lambda: store.tool_usage(since)
+    }
+    print(json.dumps(reports[args.report](), indent=2))
+
+
+if __name__ == "__main__":
+    # python -m app.services.transcript_store logs/transcripts.db top-repositories --hours 24
+    main()
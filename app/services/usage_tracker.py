@@ -0,0 +1,81 @@
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class UsageTracker:
+    """Aggregates token usage per deployment, including prompt-cache hits.
+    
+    ``cached_tokens`` comes from ``usage.prompt_tokens_details`` on each response.
+    Latency is split by whether any prompt tokens were served from the cache, so
+    the speed-up from prompt caching can be read off directly. With ``prices``,
+    USD per million (uncached prompt, cached prompt, completion) tokens by
+    deployment, each deployment's spend is estimated too.
+    """
+    
+    def __init__(self, prices: Optional[Dict[str, Tuple[float, float, float]]] = None):
+        self._lock = threading.Lock()
+        self._deployments: Dict[str, Dict[str, Any]] = {}
+        self.prices = dict(prices or {})
+    
+    @staticmethod
+    def parse_usage(usage) -> Optional[Dict[str, int]]:
+        """Convert an SDK usage object into plain token counts."""
+        if usage is None:
+            return None
+        details = getattr(usage, "prompt_tokens_details", None)
+        return {
+            "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+            "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+            "cached_tokens": (getattr(details, "cached_tokens", 0) or 0) if details else 0
+        }
+    
+    def cost(self, deployment: str, usage: Dict[str, int]) -> float:
+        """Estimated USD cost of one completion; 0 for a deployment without a price."""
+        prices = self.prices.get(deployment)
+        if not prices:
+            return 0.0
+        prompt, cached, completion = prices
+        return ((usage["prompt_tokens"] - usage["cached_tokens"]) * prompt + usage["cached_tokens"] * cached
+                + usage["completion_tokens"] * completion) / 1_000_000
+    
+    def record(self, deployment: str, usage: Optional[Dict[str, int]], latency_seconds: float) -> None:
+        """Record one completion's token usage and latency."""
+        if usage is None:
+            return
+        
+        with self._lock:
+            stats = self._deployments.setdefault(deployment, {
+                "requests": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0,
+                "cache_hit_requests": 0, "cache_hit_seconds": 0.0, "cache_miss_seconds": 0.0,
+                "estimated_cost_usd": 0.0
+            })
+            stats["requests"] += 1
+            stats["estimated_cost_usd"] += self.cost(deployment, usage)
+            stats["prompt_tokens"] += usage["prompt_tokens"]
+            stats["cached_tokens"] += usage["cached_tokens"]
+            stats["completion_tokens"] += usage["completion_tokens"]
+            if usage["cached_tokens"]:
+                stats["cache_hit_requests"] += 1
+                stats["cache_hit_seconds"] += latency_seconds
+            else:
+                stats["cache_miss_seconds"] += latency_seconds
+    
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-deployment totals with the cached-token ratio and mean latency by cache outcome."""
+        with self._lock:
+            snapshot = {name: dict(stats) for name, stats in self._deployments.items()}
+        
+        for stats in snapshot.values():
+            hits = stats["cache_hit_requests"]
+            misses = stats["requests"] - hits
+            stats["cached_token_ratio"] = round(stats["cached_tokens"] / stats["prompt_tokens"], 4) \
+                if stats["prompt_tokens"] else 0.0
+            hit_seconds, miss_seconds = stats.pop("cache_hit_seconds"), stats.pop("cache_miss_seconds")
+            stats["mean_cache_hit_seconds"] = round(hit_seconds / hits, 4) if hits else None
+            stats["mean_cache_miss_seconds"] = round(miss_seconds / misses, 4) if misses else None
+            stats["mean_seconds"] = round((hit_seconds + miss_seconds) / stats["requests"], 4)
+            stats["estimated_cost_usd"] = round(stats["estimated_cost_usd"], 6)
+        return snapshot
@@ -5,3 +5,15 @@ class ChatbotServiceError(Exception):
 class OpenAIServiceError(Exception):
     """Custom exception for OpenAI service errors."""
     pass
+
+class CircuitOpenError(OpenAIServiceError):
+    """Raised without calling Azure while the circuit breaker is open."""
+    pass
+
+class AdmissionRejectedError(OpenAIServiceError):
+    """Raised without calling Azure when the quota cannot serve a request before its deadline."""
+    
+    def __init__(self, message: str, retry_after: float, reason: str = "deadline"):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.reason = reason
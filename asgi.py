@@ -0,0 +1,14 @@
+import os
+import logging
+from app.asgi import create_asgi_app
+
+# ASGI entry point, for running the async chat path under an ASGI server, e.g.
+#   gunicorn -k uvicorn.workers.UvicornWorker asgi:application
+# The WSGI entry point (app:application) is unchanged.
+config_name_for_deploy = os.environ.get('FLASK_ENV', 'production')
+
+try:
+    application = create_asgi_app(config_name_for_deploy)
+except Exception as e:
+    logging.error(f"Failed to create ASGI application instance with config '{config_name_for_deploy}': {e}")
+    raise
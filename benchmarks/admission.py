@@ -0,0 +1,121 @@
+"""Overload the mock Azure quota with interactive and batch traffic, with and without admission control.
+
+Interactive users arrive at random at ``--interactive-rate`` per second while
+``--batch-workers`` clients of one batch job call back to back, together
+offering more than the ``--rpm-limit`` quota the mock enforces. Without
+admission control every call goes straight to Azure and retries its 429s; with
+it, calls queue for the quota with interactive turns first, and calls that
+cannot fit in time are turned away at once. Reports, per class, calls answered,
+rejected and failed with their latency, and the 429s Azure sent.
+
+    python benchmarks/admission.py --rpm-limit 120 --interactive-rate 1.5 --batch-workers 6 --duration 20
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_azure import MockAzureServer  # noqa: E402
+
+from app.services.admission import AdmissionController, request_class  # noqa: E402
+from app.services.openai_service import OpenAIService  # noqa: E402
+from app.services.resilience import ResiliencePolicy  # noqa: E402
+from app.utils.exceptions import AdmissionRejectedError, OpenAIServiceError  # noqa: E402
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 1) if ordered else None
+
+
+def scenario(args, admission) -> dict:
+    mock = MockAzureServer(latency=args.latency, tool_call_rate=0.0, seed=args.seed, rpm_limit=args.rpm_limit).start()
+    service = OpenAIService("key", mock.url, "gpt-4o", "2024-07-01-preview",
+                            resilience=ResiliencePolicy(max_attempts=3), admission=admission)
+    outcomes = {"interactive": [], "batch": []}
+    lock = threading.Lock()
+    rng = random.Random(args.seed)
+    stop = time.perf_counter() + args.duration
+
+    def call(priority: str, user: str, number: int) -> str:
+        began = time.perf_counter()
+        try:
+            with request_class(priority, user):
+                service.chat_completion([{"role": "user", "content": f"Question {number} from {user}"}])
+            outcome = "ok"
+        except AdmissionRejectedError:
+            outcome = "rejected"
+        except OpenAIServiceError:
+            outcome = "failed"
+        with lock:
+            outcomes[priority].append((outcome, time.perf_counter() - began))
+        return outcome
+
+    def batch_worker(worker: int) -> None:
+        number = 0
+        while time.perf_counter() < stop:
+            if call("batch", "nightly-eval", worker * 100000 + number) != "ok":
+                # Like a real client, back off after an error rather than spinning
+                time.sleep(1.0)
+            number += 1
+
+    threads = [threading.Thread(target=batch_worker, args=(worker,)) for worker in range(args.batch_workers)]
+    for thread in threads:
+        thread.start()
+    number = 0
+    while time.perf_counter() < stop:
+        time.sleep(rng.expovariate(args.interactive_rate))
+        user = f"user-{rng.randrange(args.users)}"
+        thread = threading.Thread(target=call, args=("interactive", user, number))
+        thread.start()
+        threads.append(thread)
+        number += 1
+    for thread in threads:
+        thread.join()
+    mock.stop()
+
+    report = {"azure_429s": mock.stats()["throttled"]}
+    for priority, results in outcomes.items():
+        by_outcome = {name: [seconds for outcome, seconds in results if outcome == name]
+                      for name in ("ok", "rejected", "failed")}
+        report[priority] = {
+            "calls": len(results),
+            **{name: len(seconds) for name, seconds in by_outcome.items()},
+            "ok_p50_ms": percentile(by_outcome["ok"], 0.5),
+            "ok_p95_ms": percentile(by_outcome["ok"], 0.95),
+            "rejected_p95_ms": percentile(by_outcome["rejected"], 0.95),
+            "failed_p95_ms": percentile(by_outcome["failed"], 0.95)
+        }
+    if admission:
+        report["admission"] = admission.stats()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rpm-limit", type=float, default=120, help="quota enforced by the mock Azure server")
+    parser.add_argument("--interactive-rate", type=float, default=1.5, help="interactive arrivals per second")
+    parser.add_argument("--users", type=int, default=20, help="distinct interactive users")
+    parser.add_argument("--batch-workers", type=int, default=6)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--latency", default="lognormal:0.4,0.3", help="mock Azure latency distribution")
+    parser.add_argument("--interactive-max-wait", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    admission = AdmissionController(rpm_limit=args.rpm_limit, max_wait={"interactive": args.interactive_max_wait})
+    print(json.dumps({
+        "rpm_limit": args.rpm_limit,
+        "without": scenario(args, None),
+        "with": scenario(args, admission)
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Compare chat throughput of the sync (one request per worker) and async paths.
+
+Both paths run the real ChatbotService / OpenAI SDK code against an in-process
+mock transport that answers every completion after a fixed delay, so the
+numbers reflect how many requests each model can keep in flight rather than
+Azure's speed.
+
+    python benchmarks/async_throughput.py --requests 400 --latency 0.25 --workers 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from openai import AsyncAzureOpenAI, AzureOpenAI
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.async_chatbot_service import AsyncChatbotService  # noqa: E402
+from app.services.async_openai_service import AsyncOpenAIService  # noqa: E402
+from app.services.chatbot_service import ChatbotService  # noqa: E402
+from app.services.openai_service import OpenAIService  # noqa: E402
+
+ENDPOINT = "https://benchmark.openai.azure.com"
+API_VERSION = "2024-07-01-preview"
+
+
+def completion_body(index: int) -> dict:
+    return {
+        "id": f"chatcmpl-{index}",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4o",
+        "choices": [{
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {"role": "assistant", "content": "Hello! How can I help you with Informatica access?"}
+        }],
+        "usage": {"prompt_tokens": 900, "completion_tokens": 12, "total_tokens": 912}
+    }
+
+
+def conversation(index: int) -> list:
+    # Unique per request so the response cache never short-circuits the call
+    return [{"role": "user", "content": f"Hello, this is benchmark user {index}"}]
+
+
+def run_sync(total: int, workers: int, latency: float) -> float:
+    def handler(request: httpx.Request) -> httpx.Response:
+        time.sleep(latency)
+        return httpx.Response(200, json=completion_body(0))
+
+    service = OpenAIService("key", ENDPOINT, "gpt-4o", API_VERSION)
+    service.client = AzureOpenAI(
+        api_key="key", api_version=API_VERSION, azure_endpoint=ENDPOINT,
+        http_client=httpx.Client(transport=httpx.MockTransport(handler))
+    )
+    chatbot = ChatbotService(service)
+
+    start = time.perf_counter()
+    # Each thread stands in for one sync gunicorn worker
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(lambda i: chatbot.process_chat(conversation(i)), range(total)))
+    return time.perf_counter() - start
+
+
+async def run_async(total: int, concurrency: int, latency: float) -> float:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        return httpx.Response(200, json=completion_body(0))
+
+    service = AsyncOpenAIService("key", ENDPOINT, "gpt-4o", API_VERSION)
+    service.client = AsyncAzureOpenAI(
+        api_key="key", api_version=API_VERSION, azure_endpoint=ENDPOINT,
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    )
+    chatbot = AsyncChatbotService(service)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(index: int) -> str:
+        async with semaphore:
+            return await chatbot.process_chat(conversation(index))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--latency", type=float, default=0.25, help="simulated Azure latency in seconds")
+    parser.add_argument("--workers", type=int, default=4, help="sync workers to compare against")
+    parser.add_argument("--concurrency", type=int, default=200, help="in-flight requests on the async worker")
+    args = parser.parse_args()
+
+    sync_seconds = run_sync(args.requests, args.workers, args.latency)
+    async_seconds = asyncio.run(run_async(args.requests, args.concurrency, args.latency))
+
+    results = {
+        "requests": args.requests,
+        "latency_s": args.latency,
+        "sync": {"workers": args.workers, "seconds": round(sync_seconds, 3),
+                 "rps": round(args.requests / sync_seconds, 1)},
+        "async": {"workers": 1, "concurrency": args.concurrency, "seconds": round(async_seconds, 3),
+                  "rps": round(args.requests / async_seconds, 1)}
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Measure knowledge index build, load and query latency on a synthetic corpus.
+
+Generates access-article-like documents from a fixed vocabulary, builds the
+BM25 index, round-trips it through the on-disk format and times searches.
+
+    python benchmarks/knowledge_search.py --documents 10000 --queries 2000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.knowledge_index import KnowledgeIndex  # noqa: E402
+
+SYSTEMS = ["informatica", "db2", "yellowbrick", "snowflake", "oracle", "teradata", "tableau", "unix", "vpn", "jira"]
+ENVIRONMENTS = ["development", "qa", "production", "test", "sandbox"]
+ACTIONS = ["read", "write", "admin", "execute", "approve", "provision", "revoke", "renew"]
+FILLER = ("request access group portal ticket approval manager team department policy project "
+          "server repository warehouse role user account onboarding offboarding audit review").split()
+
+
+def synthetic_documents(count: int, seed: int = 7) -> dict:
+    rng = random.Random(seed)
+    documents = {}
+    for index in range(count):
+        system, environment, action = rng.choice(SYSTEMS), rng.choice(ENVIRONMENTS), rng.choice(ACTIONS)
+        body = " ".join(rng.choices(FILLER, k=rng.randint(40, 120)))
+        documents[f"article_{index:05d}"] = {
+            "title": f"{system} {environment} {action} access",
+            "text": f"How to get {action} access to {system} in {environment}. {body} team{index % 500}"
+        }
+    return documents
+
+
+def synthetic_queries(count: int, seed: int = 11) -> list:
+    rng = random.Random(seed)
+    return [f"{rng.choice(ACTIONS)} access {rng.choice(SYSTEMS)} {rng.choice(ENVIRONMENTS)} team{rng.randrange(500)}"
+            for _ in range(count)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    documents = synthetic_documents(args.documents)
+
+    start = time.perf_counter()
+    index = KnowledgeIndex.build(documents)
+    build_seconds = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "kb_index.json")
+        start = time.perf_counter()
+        index.save(path)
+        save_seconds = time.perf_counter() - start
+        size_bytes = os.path.getsize(path)
+
+        start = time.perf_counter()
+        index = KnowledgeIndex.load(path)
+        load_seconds = time.perf_counter() - start
+
+    latencies = []
+    for query in synthetic_queries(args.queries):
+        start = time.perf_counter()
+        index.search(query, args.k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+
+    results = {
+        "documents": args.documents,
+        "terms": len(index.postings),
+        "build_s": round(build_seconds, 3),
+        "save_s": round(save_seconds, 3),
+        "load_s": round(load_seconds, 3),
+        "index_mb": round(size_bytes / 1e6, 1),
+        "queries": args.queries,
+        "query_ms": {
+            "mean": round(statistics.mean(latencies), 3),
+            "p50": round(latencies[len(latencies) // 2], 3),
+            "p95": round(latencies[int(len(latencies) * 0.95)], 3),
+            "p99": round(latencies[int(len(latencies) * 0.99)], 3)
+        }
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+"""Load-test /api/chat under gunicorn against the local mock Azure OpenAI server.
+
+For every worker class and worker count, the application is started under
+gunicorn with AZURE_OPENAI_ENDPOINT pointed at benchmarks/mock_azure.py, and
+``--concurrency`` clients replay multi-turn conversations (each reply is fed
+back into the next turn's history) for ``--duration`` seconds after a warm-up.
+Conversations come from a built-in set or from a JSON-lines file: a line with
+``messages`` replays its user turns, otherwise its ``message``/``content``/
+``text``/``title``/``body`` field is sent as a single turn, so a file such as
+requests.jsonl can seed the replay.
+
+Reported per run: requests per second, p50/p95/p99 latency (and time to first
+token for streams), errors, worker utilization and the server's mean time per
+stage from /metrics. Busy utilization is the request time the workers
+themselves recorded in /metrics during the window over the worker slots
+(workers x threads); async workers report the mean requests in flight per worker
+instead. CPU utilization is read from /proc on Linux. Everything runs offline.
+
+    python benchmarks/load_test.py --worker-class sync gthread uvicorn --workers 1 2 4 --duration 20
+"""
+import argparse
+import importlib.util
+import json
+import os
+import random
+import re
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_azure import MockAzureServer  # noqa: E402
+
+# name -> (gunicorn worker class, application, module the worker class needs)
+WORKER_CLASSES = {
+    "sync": ("sync", "app:create_app()", None),
+    "gthread": ("gthread", "app:create_app()", None),
+    "gevent": ("gevent", "app:create_app()", "gevent"),
+    "uvicorn": ("uvicorn.workers.UvicornWorker", "asgi:application", "uvicorn")
+}
+ASYNC_WORKER_CLASSES = ("gevent", "uvicorn")
+CONVERSATIONS = [
+    ["Hi", "I'm a new user and need access to Informatica", "Yes, I have UNIX enabled",
+     "Which groups do I need for D1?", "Thanks!"],
+    ["What access groups do I need for Q3?", "And what about P1?"],
+    ["How do I request access through myAccess?", "How long does approval usually take?",
+     "Who approves production access?"],
+    ["Which repositories does ZNA_INFA_PC_D1_RWX give me?"],
+    ["I need to run workflows in the QA repository, what should I ask for?",
+     "Is that different from development?"],
+    ["hello", "what groups for D2", "thank you"]
+]
+TEXT_FIELDS = ("message", "content", "text", "title", "body")
+METRIC_PATTERN = re.compile(r'^chatbot_(stage|request)_duration_seconds_(sum|count)\{(?:stage|route)="([^"]+)"\} (\S+)$')
+
+
+def load_conversations(path: Optional[str]) -> List[List[str]]:
+    """User turns per conversation, from a JSON-lines file or the built-in set."""
+    if not path:
+        return CONVERSATIONS
+    conversations = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if isinstance(record.get("messages"), list):
+                turns = [m.get("content", "") for m in record["messages"] if m.get("role") == "user"]
+            else:
+                turns = [next((str(record[field]) for field in TEXT_FIELDS if record.get(field)), "")]
+            turns = [turn for turn in turns if turn.strip()]
+            if turns:
+                conversations.append(turns)
+    if not conversations:
+        raise SystemExit(f"No conversations found in {path}")
+    return conversations
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+class ProcessCpu:
+    """CPU seconds used by gunicorn's workers, read from /proc (Linux only)."""
+
+    def __init__(self, master_pid: int):
+        self.master_pid = master_pid
+        self.ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+    def worker_seconds(self) -> Optional[float]:
+        try:
+            with open(f"/proc/{self.master_pid}/task/{self.master_pid}/children") as f:
+                pids = f.read().split()
+            total = 0
+            for pid in pids:
+                with open(f"/proc/{pid}/stat") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+                total += int(fields[11]) + int(fields[12])
+            return total / self.ticks
+        except (OSError, ValueError, IndexError):
+            return None
+
+
+class LoadGenerator:
+    """Clients replaying conversations against one running server."""
+
+    def __init__(self, base_url: str, conversations: List[List[str]], concurrency: int,
+                 stream_fraction: float, use_cache: bool, seed: int):
+        self.base_url = base_url
+        self.conversations = conversations
+        self.concurrency = concurrency
+        self.stream_fraction = stream_fraction
+        self.use_cache = use_cache
+        self.rng = random.Random(seed)
+        self.samples: List[Dict] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._next = 0
+        self._threads: List[threading.Thread] = []
+        self.started = 0.0
+
+    def start(self) -> None:
+        self.started = time.perf_counter()
+        for index in range(self.concurrency):
+            thread = threading.Thread(target=self._client, args=(index,), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=60)
+
+    def _conversation(self) -> List[str]:
+        with self._lock:
+            conversation = self.conversations[self._next % len(self.conversations)]
+            self._next += 1
+            return conversation
+
+    def _client(self, index: int) -> None:
+        rng = random.Random(self.rng.random() + index)
+        with httpx.Client(base_url=self.base_url, timeout=120) as http:
+            while not self._stop.is_set():
+                history = []
+                for turn in self._conversation():
+                    if self._stop.is_set():
+                        return
+                    history.append({"role": "user", "content": turn})
+                    reply = self._send(http, history, rng.random() < self.stream_fraction)
+                    if reply is None:
+                        break
+                    history.append({"role": "assistant", "content": reply})
+
+    def _send(self, http: httpx.Client, history: List[Dict], stream: bool) -> Optional[str]:
+        payload = {"messages": history, "cache": self.use_cache}
+        start = time.perf_counter()
+        first_token, reply, status = None, None, 0
+        try:
+            if stream:
+                parts = []
+                with http.stream("POST", "/api/chat/stream", json=payload) as response:
+                    status = response.status_code
+                    for line in response.iter_lines():
+                        if line.startswith("data: ") and '"content"' in line:
+                            first_token = first_token or time.perf_counter()
+                            parts.append(json.loads(line[6:])["content"])
+                reply = "".join(parts)
+            else:
+                response = http.post("/api/chat", json=payload)
+                status = response.status_code
+                reply = response.json()["choices"][0]["message"]["content"]
+        except (httpx.HTTPError, ValueError, KeyError):
+            reply = None
+        end = time.perf_counter()
+        with self._lock:
+            self.samples.append({
+                "start": start - self.started,
+                "end": end - self.started,
+                "ttft": first_token - start if first_token else None,
+                "ok": status == 200 and reply is not None,
+                "stream": stream
+            })
+        return reply if status == 200 else None
+
+
+def scrape_metrics(base_url: str) -> Dict:
+    """Seconds spent serving chat requests so far, and the mean time per stage, from /metrics.
+    
+    Workers publish their totals at most once a second, so the busy time lags by up to that much.
+    """
+    try:
+        text = httpx.get(f"{base_url}/metrics", timeout=10).text
+    except httpx.HTTPError:
+        return {"busy_seconds": None, "stage_mean_ms": {}}
+    busy, sums, counts = 0.0, {}, {}
+    for line in text.splitlines():
+        match = METRIC_PATTERN.match(line)
+        if not match:
+            continue
+        metric, kind, label, value = match.groups()
+        if metric == "request":
+            busy += float(value) if kind == "sum" else 0.0
+        else:
+            (sums if kind == "sum" else counts)[label] = float(value)
+    return {
+        "busy_seconds": busy,
+        "stage_mean_ms": {stage: ms(sums[stage] / counts[stage]) for stage in sorted(sums) if counts.get(stage)}
+    }
+
+
+def wait_until_healthy(base_url: str, process: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {process.returncode}")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{base_url} did not become healthy within {timeout:.0f}s")
+
+
+def run(worker_class: str, workers: int, args, mock: MockAzureServer,
+        conversations: List[List[str]]) -> Dict:
+    gunicorn_class, application, requirement = WORKER_CLASSES[worker_class]
+    result = {"worker_class": worker_class, "workers": workers,
+              "threads": args.threads if worker_class == "gthread" else 1}
+    if requirement and importlib.util.find_spec(requirement) is None:
+        result["skipped"] = f"{requirement} is not installed"
+        return result
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ,
+               AZURE_OPENAI_ENDPOINT=mock.url,
+               OPENAI_API_KEY="benchmark",
+               LOG_LEVEL="WARNING",
+               METRICS_SHARED_DIR=tempfile.mkdtemp(prefix="load-test-metrics-"))
+    command = [sys.executable, "-m", "gunicorn", "--chdir", ROOT, "--bind", f"127.0.0.1:{port}",
+               "--workers", str(workers), "--worker-class", gunicorn_class, "--threads", str(result["threads"]),
+               "--backlog", "2048", "--timeout", "120", "--log-level", "warning", application]
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL)
+    try:
+        wait_until_healthy(base_url, process)
+        load = LoadGenerator(base_url, conversations, args.concurrency, args.stream_fraction,
+                             args.cache, args.seed)
+        cpu = ProcessCpu(process.pid)
+        load.start()
+        time.sleep(args.warmup)
+        cpu_start, metrics_start = cpu.worker_seconds(), scrape_metrics(base_url)
+        time.sleep(args.duration)
+        cpu_end, metrics_end = cpu.worker_seconds(), scrape_metrics(base_url)
+        load.stop()
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    window_start, window_end = args.warmup, args.warmup + args.duration
+    completed = [s for s in load.samples if window_start <= s["end"] <= window_end]
+    ok = [s for s in completed if s["ok"]]
+    latencies = [s["end"] - s["start"] for s in ok]
+    ttfts = [s["ttft"] for s in ok if s["stream"] and s["ttft"] is not None]
+    busy = None
+    if metrics_start["busy_seconds"] is not None and metrics_end["busy_seconds"] is not None:
+        busy = metrics_end["busy_seconds"] - metrics_start["busy_seconds"]
+
+    result.update({
+        "requests": len(completed),
+        "errors": len(completed) - len(ok),
+        "rps": round(len(ok) / args.duration, 1),
+        "p50_ms": ms(percentile(latencies, 0.50)),
+        "p95_ms": ms(percentile(latencies, 0.95)),
+        "p99_ms": ms(percentile(latencies, 0.99)),
+        "stream_ttft_p50_ms": ms(percentile(ttfts, 0.50)),
+        "cpu_utilization": round((cpu_end - cpu_start) / (args.duration * workers), 3)
+        if cpu_start is not None and cpu_end is not None else None,
+        "server_stage_mean_ms": metrics_end["stage_mean_ms"]
+    })
+    if busy is not None and worker_class in ASYNC_WORKER_CLASSES:
+        result["mean_in_flight_per_worker"] = round(busy / (args.duration * workers), 2)
+    elif busy is not None:
+        result["busy_utilization"] = round(min(1.0, busy / (args.duration * workers * result["threads"])), 3)
+    return result
+
+
+def markdown(report: Dict) -> str:
+    lines = [
+        f"Load test: {report['concurrency']} clients, {report['duration_s']}s, "
+        f"mock latency `{report['mock']['latency']}`, tool-call rate {report['mock']['tool_call_rate']}",
+        "",
+        "| worker class | workers | threads | RPS | p50 ms | p95 ms | p99 ms | errors | busy | CPU |",
+        "|---|---|---|---|---|---|---|---|---|---|"
+    ]
+    for run_result in report["runs"]:
+        if "skipped" in run_result:
+            lines.append(f"| {run_result['worker_class']} | {run_result['workers']} | "
+                         f"{run_result['threads']} | skipped: {run_result['skipped']} ||||||| ")
+            continue
+        busy = run_result.get("busy_utilization", f"{run_result.get('mean_in_flight_per_worker')}/worker")
+        lines.append("| {worker_class} | {workers} | {threads} | {rps} | {p50_ms} | {p95_ms} | {p99_ms} | "
+                     "{errors} | {busy} | {cpu} |".format(busy=busy, cpu=run_result["cpu_utilization"], **run_result))
+    return "\n".join(lines) + "\n"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--worker-class", nargs="+", default=["sync", "gthread"], choices=sorted(WORKER_CLASSES))
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--threads", type=int, default=4, help="threads per gthread worker")
+    parser.add_argument("--concurrency", type=int, default=16, help="simulated clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per run")
+    parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds before each run")
+    parser.add_argument("--stream-fraction", type=float, default=0.2, help="share of turns sent to /api/chat/stream")
+    parser.add_argument("--cache", action="store_true", help="let repeated turns hit the response cache")
+    parser.add_argument("--conversations", help="JSON-lines file of conversations to replay")
+    parser.add_argument("--latency", default="lognormal:0.35,0.4", help="mock Azure latency distribution")
+    parser.add_argument("--tool-call-rate", type=float, default=0.3)
+    parser.add_argument("--token-interval", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--markdown", help="write a Markdown summary table here")
+    args = parser.parse_args()
+
+    conversations = load_conversations(args.conversations)
+    mock = MockAzureServer(latency=args.latency, tool_call_rate=args.tool_call_rate,
+                           token_interval=args.token_interval, seed=args.seed).start()
+    report = {
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "conversations": len(conversations),
+        "mock": {"latency": args.latency, "tool_call_rate": args.tool_call_rate},
+        "runs": []
+    }
+    try:
+        for worker_class in args.worker_class:
+            for workers in args.workers:
+                report["runs"].append(run(worker_class, workers, args, mock, conversations))
+                print(json.dumps(report["runs"][-1]), file=sys.stderr)
+    finally:
+        mock.stop()
+    report["mock"]["served"] = mock.stats()
+
+    for path, content in ((args.output, json.dumps(report, indent=2)), (args.markdown, markdown(report))):
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(content)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Measure what logging adds to each request under load, synchronous handlers versus the queued pipeline.
+
+``--concurrency`` threads each run ``--requests`` simulated requests: a little
+CPU work, a wait standing in for the Azure call, and the records one chat turn
+logs (a knowledge base and a repository lookup, the Azure call and the access
+line). Every configuration writes to the same kind of stream, which stalls for
+``--stall-ms`` on one write in ``--stall-every``, like a busy disk or a full pipe:
+
+- off: no handler, records below WARNING are discarded (the floor)
+- sync: a plain handler as logging.basicConfig sets up, f-string messages, written on the request thread
+- pipeline: app.services.log_pipeline, JSON lines written by the background thread
+- pipeline_sampled: the same keeping ``--sample-rate`` of INFO requests
+
+Reports per-request latency (mean, p50, p99, max) and its overhead over ``off``,
+records written and dropped, and how long the writer needed to drain afterwards.
+
+    python benchmarks/logging_overhead.py --concurrency 16 --requests 2000 --stall-ms 20 --stall-every 500
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.log_pipeline import LogPipeline, bind_request, log_access, new_request_id, unbind_request  # noqa: E402
+
+CONFIGURATIONS = ("off", "sync", "pipeline", "pipeline_sampled")
+
+
+class StallingStream:
+    """A write-only stream that discards its input and sleeps on every ``stall_every``-th write."""
+
+    def __init__(self, stall_ms: float, stall_every: int):
+        self.stall_seconds = stall_ms / 1000
+        self.stall_every = stall_every
+        self.writes = 0
+        self._lock = threading.Lock()
+
+    def write(self, text: str) -> int:
+        with self._lock:
+            self.writes += 1
+            stall = self.stall_every and self.writes % self.stall_every == 0
+        if stall:
+            time.sleep(self.stall_seconds)
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def simulated_request(number: int, work_us: float, io_ms: float, lazy: bool) -> None:
+    chat_logger = logging.getLogger("app.services.chatbot_service")
+    http_logger = logging.getLogger("httpx")
+    deadline = time.perf_counter() + work_us / 1_000_000
+    while time.perf_counter() < deadline:
+        pass
+    query_key, repository_id = f"access_request_{number % 40}", f"D{number % 4}"
+    if lazy:
+        chat_logger.info("Knowledge base lookup: %s", query_key)
+        chat_logger.info("Repository lookup: %s", repository_id)
+        time.sleep(io_ms / 1000)
+        http_logger.info('HTTP Request: %s %s "%s %d %s"', "POST", "https://example.openai.azure.com/openai",
+                         "HTTP/1.1", 200, "OK")
+    else:
+        chat_logger.info(f"Knowledge base lookup: {query_key}")
+        chat_logger.info(f"Repository lookup: {repository_id}")
+        time.sleep(io_ms / 1000)
+        http_logger.info('HTTP Request: POST https://example.openai.azure.com/openai "HTTP/1.1 200 OK"')
+
+
+def configure(name: str, stream: StallingStream, args):
+    """Install a configuration on the root logger; returns the pipeline, if any."""
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    if name == "off":
+        root.setLevel(logging.WARNING)
+        return None
+    if name == "sync":
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+        root.addHandler(handler)
+        root.setLevel(logging.INFO)
+        return None
+    rates = {"INFO": args.sample_rate} if name == "pipeline_sampled" else None
+    pipeline = LogPipeline(level="INFO", sample_rates=rates, queue_size=args.queue_size)
+    pipeline.handlers[0].setStream(stream)
+    return pipeline.install()
+
+
+def run(name: str, args) -> dict:
+    stream = StallingStream(args.stall_ms, args.stall_every)
+    pipeline = configure(name, stream, args)
+    lazy = name.startswith("pipeline")
+    latencies = [[] for _ in range(args.concurrency)]
+
+    def client(index: int) -> None:
+        for number in range(args.requests):
+            start = time.perf_counter()
+            if lazy:
+                tokens = bind_request(new_request_id())
+                try:
+                    simulated_request(number, args.work_us, args.io_ms, lazy)
+                finally:
+                    log_access("POST", "/api/chat", 200)
+                    unbind_request(tokens)
+            else:
+                simulated_request(number, args.work_us, args.io_ms, lazy)
+                if name == "sync":
+                    logging.getLogger("app.access").info("POST /api/chat 200")
+            latencies[index].append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    result = {"wall_seconds": round(wall, 3)}
+    if pipeline:
+        stats = pipeline.stats()
+        drain_started = time.perf_counter()
+        pipeline.stop()
+        result.update(drain_seconds=round(time.perf_counter() - drain_started, 3),
+                      dropped=stats["dropped"], sampled_out=stats["sampled_out"])
+    samples = [seconds for thread_latencies in latencies for seconds in thread_latencies]
+    result.update({
+        "records_written": stream.writes,
+        "mean_us": round(statistics.mean(samples) * 1e6, 1),
+        "p50_us": round(percentile(samples, 0.50) * 1e6, 1),
+        "p99_us": round(percentile(samples, 0.99) * 1e6, 1),
+        "max_us": round(max(samples) * 1e6, 1)
+    })
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2000, help="requests per thread")
+    parser.add_argument("--work-us", type=float, default=50, help="CPU work per request besides logging")
+    parser.add_argument("--io-ms", type=float, default=5, help="wait per request standing in for the Azure call")
+    parser.add_argument("--stall-ms", type=float, default=20, help="length of one write stall")
+    parser.add_argument("--stall-every", type=int, default=500, help="writes between stalls (0 = never)")
+    parser.add_argument("--sample-rate", type=float, default=0.1, help="share of INFO requests kept when sampled")
+    parser.add_argument("--queue-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    results = {name: run(name, args) for name in CONFIGURATIONS}
+    for name in CONFIGURATIONS[1:]:
+        for key in ("mean_us", "p99_us"):
+            results[name][f"{key[:-3]}_overhead_us"] = round(results[name][key] - results["off"][key], 1)
+    print(json.dumps({"concurrency": args.concurrency, "requests_per_thread": args.requests,
+                      "stall_ms": args.stall_ms, "stall_every": args.stall_every, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
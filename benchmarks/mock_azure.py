@@ -0,0 +1,337 @@
+"""Local stand-in for the Azure OpenAI chat-completions API, for offline load tests.
+
+Answers ``POST /openai/deployments/<deployment>/chat/completions`` the way Azure
+does, both as a single JSON body and as a Server-Sent Events stream, after a
+latency drawn from a configurable distribution. A share of the turns that offer
+tools are answered with a tool call (arguments filled from the user's message),
+so the tool round trip is exercised too. Usage includes cached prompt tokens,
+counted in 128-token blocks once the prompt reaches 1024 tokens as Azure does.
+
+With ``--rpm-limit`` it enforces a requests-per-minute quota the way Azure
+does, over 10-second windows, answering 429 with ``retry-after-ms`` beyond it.
+
+``--deployment-latency NAME=SPEC`` gives a deployment (e.g. a mini model) its
+own latency distribution, and ``--malformed-tool-call-rate NAME=RATE`` makes
+that share of its tool calls unusable (truncated JSON arguments), as a smaller
+model's occasionally are.
+
+Latency specs: ``fixed:0.3``, ``uniform:0.1,0.6``, ``lognormal:0.35,0.4``
+(median seconds, sigma) or ``exponential:0.3`` (mean seconds). In a stream the
+sampled latency is the time to first token, followed by one token every
+``--token-interval`` seconds.
+
+    python benchmarks/mock_azure.py --port 8900 --latency lognormal:0.35,0.4 --tool-call-rate 0.3 \
+        --deployment-latency gpt-4o-mini=lognormal:0.12,0.35 --malformed-tool-call-rate gpt-4o-mini=0.05
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+REPLIES = [
+    "For repository {repository} you need the myAccess groups listed for it; request them through the "
+    "Service Portal and your manager approves the request.",
+    "New users first need UNIX enabled on their account. Once that is done, request the Informatica "
+    "repository groups for your team in myAccess.",
+    "Development and QA repositories usually have more flexible access than Production. Tell me the "
+    "repository ID, for example D1 or Q3, and I will list its groups.",
+    "Approval normally takes one to two business days. You can follow the request status in myAccess."
+]
+REPOSITORY_PATTERN = re.compile(r"\b([DQTP][1-9][0-9]?)\b", re.IGNORECASE)
+
+
+class LatencyDistribution:
+    """Samples response latencies (seconds) from a ``kind:params`` spec."""
+
+    def __init__(self, spec: str, rng: random.Random):
+        kind, _, params = spec.partition(":")
+        self.kind = kind
+        self.params = [float(value) for value in params.split(",") if value]
+        self.rng = rng
+        if kind not in ("fixed", "uniform", "lognormal", "exponential"):
+            raise ValueError(f"Unknown latency distribution '{spec}'")
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return self.rng.uniform(self.params[0], self.params[1])
+        if self.kind == "lognormal":
+            return self.rng.lognormvariate(math.log(self.params[0]), self.params[1])
+        return self.rng.expovariate(1.0 / self.params[0])
+
+
+class MockAzureServer:
+    """Threaded HTTP server emulating Azure OpenAI chat completions."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: str = "lognormal:0.35,0.4",
+                 tool_call_rate: float = 0.3, token_interval: float = 0.01, seed: int = 7,
+                 rpm_limit: float = 0, deployment_latency: Optional[Dict[str, str]] = None,
+                 malformed_tool_call_rate: Optional[Dict[str, float]] = None):
+        self.rng = random.Random(seed)
+        self.latency = LatencyDistribution(latency, self.rng)
+        self.deployment_latency = {name: LatencyDistribution(spec, self.rng)
+                                   for name, spec in (deployment_latency or {}).items()}
+        self.malformed_tool_call_rate = dict(malformed_tool_call_rate or {})
+        self._by_deployment: Dict[str, int] = {}
+        self.tool_call_rate = tool_call_rate
+        self.token_interval = token_interval
+        self._lock = threading.Lock()
+        self._stats = {"completions": 0, "streamed": 0, "tool_calls": 0, "throttled": 0}
+        # Token bucket holding 10 seconds of the quota
+        self.rpm_limit = rpm_limit
+        self._quota = rpm_limit / 6.0
+        self._quota_updated = time.monotonic()
+
+        server = self
+
+        class Handler(_CompletionHandler):
+            mock = server
+
+        self.httpd = _Server((host, port), Handler)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockAzureServer":
+        """Serve on a background thread."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-azure", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._stats)
+            if self.deployment_latency:
+                stats["by_deployment"] = dict(self._by_deployment)
+            return stats
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def admit(self) -> float:
+        """Take one request from the quota; returns 0, or the seconds until one is available."""
+        if not self.rpm_limit:
+            return 0.0
+        rate = self.rpm_limit / 60.0
+        with self._lock:
+            now = time.monotonic()
+            self._quota = min(self.rpm_limit / 6.0, self._quota + (now - self._quota_updated) * rate)
+            self._quota_updated = now
+            if self._quota >= 1.0:
+                self._quota -= 1.0
+                return 0.0
+            self._stats["throttled"] += 1
+            return (1.0 - self._quota) / rate
+
+    def _sample(self, deployment: Optional[str]) -> Dict:
+        with self._lock:
+            self._by_deployment[deployment] = self._by_deployment.get(deployment, 0) + 1
+            latency = self.deployment_latency.get(deployment, self.latency)
+            return {"latency": latency.sample(), "roll": self.rng.random(), "reply": self.rng.choice(REPLIES),
+                    "malformed_roll": self.rng.random()}
+
+    def plan(self, body: Dict, deployment: Optional[str] = None) -> Dict:
+        """Decide the reply to a request: ``{"latency", "tool_call" or "content", "usage"}``."""
+        sample = self._sample(deployment)
+        messages = body.get("messages", [])
+        last = messages[-1] if messages else {}
+        user_text = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+        repository = REPOSITORY_PATTERN.search(user_text)
+
+        plan = {"latency": sample["latency"]}
+        tools = body.get("tools") or []
+        if (tools and body.get("tool_choice") != "none" and last.get("role") == "user"
+                and sample["roll"] < self.tool_call_rate):
+            plan["tool_call"] = self._tool_call(tools, user_text, repository)
+            if sample["malformed_roll"] < self.malformed_tool_call_rate.get(deployment, 0.0):
+                arguments = plan["tool_call"]["function"]["arguments"]
+                plan["tool_call"]["function"]["arguments"] = arguments[:len(arguments) // 2]
+        else:
+            plan["content"] = sample["reply"].format(repository=repository.group(1).upper() if repository else "D1")
+
+        prompt_tokens = max(1, len(json.dumps(messages)) // 4 + len(json.dumps(tools)) // 4)
+        completion_tokens = len(plan.get("content", "").split()) or 20
+        plan["usage"] = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": prompt_tokens // 128 * 128 if prompt_tokens >= 1024 else 0}
+        }
+        return plan
+
+    @staticmethod
+    def _tool_call(tools: List[Dict], user_text: str, repository) -> Dict:
+        # Prefer the repository lookup when the user named a repository, as the model would
+        preferred = "get_repository_access_groups" if repository else "search_knowledge_base"
+        function = next((tool["function"] for tool in tools if tool["function"]["name"] == preferred),
+                        tools[0]["function"])
+        arguments = {}
+        for name in function.get("parameters", {}).get("required", []):
+            arguments[name] = repository.group(1).upper() if repository and "repository" in name else user_text
+        return {"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function",
+                "function": {"name": function["name"], "arguments": json.dumps(arguments)}}
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 refuses connections under load-test concurrency
+    request_queue_size = 1024
+
+
+class _CompletionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    mock: MockAzureServer
+
+    def log_message(self, format, *args):  # noqa: A002 - silence per-request logging
+        pass
+
+    def do_HEAD(self):
+        # Connection warm-up probes only need a completed response
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        body = json.dumps(self.mock.stats()).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            body = None
+        if not self.path.split("?")[0].endswith("/chat/completions") or not isinstance(body, dict):
+            self._send_json(404, {"error": {"code": "NotFound", "message": "Unknown route"}})
+            return
+
+        retry_after = self.mock.admit()
+        if retry_after:
+            self._send_json(429, {"error": {"code": "429", "message": "Requests to the ChatCompletions_Create "
+                                            "Operation have exceeded the rate limit of your current tier."}},
+                            headers={"retry-after-ms": str(int(retry_after * 1000)),
+                                     "retry-after": str(max(1, round(retry_after)))})
+            return
+
+        match = re.search(r"/deployments/([^/]+)/", self.path)
+        plan = self.mock.plan(body, match.group(1) if match else body.get("model"))
+        self.mock._count("completions")
+        if "tool_call" in plan:
+            self.mock._count("tool_calls")
+
+        if body.get("stream"):
+            self.mock._count("streamed")
+            self._stream(body, plan)
+            return
+
+        time.sleep(plan["latency"])
+        message = {"role": "assistant", "content": plan.get("content")}
+        if "tool_call" in plan:
+            message["tool_calls"] = [plan["tool_call"]]
+        self._send_json(200, {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o"),
+            "choices": [{"index": 0, "message": message,
+                         "finish_reason": "tool_calls" if "tool_call" in plan else "stop"}],
+            "usage": plan["usage"]
+        })
+
+    def _send_json(self, status: int, payload: Dict, headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, body: Dict, plan: Dict) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def chunk(choices: List[Dict], **extra) -> None:
+            event = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": body.get("model", "gpt-4o"), "choices": choices, **extra}
+            self._write_chunk(f"data: {json.dumps(event)}\n\n")
+
+        # Azure opens every stream with a choice-less prompt-filter chunk
+        chunk([])
+        time.sleep(plan["latency"])
+        if "tool_call" in plan:
+            tool_call = plan["tool_call"]
+            arguments = tool_call["function"]["arguments"]
+            chunk([{"index": 0, "delta": {"role": "assistant", "tool_calls": [
+                {"index": 0, "id": tool_call["id"], "type": "function",
+                 "function": {"name": tool_call["function"]["name"], "arguments": arguments[:8]}}]}}])
+            chunk([{"index": 0, "delta": {"tool_calls": [{"index": 0, "function": {"arguments": arguments[8:]}}]}}])
+            chunk([{"index": 0, "delta": {}, "finish_reason": "tool_calls"}])
+        else:
+            for position, word in enumerate(plan["content"].split(" ")):
+                if position:
+                    time.sleep(self.mock.token_interval)
+                    word = " " + word
+                chunk([{"index": 0, "delta": {"content": word}}])
+            chunk([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if (body.get("stream_options") or {}).get("include_usage"):
+            chunk([], usage=plan["usage"])
+        self._write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, text: str) -> None:
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", default="lognormal:0.35,0.4", help="latency distribution spec")
+    parser.add_argument("--tool-call-rate", type=float, default=0.3)
+    parser.add_argument("--token-interval", type=float, default=0.01, help="seconds between streamed tokens")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--rpm-limit", type=float, default=0, help="requests-per-minute quota (0 = unlimited)")
+    parser.add_argument("--deployment-latency", nargs="*", default=[], metavar="NAME=SPEC",
+                        help="latency distribution of one deployment")
+    parser.add_argument("--malformed-tool-call-rate", nargs="*", default=[], metavar="NAME=RATE",
+                        help="share of one deployment's tool calls sent with broken arguments")
+    args = parser.parse_args()
+
+    server = MockAzureServer(args.host, args.port, args.latency, args.tool_call_rate, args.token_interval, args.seed,
+                             args.rpm_limit, dict(item.split("=", 1) for item in args.deployment_latency),
+                             {name: float(rate) for name, _, rate in
+                              (item.partition("=") for item in args.malformed_tool_call_rate)})
+    print(f"Mock Azure OpenAI listening on {server.url} (set AZURE_OPENAI_ENDPOINT to this URL)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Compare turn latency and Azure cost with one deployment for everything versus fast/strong model tiering.
+
+``--concurrency`` users replay multi-turn onboarding conversations (each answer
+is fed back into the next turn's history) through ChatbotService against the
+local mock Azure server, where the strong deployment answers with
+``--strong-latency`` and the fast one with ``--fast-latency``, and the fast
+deployment sends ``--malformed-rate`` of its tool calls with broken arguments.
+Two configurations run over the same turns:
+
+- single: every completion on the strong deployment, as before tiering
+- tiered: app.services.model_tiering.TierPolicy picks the tier per completion
+
+Reports per configuration: turn latency (mean, p50, p95, p99), completions and
+their p50 latency per tier, escalations, and the estimated cost per 1000 turns
+from the mock's token usage at MODEL_PRICES.
+
+    python benchmarks/model_tiering.py --concurrency 8 --turns 400 --strong-latency lognormal:0.6,0.35 \\
+        --fast-latency lognormal:0.2,0.35
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_azure import MockAzureServer  # noqa: E402
+
+from app.services.chatbot_service import ChatbotService  # noqa: E402
+from app.services.knowledge_index import KnowledgeIndex, load_documents  # noqa: E402
+from app.services.model_tiering import FAST, TierPolicy  # noqa: E402
+from app.services.openai_service import OpenAIService  # noqa: E402
+from app.services.tracing import end_trace, start_trace  # noqa: E402
+from app.services.usage_tracker import UsageTracker  # noqa: E402
+from config import Config  # noqa: E402
+
+STRONG_DEPLOYMENT = "gpt-4o"
+FAST_DEPLOYMENT = "gpt-4o-mini"
+CONVERSATIONS = [
+    ["Hi", "I'm a new user and need access to Informatica", "Yes, I have UNIX enabled",
+     "Which groups do I need for D1?", "Thanks!"],
+    ["What access groups do I need for Q3?", "And what about P1?"],
+    ["How do I request access through myAccess?", "How long does approval usually take?",
+     "Who approves production access?"],
+    ["Which repositories does ZNA_INFA_PC_D1_RWX give me?"],
+    ["I need to run workflows in the QA repository, what should I ask for?",
+     "Is that different from development?"],
+    ["hello", "what groups for D2", "thank you"],
+    ["Our team is migrating a set of mappings from the development repository to QA next sprint and several "
+     "people will need to deploy and run workflows there, some of them contractors whose UNIX accounts were "
+     "created last week. Which groups should each of them request, and is there anything different about "
+     "contractors or about the deployment groups compared with the run-only groups?"]
+]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 1) if ordered else None
+
+
+def run(tiered: bool, args, mock: MockAzureServer) -> dict:
+    usage = UsageTracker(prices=Config.MODEL_PRICES)
+    openai_service = OpenAIService("key", mock.url, STRONG_DEPLOYMENT, "2024-07-01-preview", usage_tracker=usage,
+                                   deployments={FAST: FAST_DEPLOYMENT} if tiered else None)
+    policy = TierPolicy() if tiered else None
+    chatbot = ChatbotService(openai_service, direct_answer_tools=Config.DIRECT_ANSWER_TOOLS,
+                             knowledge_index=KnowledgeIndex.build(load_documents()), tier_policy=policy)
+    # The first turn of a conversation skips the UNIX check, which would answer it without Azure
+    chatbot.unix_checker.check = lambda chat_history, conversation_id=None: None
+
+    lock = threading.Lock()
+    turns, completions = [], {}
+    next_turn = [0]
+
+    def user(number: int) -> None:
+        conversation = CONVERSATIONS[number % len(CONVERSATIONS)]
+        history = []
+        position = 0
+        while True:
+            with lock:
+                if next_turn[0] >= args.turns:
+                    return
+                next_turn[0] += 1
+            if position == len(conversation):
+                history, position = [], 0
+            history.append({"role": "user", "content": conversation[position]})
+            position += 1
+            trace = start_trace("benchmark")
+            started = time.perf_counter()
+            try:
+                answer = chatbot.respond(history, use_cache=False)
+            finally:
+                end_trace()
+            elapsed = time.perf_counter() - started
+            history.append({"role": "assistant", "content": answer})
+            with lock:
+                turns.append(elapsed)
+                for tier, seconds, _ in trace.completions:
+                    completions.setdefault(tier, []).append(seconds)
+
+    threads = [threading.Thread(target=user, args=(number,)) for number in range(args.concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    cost = sum(stats["estimated_cost_usd"] for stats in usage.stats().values())
+    report = {
+        "turns": len(turns),
+        "wall_seconds": round(wall, 2),
+        "mean_ms": round(statistics.mean(turns) * 1000, 1),
+        "p50_ms": percentile(turns, 0.50),
+        "p95_ms": percentile(turns, 0.95),
+        "p99_ms": percentile(turns, 0.99),
+        "completions": {tier: {"count": len(samples), "p50_ms": percentile(samples, 0.50)}
+                        for tier, samples in sorted(completions.items())},
+        "cost_per_1000_turns_usd": round(cost / len(turns) * 1000, 4)
+    }
+    if policy:
+        report["tiering"] = policy.stats()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--turns", type=int, default=400, help="chat turns per configuration")
+    parser.add_argument("--strong-latency", default="lognormal:0.6,0.35", help="strong deployment latency spec")
+    parser.add_argument("--fast-latency", default="lognormal:0.2,0.35", help="fast deployment latency spec")
+    parser.add_argument("--tool-call-rate", type=float, default=0.5)
+    parser.add_argument("--malformed-rate", type=float, default=0.05, help="share of fast tool calls that are broken")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    results = {}
+    for name, tiered in (("single", False), ("tiered", True)):
+        # A fresh mock per configuration so both draw the same latencies and tool calls
+        mock = MockAzureServer(latency=args.strong_latency, tool_call_rate=args.tool_call_rate,
+                               token_interval=0.0, seed=args.seed,
+                               deployment_latency={FAST_DEPLOYMENT: args.fast_latency},
+                               malformed_tool_call_rate={FAST_DEPLOYMENT: args.malformed_rate}).start()
+        try:
+            results[name] = run(tiered, args, mock)
+        finally:
+            mock.stop()
+    results["p50_improvement"] = round(1 - results["tiered"]["p50_ms"] / results["single"]["p50_ms"], 3)
+    results["cost_reduction"] = round(
+        1 - results["tiered"]["cost_per_1000_turns_usd"] / results["single"]["cost_per_1000_turns_usd"], 3)
+    print(json.dumps({"concurrency": args.concurrency, "strong_latency": args.strong_latency,
+                      "fast_latency": args.fast_latency, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
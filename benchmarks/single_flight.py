@@ -0,0 +1,87 @@
+"""Replay an onboarding wave with and without single-flight coalescing.
+
+``--users`` clients ask the same first question within ``--spread`` seconds,
+against the local mock Azure server. Without coalescing every one of them is a
+separate completion; with it, the requests that overlap an in-flight call share
+it. Reports upstream calls, tokens sent and client latency for both.
+
+    python benchmarks/single_flight.py --users 50 --spread 2 --latency lognormal:0.8,0.3
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_azure import MockAzureServer  # noqa: E402
+
+from app.services.openai_service import OpenAIService  # noqa: E402
+from app.services.single_flight import SingleFlight  # noqa: E402
+from app.services.usage_tracker import UsageTracker  # noqa: E402
+
+QUESTION = [{"role": "system", "content": "You help users get Informatica repository access."},
+            {"role": "user", "content": "Hi, I'm a new user. How do I get access to Informatica?"}]
+
+
+def wave(url: str, users: int, spread: float, single_flight, seed: int) -> dict:
+    usage = UsageTracker()
+    service = OpenAIService("key", url, "gpt-4o", "2024-07-01-preview",
+                            usage_tracker=usage, single_flight=single_flight)
+    rng = random.Random(seed)
+    offsets = sorted(rng.uniform(0, spread) for _ in range(users))
+    latencies = []
+    lock = threading.Lock()
+    start = time.perf_counter()
+
+    def user(offset: float) -> None:
+        time.sleep(max(0.0, start + offset - time.perf_counter()))
+        began = time.perf_counter()
+        service.chat_completion(QUESTION)
+        with lock:
+            latencies.append(time.perf_counter() - began)
+
+    threads = [threading.Thread(target=user, args=(offset,)) for offset in offsets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = usage.stats().get("gpt-4o", {})
+    return {
+        "upstream_calls": stats.get("requests", 0),
+        "prompt_tokens": stats.get("prompt_tokens", 0),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "max_ms": round(max(latencies) * 1000, 1),
+        "single_flight": single_flight.stats() if single_flight else None
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--spread", type=float, default=2.0, help="seconds over which the users arrive")
+    parser.add_argument("--latency", default="lognormal:0.8,0.3", help="mock Azure latency distribution")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    mock = MockAzureServer(latency=args.latency, tool_call_rate=0.0, seed=args.seed).start()
+    try:
+        results = {
+            "users": args.users,
+            "spread_s": args.spread,
+            "without": wave(mock.url, args.users, args.spread, None, args.seed),
+            "with": wave(mock.url, args.users, args.spread, SingleFlight(), args.seed)
+        }
+    finally:
+        mock.stop()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""Measure cold start: import and create_app time, and each gunicorn worker's time to its first request.
+
+In-process costs are measured in fresh interpreters (``--repeat`` times, median):
+importing the ``app`` package, importing the ``openai`` SDK on its own, and
+``create_app`` with and without PRELOAD_APP. Then, for each mode, gunicorn is
+started with the repo's gunicorn.conf.py against benchmarks/mock_azure.py while
+clients keep sending chat turns that need a completion, and a hook file records
+when each worker was forked, finished loading and answered its first request.
+After every worker has answered, one more worker is added (SIGTTIN), as on a
+scale-out or a worker restart. Reported per mode: master start to listening,
+per-worker fork to ready and fork to first answered request, time until every
+worker had answered, the added worker's numbers, and per-worker private and
+proportional memory from /proc (Linux), which preload shares copy-on-write.
+
+    python benchmarks/startup.py --workers 4 --repeat 5
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_azure import MockAzureServer  # noqa: E402
+
+# Added to the repo's gunicorn.conf.py: appends one JSON line per worker event to STARTUP_EVENTS
+HOOKS = '''
+import json as _json
+import os as _os
+import time as _time
+
+exec(compile(open({conf!r}).read(), {conf!r}, "exec"))
+_when_ready, _post_fork = when_ready, post_fork
+_served = set()
+
+
+def _event(name, **fields):
+    with open(_os.environ["STARTUP_EVENTS"], "a") as f:
+        f.write(_json.dumps(dict(fields, event=name, pid=_os.getpid(), time=_time.time())) + "\\n")
+
+
+def when_ready(server):
+    _when_ready(server)
+    _event("listening")
+
+
+def pre_fork(server, worker):
+    _event("fork", age=worker.age)
+
+
+def post_fork(server, worker):
+    _event("forked", age=worker.age)
+    _post_fork(server, worker)
+
+
+def post_worker_init(worker):
+    _event("ready", age=worker.age)
+
+
+def post_request(worker, req, environ, resp):
+    if worker.age not in _served and req.path == "/api/chat" and resp.status_code == 200:
+        _served.add(worker.age)
+        _event("served", age=worker.age)
+'''
+
+CODE_IMPORT = "import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+CODE_CREATE_APP = ("import time; from app import create_app; t = time.perf_counter(); create_app(); "
+                   "print(time.perf_counter() - t)")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+def timed_subprocess(code: str, env: Dict, repeat: int) -> float:
+    """Median of ``repeat`` runs of ``code`` (which prints its own elapsed seconds) in fresh interpreters."""
+    samples = [float(subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, check=True,
+                                    capture_output=True, text=True).stdout.split()[-1])
+               for _ in range(repeat)]
+    return statistics.median(samples)
+
+
+def memory(pid: int) -> Optional[Dict]:
+    """Private and proportional set size of one process in MiB, from /proc (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            fields = {line.split(":")[0]: int(line.split()[1]) for line in f if line.split()[-1] == "kB"}
+    except OSError:
+        return None
+    return {"private_mib": round((fields["Private_Clean"] + fields["Private_Dirty"]) / 1024, 1),
+            "pss_mib": round(fields["Pss"] / 1024, 1)}
+
+
+class ChatClients:
+    """Clients sending chat turns on fresh connections, so the kernel spreads them over the workers."""
+
+    def __init__(self, base_url: str, concurrency: int):
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        for number in range(self.concurrency):
+            thread = threading.Thread(target=self._run, args=(number,), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _run(self, number: int) -> None:
+        turn = 0
+        with httpx.Client(timeout=30, limits=httpx.Limits(max_keepalive_connections=0)) as client:
+            while not self._stop.is_set():
+                turn += 1
+                try:
+                    client.post(f"{self.base_url}/api/chat",
+                                json={"message": f"Please explain step {turn} of onboarding ticket {number}"})
+                except httpx.HTTPError:
+                    time.sleep(0.05)
+
+    def stop(self) -> None:
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+
+
+def read_events(path: str) -> List[Dict]:
+    try:
+        with open(path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def wait_for(path: str, predicate, process: subprocess.Popen, timeout: float) -> List[Dict]:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {process.returncode}")
+        events = read_events(path)
+        if predicate(events):
+            return events
+        time.sleep(0.02)
+    raise RuntimeError(f"gunicorn workers did not get there within {timeout:.0f}s")
+
+
+def per_worker(events: List[Dict]) -> Dict[int, Dict]:
+    """Event times keyed by worker age (gunicorn's spawn counter)."""
+    workers: Dict[int, Dict] = {}
+    for event in events:
+        if "age" in event:
+            worker = workers.setdefault(event["age"], {})
+            worker[event["event"]] = event["time"]
+            if event["event"] != "fork":
+                worker["pid"] = event["pid"]
+    return workers
+
+
+def summarize(workers: List[Dict]) -> Dict:
+    ready = [worker["ready"] - worker["fork"] for worker in workers]
+    served = [worker["served"] - worker["fork"] for worker in workers]
+    return {"fork_to_ready_ms": [ms(value) for value in ready],
+            "fork_to_first_request_ms": [ms(value) for value in served],
+            "mean_fork_to_first_request_ms": ms(statistics.mean(served))}
+
+
+def run(preload: bool, args, mock: MockAzureServer) -> Dict:
+    workdir = tempfile.mkdtemp(prefix="startup-")
+    config_path = os.path.join(workdir, "gunicorn.conf.py")
+    events_path = os.path.join(workdir, "events.jsonl")
+    with open(config_path, "w") as f:
+        f.write(HOOKS.format(conf=os.path.join(ROOT, "gunicorn.conf.py")))
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ,
+               AZURE_OPENAI_ENDPOINT=mock.url,
+               OPENAI_API_KEY="benchmark",
+               LOG_LEVEL="WARNING",
+               PRELOAD_APP=str(preload).lower(),
+               PORT=str(port),
+               GUNICORN_WORKERS=str(args.workers),
+               GUNICORN_ACCESS_LOG="/dev/null",
+               GUNICORN_LOG_LEVEL="warning",
+               INTENT_ROUTER_ENABLED="false",
+               RESPONSE_CACHE_ENABLED="false",
+               STARTUP_EVENTS=events_path,
+               METRICS_SHARED_DIR=workdir)
+    clients = ChatClients(base_url, 2 * args.workers)
+    started = time.time()
+    process = subprocess.Popen([sys.executable, "-m", "gunicorn", "--config", config_path, "--chdir", ROOT],
+                               env=env, stdout=subprocess.DEVNULL)
+    try:
+        # Clients start once the master listens, so they do not compete with it for CPU while it loads
+        wait_for(events_path, lambda events: any(e["event"] == "listening" for e in events), process, args.timeout)
+        clients.start()
+        events = wait_for(events_path, lambda events: sum(e["event"] == "served" for e in events) >= args.workers,
+                          process, args.timeout)
+        workers = per_worker(events)
+        initial = [workers[age] for age in sorted(workers)]
+        memory_by_worker = [memory(worker["pid"]) for worker in initial]
+
+        process.send_signal(signal.SIGTTIN)
+        events = wait_for(events_path,
+                          lambda events: sum(e["event"] == "served" for e in events) > args.workers,
+                          process, args.timeout)
+        added = per_worker(events)[max(per_worker(events))]
+    finally:
+        clients.stop()
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    listening = next(event["time"] for event in events if event["event"] == "listening")
+    return {
+        "preload": preload,
+        "workers": args.workers,
+        "start_to_listening_ms": ms(listening - started),
+        "start_to_all_workers_answered_ms": ms(max(worker["served"] for worker in initial) - started),
+        **summarize(initial),
+        "added_worker": {key: value[0] for key, value in summarize([added]).items() if isinstance(value, list)},
+        "worker_memory": memory_by_worker
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per in-process timing")
+    parser.add_argument("--latency", default="lognormal:0.05,0.2", help="mock Azure latency distribution")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for every worker to answer")
+    args = parser.parse_args()
+
+    env = dict(os.environ, OPENAI_API_KEY="benchmark", AZURE_OPENAI_ENDPOINT="http://127.0.0.1:9",
+               HTTP_POOL_WARMUP_CONNECTIONS="0")
+    report = {
+        "import_app_ms": ms(timed_subprocess(CODE_IMPORT.format(module="app"), env, args.repeat)),
+        "import_openai_ms": ms(timed_subprocess(CODE_IMPORT.format(module="openai"), env, args.repeat)),
+        "create_app_ms": ms(timed_subprocess(CODE_CREATE_APP, env, args.repeat)),
+        "create_app_preload_ms": ms(timed_subprocess(CODE_CREATE_APP, dict(env, PRELOAD_APP="true"), args.repeat))
+    }
+
+    mock = MockAzureServer(latency=args.latency, tool_call_rate=0.0).start()
+    try:
+        report["gunicorn"] = [run(False, args, mock), run(True, args, mock)]
+    finally:
+        mock.stop()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Compare page-load bytes and time before and after the static asset pipeline.
+
+"Before" is Flask's plain static file serving (what ``/`` and ``/<path>`` used
+to do); "after" is the application's in-memory, precompressed, hashed assets.
+A small browser model fetches ``/`` and everything it references, honouring
+Cache-Control: a first visit fetches everything, a repeat visit revalidates
+``no-cache`` responses and skips ``immutable`` ones. Transfer time is modelled
+from the bytes on the wire, the number of sequential round trips, RTT and
+bandwidth.
+
+    python benchmarks/static_page_load.py --rtt-ms 50 --mbps 10
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://benchmark.openai.azure.com")
+os.environ.setdefault("HTTP_POOL_WARMUP_CONNECTIONS", "0")
+
+from flask import Flask  # noqa: E402
+
+from app import create_app  # noqa: E402
+
+STATIC_FOLDER = os.path.join(ROOT, "static")
+REFERENCE_PATTERN = re.compile(r'(?:href|src)="([^"#?:]+)"')
+ACCEPT_ENCODING = "gzip, deflate, br"
+
+
+def decoded(response) -> str:
+    encoding = response.headers.get("Content-Encoding")
+    body = response.get_data()
+    if encoding == "gzip":
+        import gzip
+        body = gzip.decompress(body)
+    elif encoding == "br":
+        import brotli
+        body = brotli.decompress(body)
+    return body.decode("utf-8")
+
+
+class Browser:
+    """Fetches a page and its assets, keeping an HTTP cache between visits."""
+
+    def __init__(self, client):
+        self.client = client
+        self.cache = {}
+
+    def fetch(self, path: str):
+        """Returns (bytes on the wire, whether a request was made, text for the page)."""
+        cached = self.cache.get(path)
+        if cached and "immutable" in cached["cache_control"]:
+            return 0, False, cached["text"]
+
+        headers = {"Accept-Encoding": ACCEPT_ENCODING}
+        if cached and cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        response = self.client.get(path, headers=headers)
+        if response.status_code == 304:
+            return 0, True, cached["text"]
+
+        text = decoded(response) if path == "/" else ""
+        self.cache[path] = {
+            "etag": response.headers.get("ETag"),
+            "cache_control": response.headers.get("Cache-Control", ""),
+            "text": text
+        }
+        return len(response.get_data()), True, text
+
+    def visit(self) -> dict:
+        start = time.perf_counter()
+        page_bytes, _, html = self.fetch("/")
+        wire_bytes, requests, asset_round_trip = page_bytes, 1, False
+        for reference in REFERENCE_PATTERN.findall(html):
+            size, requested, _ = self.fetch("/" + reference.lstrip("/"))
+            wire_bytes += size
+            requests += requested
+            asset_round_trip = asset_round_trip or requested
+        return {
+            "bytes": wire_bytes,
+            "requests": requests,
+            "round_trips": 1 + asset_round_trip,
+            "server_ms": round((time.perf_counter() - start) * 1000, 2)
+        }
+
+
+def with_model(visit: dict, rtt_ms: float, mbps: float) -> dict:
+    transfer_ms = visit["bytes"] * 8 / (mbps * 1e6) * 1000
+    visit["modelled_load_ms"] = round(visit["round_trips"] * rtt_ms + transfer_ms + visit["server_ms"], 1)
+    return visit
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rtt-ms", type=float, default=50.0)
+    parser.add_argument("--mbps", type=float, default=10.0)
+    args = parser.parse_args()
+
+    before_app = Flask(__name__, static_folder=STATIC_FOLDER, static_url_path="")
+    before_app.add_url_rule("/", "index", lambda: before_app.send_static_file("index.html"))
+    after_app = create_app()
+
+    results = {}
+    for name, app in (("before", before_app), ("after", after_app)):
+        browser = Browser(app.test_client())
+        results[name] = {
+            "first_visit": with_model(browser.visit(), args.rtt_ms, args.mbps),
+            "repeat_visit": with_model(browser.visit(), args.rtt_ms, args.mbps)
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
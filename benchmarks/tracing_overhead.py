@@ -0,0 +1,104 @@
+"""Measure what per-stage tracing adds to each chat request.
+
+Runs the real ChatbotService / OpenAI SDK code against an in-process mock
+transport that answers instantly, so the remaining time is the service's own
+work. Each request is handled twice over, interleaved: untraced, and traced the
+way the chat route does it (start a trace, time every stage, build the
+Server-Timing header and fold the trace into the metrics registry). The
+difference in the medians is the tracing overhead per request.
+
+    python benchmarks/tracing_overhead.py --requests 2000
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+from openai import AzureOpenAI
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.chatbot_service import ChatbotService  # noqa: E402
+from app.services.openai_service import OpenAIService  # noqa: E402
+from app.services.tracing import MetricsRegistry, end_trace, start_trace  # noqa: E402
+
+ENDPOINT = "https://benchmark.openai.azure.com"
+API_VERSION = "2024-07-01-preview"
+COMPLETION = {
+    "id": "chatcmpl-0",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4o",
+    "choices": [{
+        "index": 0,
+        "finish_reason": "stop",
+        "message": {"role": "assistant", "content": "Hello! How can I help you with Informatica access?"}
+    }],
+    "usage": {"prompt_tokens": 900, "completion_tokens": 12, "total_tokens": 912,
+              "prompt_tokens_details": {"cached_tokens": 768}}
+}
+
+
+def conversation(index: int) -> list:
+    # Unique per request so the response cache never short-circuits the call
+    return [{"role": "user", "content": f"What access does benchmark user {index} need for development?"}]
+
+
+def traced(chatbot: ChatbotService, metrics: MetricsRegistry, chat_history: list) -> str:
+    trace = start_trace("/api/chat")
+    try:
+        reply = chatbot.process_chat(chat_history)
+    finally:
+        end_trace()
+    trace.server_timing()
+    metrics.observe(trace, 200)
+    return reply
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--shared-dir", action="store_true",
+                        help="also flush per-worker metrics files, as multi-worker deployments do")
+    args = parser.parse_args()
+
+    service = OpenAIService("key", ENDPOINT, "gpt-4o", API_VERSION)
+    service.client = AzureOpenAI(
+        api_key="key", api_version=API_VERSION, azure_endpoint=ENDPOINT,
+        http_client=httpx.Client(transport=httpx.MockTransport(lambda request: httpx.Response(200, json=COMPLETION)))
+    )
+    chatbot = ChatbotService(service)
+    metrics = MetricsRegistry(shared_dir=tempfile.mkdtemp() if args.shared_dir else None)
+
+    untraced_us, traced_us = [], []
+    for index in range(args.requests):
+        start = time.perf_counter()
+        chatbot.process_chat(conversation(2 * index))
+        untraced_us.append((time.perf_counter() - start) * 1e6)
+        start = time.perf_counter()
+        traced(chatbot, metrics, conversation(2 * index + 1))
+        traced_us.append((time.perf_counter() - start) * 1e6)
+
+    untraced_median = statistics.median(untraced_us)
+    traced_median = statistics.median(traced_us)
+    start = time.perf_counter()
+    exposition = metrics.render()
+    render_ms = (time.perf_counter() - start) * 1000
+
+    print(json.dumps({
+        "requests": args.requests,
+        "untraced_median_us": round(untraced_median, 1),
+        "traced_median_us": round(traced_median, 1),
+        "overhead_us": round(traced_median - untraced_median, 1),
+        "overhead_pct": round((traced_median - untraced_median) / untraced_median * 100, 2),
+        "metrics_render_ms": round(render_ms, 3),
+        "metrics_series": sum(1 for line in exposition.splitlines() if not line.startswith("#"))
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
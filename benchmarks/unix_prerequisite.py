@@ -0,0 +1,97 @@
+"""Measure the per-request cost of the UNIX-prerequisite check as conversations grow.
+
+Replays synthetic conversations turn by turn. The legacy check rescans the whole
+history with substring tests on every turn; UnixPrerequisiteChecker, keyed by
+conversation id, only feeds the newly added messages through its compiled
+matcher and checks the last message it saw before to confirm the history it
+built on is still there.
+
+    python benchmarks/unix_prerequisite.py --turns 10 100 1000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.onboarding import UnixPrerequisiteChecker  # noqa: E402
+
+USER_LINES = [
+    "Hi, I'm a new user and need access",
+    "Yes, I have UNIX enabled",
+    "I need access to the development repository",
+    "Which groups do I need for D1?",
+    "Thanks, and what about Q2?"
+]
+ASSISTANT_LINES = [
+    "Welcome! Do you have UNIX enabled on your account?",
+    "Great. Which repository type do you need: Development, QA or Production?",
+    "The myAccess Groups for repository D1 are listed above.",
+    "Is there anything else I can help you with?"
+]
+
+
+def legacy_check(chat_history: list) -> bool:
+    """The substring rescan the checker replaced; returns whether it would intervene."""
+    is_new_user = False
+    asked_unix = False
+    unix_answer = None
+    for message in chat_history:
+        content = message.get("content", "").lower()
+        role = message.get("role")
+        if role == "user" and any(phrase in content for phrase in ["new user", "i am new", "i'm new"]):
+            is_new_user = True
+        if role == "assistant" and "unix enabled" in content:
+            asked_unix = True
+        if asked_unix and role == "user":
+            if any(word in content for word in ["yes", "yep", "yeah", "i do", "enabled", "have unix"]):
+                unix_answer = "yes"
+            elif any(word in content for word in ["no", "not", "don't have", "haven't", "without unix", "no unix"]):
+                unix_answer = "no"
+    return (is_new_user and not asked_unix) or (asked_unix and unix_answer == "no")
+
+
+def conversation(turns: int, seed: int) -> list:
+    history = []
+    for turn in range(turns):
+        history.append({"role": "user", "content": f"{USER_LINES[turn % len(USER_LINES)]} ({seed}-{turn})"})
+        history.append({"role": "assistant", "content": ASSISTANT_LINES[turn % len(ASSISTANT_LINES)]})
+    return history
+
+
+def replay(check, turns: int, conversations: int) -> float:
+    """Mean microseconds per check on the final turn of each conversation."""
+    total = 0.0
+    for seed in range(conversations):
+        history = conversation(turns, seed)
+        # Every earlier turn is checked too, as a live session would be
+        for end in range(2, len(history), 2):
+            check(history[:end - 1], f"conversation-{seed}")
+        latest = history[:-1]
+        start = time.perf_counter()
+        check(latest, f"conversation-{seed}")
+        total += time.perf_counter() - start
+    return total / conversations * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--conversations", type=int, default=20)
+    args = parser.parse_args()
+
+    results = []
+    for turns in args.turns:
+        checker = UnixPrerequisiteChecker()
+        results.append({
+            "turns": turns,
+            "legacy_us_per_check": round(replay(lambda history, _: legacy_check(history), turns, args.conversations), 1),
+            "incremental_us_per_check": round(replay(checker.check, turns, args.conversations), 1)
+        })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
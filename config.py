@@ -31,11 +31,164 @@ class Config:
     AZURE_OPENAI_DEPLOYMENT = os.getenv('AZURE_OPENAI_DEPLOYMENT', 'gpt-4o')
     # Use latest stable API version
     AZURE_API_VERSION = "2024-07-01-preview"
+    # Tools whose successful results are returned to the user verbatim, skipping
+    # the second completion. Set to an empty string to always rephrase via the model.
+    DIRECT_ANSWER_TOOLS = [
+        name.strip() for name in
+        os.getenv('DIRECT_ANSWER_TOOLS',
+                  'get_answer_from_knowledge_base,search_knowledge_base,get_repository_access_groups').split(',')
+        if name.strip()
+    ]
+    # Tool execution: follow-up tool rounds the model may take, parallel tool workers, and for how
+    # many recent conversations tool results are memoized across turns (0 memoizes within a turn only)
+    TOOL_MAX_ROUNDS = int(os.getenv('TOOL_MAX_ROUNDS', '3'))
+    TOOL_MAX_WORKERS = int(os.getenv('TOOL_MAX_WORKERS', '8'))
+    TOOL_MEMO_MAX_CONVERSATIONS = int(os.getenv('TOOL_MEMO_MAX_CONVERSATIONS', '1000'))
+    # Response cache: in-process LRU, optionally backed by a SQLite file shared by all workers
+    RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '512'))
+    RESPONSE_CACHE_TTL_SECONDS = int(os.getenv('RESPONSE_CACHE_TTL_SECONDS', '3600'))
+    RESPONSE_CACHE_TAIL_MESSAGES = int(os.getenv('RESPONSE_CACHE_TAIL_MESSAGES', '4'))
+    RESPONSE_CACHE_SHARED_PATH = os.getenv('RESPONSE_CACHE_SHARED_PATH')
+    # Server-side conversation sessions; set SESSION_SHARED_PATH to share them across workers
+    SESSIONS_ENABLED = os.getenv('SESSIONS_ENABLED', 'true').lower() == 'true'
+    SESSION_MAX_SESSIONS = int(os.getenv('SESSION_MAX_SESSIONS', '1000'))
+    SESSION_MAX_MESSAGES = int(os.getenv('SESSION_MAX_MESSAGES', '50'))
+    SESSION_IDLE_TTL_SECONDS = int(os.getenv('SESSION_IDLE_TTL_SECONDS', '1800'))
+    SESSION_SHARED_PATH = os.getenv('SESSION_SHARED_PATH')
+    # Prompt token budget; older turns beyond it are collapsed into a summary
+    CONTEXT_BUDGET_ENABLED = os.getenv('CONTEXT_BUDGET_ENABLED', 'true').lower() == 'true'
+    CONTEXT_MAX_PROMPT_TOKENS = int(os.getenv('CONTEXT_MAX_PROMPT_TOKENS', '6000'))
+    CONTEXT_KEEP_RECENT_MESSAGES = int(os.getenv('CONTEXT_KEEP_RECENT_MESSAGES', '6'))
+    CONTEXT_SUMMARY_MAX_TOKENS = int(os.getenv('CONTEXT_SUMMARY_MAX_TOKENS', '300'))
+    CONTEXT_TOKENIZER_ENCODING = os.getenv('CONTEXT_TOKENIZER_ENCODING', 'o200k_base')
+    # Local search index over the knowledge base; articles are loaded from KB_DOCUMENTS_PATH when set
+    KB_RETRIEVAL_ENABLED = os.getenv('KB_RETRIEVAL_ENABLED', 'true').lower() == 'true'
+    KB_DOCUMENTS_PATH = os.getenv('KB_DOCUMENTS_PATH', '')
+    KB_INDEX_PATH = os.getenv('KB_INDEX_PATH', '')
+    KB_SEARCH_TOP_K = int(os.getenv('KB_SEARCH_TOP_K', '3'))
+    # A search hit is returned verbatim (when search_knowledge_base is in DIRECT_ANSWER_TOOLS) only if its
+    # BM25 score reaches the minimum and beats the runner-up by the margin factor; otherwise the model answers
+    KB_DIRECT_ANSWER_MIN_SCORE = float(os.getenv('KB_DIRECT_ANSWER_MIN_SCORE', '2.0'))
+    KB_DIRECT_ANSWER_MIN_MARGIN = float(os.getenv('KB_DIRECT_ANSWER_MIN_MARGIN', '1.5'))
+    # Answer greetings, thanks and repository lookups locally when the router is confident
+    INTENT_ROUTER_ENABLED = os.getenv('INTENT_ROUTER_ENABLED', 'true').lower() == 'true'
+    INTENT_ROUTER_MIN_CONFIDENCE = float(os.getenv('INTENT_ROUTER_MIN_CONFIDENCE', '0.85'))
+    INTENT_MODEL_PATH = os.getenv('INTENT_MODEL_PATH', '')
+    # Repository access groups file (JSON mapping or SQLite); empty uses the built-in table
+    REPOSITORY_DATA_PATH = os.getenv('REPOSITORY_DATA_PATH', '')
+    REPOSITORY_RELOAD_INTERVAL_SECONDS = float(os.getenv('REPOSITORY_RELOAD_INTERVAL_SECONDS', '2'))
+    # Serve static/ from memory with gzip/brotli variants, ETags and content-hashed, immutable URLs
+    STATIC_PIPELINE_ENABLED = os.getenv('STATIC_PIPELINE_ENABLED', 'true').lower() == 'true'
+    # Coalesce concurrent identical completions into one Azure call. SINGLE_FLIGHT_SCOPE is "exact"
+    # (payload as sent) or "normalized" (case/whitespace-insensitive text, sampling params ignored);
+    # SINGLE_FLIGHT_SHARED_PATH (a SQLite file) extends it across gunicorn workers on the host
+    SINGLE_FLIGHT_ENABLED = os.getenv('SINGLE_FLIGHT_ENABLED', 'true').lower() == 'true'
+    SINGLE_FLIGHT_SCOPE = os.getenv('SINGLE_FLIGHT_SCOPE', 'exact')
+    SINGLE_FLIGHT_TIMEOUT_SECONDS = float(os.getenv('SINGLE_FLIGHT_TIMEOUT_SECONDS', '30'))
+    SINGLE_FLIGHT_SHARED_PATH = os.getenv('SINGLE_FLIGHT_SHARED_PATH')
+    # POST /api/chat/batch: answer saved conversations with bounded concurrency, streaming NDJSON.
+    # Opt-in: the endpoint is unauthenticated and a single request can draw heavily on the Azure quota
+    BATCH_ENABLED = os.getenv('BATCH_ENABLED', 'false').lower() == 'true'
+    BATCH_MAX_CONCURRENCY = int(os.getenv('BATCH_MAX_CONCURRENCY', '8'))
+    BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '2000'))
+    # Admission control in front of Azure: token buckets for the deployment's RPM and TPM quota
+    # (0 = no limit; both 0 disables it), fair per-user queueing with interactive chat ahead of
+    # batch traffic, and 503 + Retry-After when a request cannot be admitted within its class's
+    # maximum wait. ADMISSION_SHARED_PATH (a SQLite file) shares the buckets between workers
+    ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'true').lower() == 'true'
+    ADMISSION_RPM_LIMIT = int(os.getenv('ADMISSION_RPM_LIMIT', '0'))
+    ADMISSION_TPM_LIMIT = int(os.getenv('ADMISSION_TPM_LIMIT', '0'))
+    ADMISSION_BURST_SECONDS = float(os.getenv('ADMISSION_BURST_SECONDS', '10'))
+    ADMISSION_SHARED_PATH = os.getenv('ADMISSION_SHARED_PATH')
+    ADMISSION_MAX_QUEUE = int(os.getenv('ADMISSION_MAX_QUEUE', '200'))
+    ADMISSION_MAX_QUEUE_PER_USER = int(os.getenv('ADMISSION_MAX_QUEUE_PER_USER', '20'))
+    ADMISSION_INTERACTIVE_MAX_WAIT_SECONDS = float(os.getenv('ADMISSION_INTERACTIVE_MAX_WAIT_SECONDS', '10'))
+    ADMISSION_BATCH_MAX_WAIT_SECONDS = float(os.getenv('ADMISSION_BATCH_MAX_WAIT_SECONDS', '120'))
+    # Share of each bucket batch traffic leaves for interactive chat
+    ADMISSION_BATCH_RESERVE = float(os.getenv('ADMISSION_BATCH_RESERVE', '0.2'))
+    # Completion tokens assumed when estimating a call's TPM cost
+    ADMISSION_COMPLETION_TOKENS = int(os.getenv('ADMISSION_COMPLETION_TOKENS', '400'))
+    # Model tiering: with AZURE_OPENAI_FAST_DEPLOYMENT set (e.g. gpt-4o-mini), short turns and the
+    # rephrasing of successful tool results go to that deployment and everything else to
+    # AZURE_OPENAI_DEPLOYMENT; a fast answer with malformed tool calls (or, with
+    # MODEL_TIER_ESCALATE_UNSURE, an empty or unsure one) is redone on the strong deployment.
+    # ADMISSION_FAST_RPM_LIMIT / ADMISSION_FAST_TPM_LIMIT are the fast deployment's own quota
+    AZURE_OPENAI_FAST_DEPLOYMENT = os.getenv('AZURE_OPENAI_FAST_DEPLOYMENT') or None
+    MODEL_TIER_FAST_MAX_HISTORY_MESSAGES = int(os.getenv('MODEL_TIER_FAST_MAX_HISTORY_MESSAGES', '6'))
+    MODEL_TIER_FAST_MAX_QUESTION_CHARS = int(os.getenv('MODEL_TIER_FAST_MAX_QUESTION_CHARS', '400'))
+    MODEL_TIER_ESCALATE_UNSURE = os.getenv('MODEL_TIER_ESCALATE_UNSURE', 'true').lower() == 'true'
+    ADMISSION_FAST_RPM_LIMIT = int(os.getenv('ADMISSION_FAST_RPM_LIMIT', '0'))
+    ADMISSION_FAST_TPM_LIMIT = int(os.getenv('ADMISSION_FAST_TPM_LIMIT', '0'))
+    # USD per million uncached prompt / cached prompt / completion tokens per deployment, for the
+    # cost estimates in /health and /metrics
+    MODEL_PRICES = {
+        name.strip(): tuple(float(price) for price in prices.split('/')) for name, _, prices in
+        (item.partition('=') for item in
+         os.getenv('MODEL_PRICES', 'gpt-4o=2.50/1.25/10.00,gpt-4o-mini=0.15/0.075/0.60').split(','))
+        if name.strip() and prices.count('/') == 2
+    }
+    # Logging: request threads only queue records; a background thread formats and writes them, as
+    # JSON lines carrying the request id (X-Request-Id) and time into the request, or in the classic
+    # text format with LOG_FORMAT=text. LOG_FILE adds a file (e.g. logs/app.log) to stderr.
+    # LOG_SAMPLE_RATES keeps a share of each listed level's records, whole requests at a time, e.g.
+    # "DEBUG=0.01,INFO=0.1"; warnings and errors are always kept. A full queue drops records
+    LOG_PIPELINE_ENABLED = os.getenv('LOG_PIPELINE_ENABLED', 'true').lower() == 'true'
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+    LOG_FILE = os.getenv('LOG_FILE') or None
+    LOG_SAMPLE_RATES = {
+        level.strip(): float(rate) for level, _, rate in
+        (item.partition('=') for item in os.getenv('LOG_SAMPLE_RATES', '').split(','))
+        if level.strip() and rate.strip()
+    }
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+    # One access line per request, with its status and duration
+    LOG_REQUESTS = os.getenv('LOG_REQUESTS', 'true').lower() == 'true'
+    # Transcripts of every chat turn (question, answer, timings, tokens, tool calls) for audits and
+    # analytics, written behind the request in batches to a SQLite file, e.g. logs/transcripts.db,
+    # that every worker on the host shares. Empty disables them. A turn waits at most
+    # TRANSCRIPT_BLOCK_SECONDS for room in a full queue and is then dropped and counted
+    TRANSCRIPT_PATH = os.getenv('TRANSCRIPT_PATH') or None
+    TRANSCRIPT_MAX_QUEUE = int(os.getenv('TRANSCRIPT_MAX_QUEUE', '10000'))
+    TRANSCRIPT_BATCH_SIZE = int(os.getenv('TRANSCRIPT_BATCH_SIZE', '200'))
+    TRANSCRIPT_FLUSH_INTERVAL_SECONDS = float(os.getenv('TRANSCRIPT_FLUSH_INTERVAL_SECONDS', '1.0'))
+    TRANSCRIPT_BLOCK_SECONDS = float(os.getenv('TRANSCRIPT_BLOCK_SECONDS', '0'))
+    # Start-up. PRELOAD_APP=true (gunicorn.conf.py sets it) builds everything, including the openai
+    # client and tokenizer, once in the gunicorn master so forked workers share it copy-on-write and
+    # start_worker() in each worker only opens its connections; otherwise the openai SDK is imported
+    # on a background thread after start-up, off the path to the worker's first request
+    PRELOAD_APP = os.getenv('PRELOAD_APP', 'false').lower() == 'true'
+    # Per-stage request tracing exported at /metrics (Prometheus) and in Server-Timing headers;
+    # set METRICS_SHARED_DIR so a scrape through any worker process sums every worker
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_SHARED_DIR = os.getenv('METRICS_SHARED_DIR') or None
+    # Shared HTTP connection pool for the Azure OpenAI client
+    HTTP_MAX_CONNECTIONS = int(os.getenv('HTTP_MAX_CONNECTIONS', '100'))
+    HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('HTTP_MAX_KEEPALIVE_CONNECTIONS', '20'))
+    HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv('HTTP_KEEPALIVE_EXPIRY_SECONDS', '30'))
+    HTTP2_ENABLED = os.getenv('HTTP2_ENABLED', 'false').lower() == 'true'
+    HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv('HTTP_CONNECT_TIMEOUT_SECONDS', '5'))
+    HTTP_READ_TIMEOUT_SECONDS = float(os.getenv('HTTP_READ_TIMEOUT_SECONDS', '60'))
+    HTTP_WRITE_TIMEOUT_SECONDS = float(os.getenv('HTTP_WRITE_TIMEOUT_SECONDS', '10'))
+    HTTP_POOL_TIMEOUT_SECONDS = float(os.getenv('HTTP_POOL_TIMEOUT_SECONDS', '5'))
+    # Connections to pre-open at startup; 0 disables warm-up
+    HTTP_POOL_WARMUP_CONNECTIONS = int(os.getenv('HTTP_POOL_WARMUP_CONNECTIONS', '2'))
+    # Resilience for Azure OpenAI calls: retries, hedged requests and a circuit breaker
+    LLM_RETRY_MAX_ATTEMPTS = int(os.getenv('LLM_RETRY_MAX_ATTEMPTS', '3'))
+    LLM_RETRY_BASE_DELAY_SECONDS = float(os.getenv('LLM_RETRY_BASE_DELAY_SECONDS', '0.5'))
+    LLM_RETRY_MAX_DELAY_SECONDS = float(os.getenv('LLM_RETRY_MAX_DELAY_SECONDS', '8'))
+    LLM_HEDGING_ENABLED = os.getenv('LLM_HEDGING_ENABLED', 'false').lower() == 'true'
+    LLM_HEDGE_PERCENTILE = float(os.getenv('LLM_HEDGE_PERCENTILE', '0.95'))
+    LLM_HEDGE_MIN_DELAY_SECONDS = float(os.getenv('LLM_HEDGE_MIN_DELAY_SECONDS', '1'))
+    LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv('LLM_BREAKER_FAILURE_THRESHOLD', '5'))
+    LLM_BREAKER_RECOVERY_SECONDS = float(os.getenv('LLM_BREAKER_RECOVERY_SECONDS', '30'))
+    # Ask for token usage on streamed completions (needs an API version that supports stream_options)
+    LLM_STREAM_INCLUDE_USAGE = os.getenv('LLM_STREAM_INCLUDE_USAGE', 'false').lower() == 'true'
 
 class ProductionConfig(Config):
     """Production configuration."""
     DEBUG = False
-    LOG_LEVEL = 'INFO'
 
 config = {
     'production': ProductionConfig,
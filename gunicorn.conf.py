@@ -0,0 +1,52 @@
+"""Production gunicorn settings, read automatically from the working directory.
+
+    gunicorn                                   # WSGI app, app:create_app()
+    GUNICORN_APP=asgi:application GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn
+
+With preload (the default) the master imports the app, the openai SDK and the
+tokenizer and builds the prompt, tool schemas and indexes once, then forks: new
+workers are serving within milliseconds and share that memory copy-on-write.
+Each worker then only opens its own Azure connections (app.start_worker).
+Every setting can be overridden from the environment or the command line.
+"""
+import gc
+import multiprocessing
+import os
+
+# Read by create_app, so it must be set before the app is loaded
+os.environ.setdefault('PRELOAD_APP', 'true')
+
+wsgi_app = os.getenv('GUNICORN_APP', 'app:create_app()')
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('GUNICORN_WORKERS', str(multiprocessing.cpu_count() * 2 + 1)))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+preload_app = os.environ['PRELOAD_APP'].lower() == 'true'
+backlog = 2048
+# Completions (and a batch's NDJSON stream) can run well past gunicorn's 30s default
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = 30
+# Longer than the App Service front end's idle timeout for reused connections
+keepalive = 75
+# Worker heartbeats on tmpfs: a slow container disk must not get workers killed
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def when_ready(server):
+    if preload_app:
+        # Move everything the preloaded app built into the permanent generation, so the
+        # collector in each worker never writes to (and so copies) those shared pages
+        gc.collect()
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from app import start_worker
+
+        application = worker.app.wsgi()
+        # The ASGI app keeps the Flask app that owns the services on its state
+        start_worker(getattr(getattr(application, 'state', None), 'flask_app', application))
@@ -12,6 +12,7 @@ const sendButton = document.getElementById('send-button');
 
 // Chat state
 let chatHistory = [];
+let sessionId = null;
 let isLoading = false;
 
 // Initialize app
@@ -126,26 +127,15 @@ async function handleChatSubmit(e) {
     setLoadingState(true);
 
     try {
-        const response = await fetch('/api/chat', {
-            method: 'POST',
-            headers: { 
-                'Content-Type': 'application/json',
-                'Accept': 'application/json'
-            },
-            body: JSON.stringify({ messages: chatHistory }),
-        });
+        const reply = await streamChatResponse(message);
 
-        if (!response.ok) {
-            throw new Error(`Server error: ${response.status} ${response.statusText}`);
+        if (reply.failed) {
+            // The failure text stays on screen but out of the history sent back to the server
+            chatHistory.pop();
+        } else {
+            chatHistory.push({ role: 'assistant', content: reply.content });
         }
 
-        const data = await response.json();
-        const assistantMessage = data.choices?.[0]?.message?.content || 'I apologize, but I did not receive a proper response. Please try again.';
-
-        // Add assistant response
-        appendMessage('assistant', assistantMessage);
-        chatHistory.push({ role: 'assistant', content: assistantMessage });
-
     } catch (error) {
         console.error('Chat error:', error);
         showError(`Unable to send message: ${error.message}. Please check your connection and try again.`);
@@ -158,6 +148,99 @@ async function handleChatSubmit(e) {
     }
 }
 
+// Stream the assistant reply from /api/chat/stream, rendering text as it arrives.
+// Resolves to { content, failed }; a failed reply ended in an error event or carried no text.
+async function streamChatResponse(message) {
+    let response = await postChatStream(message);
+
+    // The server-side session expired: start a new one seeded with our local history
+    if (response.status === 404 && sessionId) {
+        sessionId = null;
+        response = await postChatStream(message);
+    }
+
+    if (!response.ok) {
+        throw new Error(`Server error: ${response.status} ${response.statusText}`);
+    }
+
+    const contentDiv = appendMessage('assistant', '');
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let assistantMessage = '';
+    let failed = false;
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+
+        // SSE events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const event = parseSseEvent(buffer.slice(0, boundary));
+            buffer = buffer.slice(boundary + 2);
+
+            if (event.type === 'session') {
+                sessionId = event.data?.session_id || null;
+            } else if (event.data?.content) {
+                failed = failed || event.type === 'error';
+                assistantMessage += event.data.content;
+                contentDiv.textContent = assistantMessage;
+                chatWindow.scrollTop = chatWindow.scrollHeight;
+            }
+        }
+    }
+
+    if (!assistantMessage) {
+        failed = true;
+        assistantMessage = 'I apologize, but I did not receive a proper response. Please try again.';
+        contentDiv.textContent = assistantMessage;
+    }
+
+    return { content: assistantMessage, failed: failed };
+}
+
+// With a session only the new message is sent; otherwise send the history and open one
+function postChatStream(message) {
+    const body = sessionId
+        ? { session_id: sessionId, message: message }
+        : { messages: chatHistory, session: true };
+
+    return fetch('/api/chat/stream', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Accept': 'text/event-stream'
+        },
+        body: JSON.stringify(body),
+    });
+}
+
+function parseSseEvent(rawEvent) {
+    const event = { type: 'message', data: null };
+    const dataLines = [];
+
+    rawEvent.split('\n').forEach(line => {
+        if (line.startsWith('event:')) {
+            event.type = line.slice(6).trim();
+        } else if (line.startsWith('data:')) {
+            dataLines.push(line.slice(5).trim());
+        }
+    });
+
+    if (dataLines.length) {
+        try {
+            event.data = JSON.parse(dataLines.join('\n'));
+        } catch (error) {
+            console.error('Malformed stream event:', error);
+        }
+    }
+
+    return event;
+}
+
 function appendMessage(role, content) {
     const messageDiv = document.createElement('div');
     messageDiv.className = `chat-message ${role}`;
@@ -192,6 +275,8 @@ function appendMessage(role, content) {
         top: chatWindow.scrollHeight,
         behavior: 'smooth'
     });
+
+    return contentDiv;
 }
 
 function setLoadingState(loading) {
@@ -0,0 +1,13 @@
+import os
+
+# config.py reads the environment at import time, so set it before any test imports the app
+os.environ.update(
+    OPENAI_API_KEY="test-key",
+    AZURE_OPENAI_ENDPOINT="https://test.openai.azure.com",
+    LOG_LEVEL="ERROR",
+    LOG_PIPELINE_ENABLED="false",
+    INTENT_ROUTER_ENABLED="false",
+    RESPONSE_CACHE_ENABLED="false",
+    HTTP_POOL_WARMUP_CONNECTIONS="0",
+    LLM_BREAKER_FAILURE_THRESHOLD="1000"
+)
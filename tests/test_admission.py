@@ -0,0 +1,99 @@
+import threading
+import time
+
+import pytest
+
+from app.services.admission import AdmissionController, request_class, retry_after_header
+from app.utils.exceptions import AdmissionRejectedError
+
+CALL = {"messages": [{"role": "user", "content": "hi"}]}
+
+
+def acquire(controller, priority="interactive", user="alice"):
+    with request_class(priority, user):
+        return controller.acquire(CALL)
+
+
+def test_calls_within_the_burst_are_admitted_at_once():
+    controller = AdmissionController(rpm_limit=60, burst_seconds=3)
+    for _ in range(3):
+        assert acquire(controller)["waited"] < 0.1
+    assert controller.stats()["admitted"] == 3
+
+
+def test_call_that_cannot_fit_before_its_deadline_is_rejected_with_retry_after():
+    controller = AdmissionController(rpm_limit=60, burst_seconds=1, max_wait={"interactive": 0.2})
+    acquire(controller)
+    with pytest.raises(AdmissionRejectedError) as rejected:
+        acquire(controller)
+    assert rejected.value.reason == "deadline"
+    assert rejected.value.retry_after > 0.2
+    assert controller.stats()["rejected_deadline"] == 1
+
+
+def test_check_rejects_streams_up_front_when_the_quota_is_spent():
+    controller = AdmissionController(rpm_limit=60, burst_seconds=1, max_wait={"interactive": 0.2})
+    with request_class("interactive", "alice"):
+        controller.check()
+    acquire(controller)
+    with request_class("interactive", "alice"), pytest.raises(AdmissionRejectedError):
+        controller.check()
+
+
+def test_batch_calls_leave_the_reserve_to_interactive_ones():
+    controller = AdmissionController(rpm_limit=60, burst_seconds=10, batch_reserve=0.5,
+                                     max_wait={"interactive": 0.2, "batch": 0.2})
+    for _ in range(5):
+        acquire(controller, "batch")
+    with pytest.raises(AdmissionRejectedError):
+        acquire(controller, "batch")
+    acquire(controller, "interactive")
+
+
+def waiting_call(controller, priority, user, outcome):
+    def run():
+        try:
+            acquire(controller, priority, user)
+            outcome.append("admitted")
+        except AdmissionRejectedError as e:
+            outcome.append(e.reason)
+    thread = threading.Thread(target=run)
+    thread.start()
+    # Let it join the queue
+    deadline = time.monotonic() + 2
+    while not sum(controller.stats()["queued"].values()) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return thread
+
+
+def test_one_user_cannot_fill_the_queue():
+    controller = AdmissionController(rpm_limit=120, burst_seconds=0.5, max_queue_per_user=1,
+                                     max_wait={"interactive": 5})
+    acquire(controller)
+    outcome = []
+    thread = waiting_call(controller, "interactive", "alice", outcome)
+
+    with pytest.raises(AdmissionRejectedError) as rejected:
+        acquire(controller, user="alice")
+    assert rejected.value.reason == "user_limit"
+
+    thread.join()
+    assert outcome == ["admitted"]
+
+
+def test_full_queue_drops_a_batch_call_for_an_interactive_one():
+    controller = AdmissionController(rpm_limit=120, burst_seconds=0.5, max_queue=1,
+                                     max_wait={"interactive": 5, "batch": 5})
+    acquire(controller)
+    outcome = []
+    thread = waiting_call(controller, "batch", "eval", outcome)
+
+    acquire(controller, "interactive", "alice")
+    thread.join()
+    assert outcome == ["evicted"]
+    assert controller.stats()["rejected_evicted"] == 1
+
+
+def test_retry_after_header_rounds_up_to_whole_seconds():
+    assert retry_after_header(0.2) == "1"
+    assert retry_after_header(2.1) == "3"
@@ -0,0 +1,119 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app import create_app
+from app.utils.exceptions import AdmissionRejectedError
+
+APOLOGY = "I am currently experiencing technical difficulties. Please try again later."
+
+
+def completion(text):
+    message = SimpleNamespace(content=text, tool_calls=None)
+    usage = SimpleNamespace(prompt_tokens=100, completion_tokens=10, total_tokens=110,
+                            prompt_tokens_details=SimpleNamespace(cached_tokens=0))
+    return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")], usage=usage)
+
+
+def completion_stream(text):
+    for word in text.split(" "):
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word + " ", tool_calls=None))])
+
+
+@pytest.fixture
+def app():
+    return create_app('default')
+
+
+@pytest.fixture
+def services(app):
+    return app.extensions['chatbot_services']
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def model(services):
+    """Point the chatbot at a fake Azure client; set ``model.error`` to make every call fail."""
+    state = SimpleNamespace(error=None, answer="D1 uses the d1_analysts group")
+
+    def create(**params):
+        if state.error:
+            raise state.error
+        return completion_stream(state.answer) if params.get("stream") else completion(state.answer)
+
+    services['openai_service'].client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    return state
+
+
+def events(response):
+    parsed = []
+    for block in response.get_data(as_text=True).split("\n\n"):
+        if not block.strip():
+            continue
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        parsed.append((lines.get("event", "message"), json.loads(lines["data"])))
+    return parsed
+
+
+def test_answer_opens_a_session(client, services, model):
+    response = client.post('/api/chat', json={"message": "which groups for D1?"})
+    assert response.status_code == 200
+    session_id = response.get_json()["session_id"]
+    assert [m["role"] for m in services['session_store'].get_history(session_id)] == ["user", "assistant"]
+
+
+def test_failed_answer_returns_500_and_opens_no_session(client, services, model):
+    model.error = RuntimeError("azure down")
+    response = client.post('/api/chat', json={"message": "which groups for D1?"})
+    assert response.status_code == 500
+    assert response.get_json() == {"choices": [{"message": {"content": APOLOGY}}]}
+    assert services['session_store'].stats()["active"] == 0
+
+
+def test_failed_answer_leaves_an_existing_session_untouched(client, services, model):
+    session_id = client.post('/api/chat', json={"message": "which groups for D1?"}).get_json()["session_id"]
+    model.error = RuntimeError("azure down")
+    response = client.post('/api/chat', json={"message": "and for Q1?", "session_id": session_id})
+    assert response.status_code == 500
+    assert len(services['session_store'].get_history(session_id)) == 2
+
+
+def test_rejected_answer_returns_503_with_retry_after(client, services, model):
+    model.error = AdmissionRejectedError("over the rate limit", retry_after=2.5)
+    response = client.post('/api/chat', json={"message": "which groups for D1?"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "3"
+    assert services['session_store'].stats()["active"] == 0
+
+
+def test_stream_sends_the_session_after_the_answer(client, services, model):
+    streamed = events(client.post('/api/chat/stream', json={"message": "which groups for D1?"}))
+    kinds = [kind for kind, _ in streamed]
+    assert kinds[-2:] == ["session", "done"]
+    assert set(kinds[:-2]) == {"message"}
+    session_id = streamed[-2][1]["session_id"]
+    assert services['session_store'].get_history(session_id)[-1]["content"].strip() == model.answer
+
+
+def test_failed_stream_sends_an_error_event_and_no_session(client, services, model):
+    model.error = RuntimeError("azure down")
+    streamed = events(client.post('/api/chat/stream', json={"message": "which groups for D1?"}))
+    assert streamed == [("error", {"content": APOLOGY}), ("done", {})]
+    assert services['session_store'].stats()["active"] == 0
+    assert 'chatbot_requests_total{route="/api/chat/stream",status="500"} 1' in services['metrics'].render()
+
+
+def test_rejected_stream_sends_the_retry_message(client, services, model):
+    model.error = AdmissionRejectedError("over the rate limit", retry_after=2.5)
+    streamed = events(client.post('/api/chat/stream', json={"message": "which groups for D1?"}))
+    kind, payload = streamed[0]
+    assert kind == "error"
+    assert payload["retry_after"] == 3
+    assert payload["content"] == "The assistant is busy right now. Please try again in 3 seconds."
+    assert [kind for kind, _ in streamed[1:]] == ["done"]
+    assert services['session_store'].stats()["active"] == 0
@@ -0,0 +1,80 @@
+from app.services.context_manager import ContextManager
+
+
+def long_conversation(turns, words=60):
+    history = []
+    for turn in range(turns):
+        history.append({"role": "user", "content": f"question {turn} " + "word " * words})
+        history.append({"role": "assistant", "content": f"answer {turn} " + "text " * words})
+    return history + [{"role": "user", "content": "latest question"}]
+
+
+def test_short_history_is_sent_unchanged():
+    manager = ContextManager(max_prompt_tokens=6000)
+    history = long_conversation(1)
+    messages, metrics = manager.build_messages("system", history)
+    assert messages == [{"role": "system", "content": "system"}] + history
+    assert metrics["tokens_before"] == metrics["tokens_after"]
+    assert metrics["messages_summarized"] == 0
+
+
+def test_long_history_is_trimmed_to_the_budget_keeping_recent_messages():
+    manager = ContextManager(max_prompt_tokens=600, keep_recent_messages=4, summary_max_tokens=150)
+    history = long_conversation(20)
+    messages, metrics = manager.build_messages("system", history)
+
+    assert metrics["tokens_after"] <= 600 < metrics["tokens_before"]
+    assert metrics["messages_summarized"] > 0
+    assert messages[0] == {"role": "system", "content": "system"}
+    assert messages[1]["role"] == "system" and messages[1]["content"].startswith("Summary of earlier conversation:")
+    assert messages[-4:] == history[-4:]
+
+
+def test_tool_call_and_results_are_kept_or_dropped_together():
+    manager = ContextManager(max_prompt_tokens=500, keep_recent_messages=2, summary_max_tokens=100)
+    tool_turn = [
+        {"role": "assistant", "tool_calls": [{"id": "call_1", "type": "function",
+                                              "function": {"name": "lookup", "arguments": "{}"}}]},
+        {"role": "tool", "tool_call_id": "call_1", "content": "result " * 30}
+    ]
+    history = long_conversation(10)
+    history = history[:4] + tool_turn + history[4:]
+    messages, _ = manager.build_messages("system", history)
+
+    kept_calls = [m for m in messages if m.get("tool_calls")]
+    kept_results = [m for m in messages if m.get("role") == "tool"]
+    assert len(kept_calls) == len(kept_results)
+
+
+def test_summary_is_extended_per_session_not_rebuilt():
+    manager = ContextManager(max_prompt_tokens=600, keep_recent_messages=4, summary_max_tokens=300)
+    history = long_conversation(12)
+    manager.build_messages("system", history, "session-a")
+    summarized_before = manager._summaries["session-a"][0]
+
+    lines = []
+    original = manager._summary_line
+    manager._summary_line = lambda message: (lines.append(message), original(message))[1]
+    longer = history + [{"role": "assistant", "content": "answer " + "text " * 60},
+                        {"role": "user", "content": "one more " + "word " * 60}]
+    manager.build_messages("system", longer, "session-a")
+
+    assert manager._summaries["session-a"][0] > summarized_before
+    # Only the messages that newly fell out of the window were summarized
+    assert len(lines) == manager._summaries["session-a"][0] - summarized_before
+
+
+def test_conversations_without_a_session_share_no_summary():
+    manager = ContextManager(max_prompt_tokens=600, keep_recent_messages=4, summary_max_tokens=300)
+    first = long_conversation(12)
+    # Same opening message, different conversation
+    second = first[:1] + long_conversation(12)[1:]
+    second[3]["content"] = "an entirely different answer " + "text " * 60
+
+    manager.build_messages("system", first)
+    messages, _ = manager.build_messages("system", second)
+    expected, _ = ContextManager(max_prompt_tokens=600, keep_recent_messages=4,
+                                 summary_max_tokens=300).build_messages("system", second)
+
+    assert messages == expected
+    assert manager.stats()["cached_summaries"] == 0
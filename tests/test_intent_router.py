@@ -0,0 +1,29 @@
+import pytest
+
+from app.services.intent_router import IntentRouter
+
+
+def classify(text):
+    return IntentRouter().classify([{"role": "user", "content": text}])
+
+
+@pytest.mark.parametrize("text", ["hi", "hello!"])
+def test_greetings_are_routed(text):
+    assert classify(text)["name"] == "greeting"
+
+
+def test_repository_access_question_is_routed():
+    intent = classify("which groups do I need for D1?")
+    assert intent["name"] == "repository_lookup"
+    assert intent["slots"] == {"repository_ids": ["D1"]}
+
+
+@pytest.mark.parametrize("text", [
+    "I don't need access to D1",
+    "which groups are not needed for D1?",
+    "how do I remove access to D1?",
+    "I can't get access to D1",
+    "cancel my D1 access request"
+])
+def test_negated_repository_questions_go_to_the_model(text):
+    assert classify(text) is None
@@ -0,0 +1,73 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.chatbot_service import ChatbotService
+from app.services.knowledge_index import KnowledgeIndex, load_documents, tokenize
+
+DOCUMENTS = {
+    "vpn_setup": {"title": "VPN setup", "text": "Install the VPN client and sign in with your network account."},
+    "db2_access": {"title": "DB2 access", "text": "DB2 and Yellowbrick access is requested through myAccess."},
+    "qa_workflows": {"title": "QA workflows", "text": "Run workflows in the QA repository with the QA run group."},
+    "production": {"title": "Production access", "text": "Production access needs approval from your lead."}
+}
+
+
+@pytest.fixture
+def index():
+    return KnowledgeIndex.build(DOCUMENTS)
+
+
+def test_tokenize_drops_stopwords_and_punctuation():
+    assert tokenize("How do I run a QA workflow?") == ["run", "qa", "workflow"]
+
+
+def test_best_match_ranks_first(index):
+    assert [hit["id"] for hit in index.search("qa repository workflows")][0] == "qa_workflows"
+    assert [hit["id"] for hit in index.search("yellowbrick")] == ["db2_access"]
+
+
+def test_rarer_terms_outweigh_common_ones(index):
+    # "access" appears in three articles, "vpn" in one
+    assert index.search("vpn access")[0]["id"] == "vpn_setup"
+
+
+def test_ids_and_titles_are_searchable(index):
+    assert index.search("db2")[0]["id"] == "db2_access"
+
+
+def test_search_returns_at_most_k_hits_best_first(index):
+    hits = index.search("access", k=2)
+    assert len(hits) == 2
+    assert hits[0]["score"] >= hits[1]["score"]
+    assert index.search("nothing matches this") == []
+
+
+def test_saved_index_loads_only_while_documents_are_unchanged(tmp_path):
+    path = str(tmp_path / "index.json")
+    built = KnowledgeIndex.load_or_build(DOCUMENTS, path)
+    loaded = KnowledgeIndex.load(path)
+    assert loaded.search("vpn") == built.search("vpn")
+
+    changed = dict(DOCUMENTS, vpn_setup={"title": "VPN", "text": "Use the new portal."})
+    rebuilt = KnowledgeIndex.load_or_build(changed, path)
+    assert rebuilt.version != built.version
+    assert KnowledgeIndex.load(path).version == rebuilt.version
+
+
+@pytest.fixture
+def chatbot():
+    return ChatbotService(SimpleNamespace(), direct_answer_tools=["search_knowledge_base"],
+                          knowledge_index=KnowledgeIndex.build(load_documents()))
+
+
+def test_clear_top_hit_answers_directly(chatbot):
+    result = chatbot._execute_knowledge_search("production access approval")
+    assert chatbot._render_direct_answer([("search_knowledge_base", result)]) == result["results"][0]["answer"]
+
+
+@pytest.mark.parametrize("query", ["vpn access", "request access myaccess"])
+def test_weak_or_close_hits_go_to_the_model(chatbot, query):
+    result = chatbot._execute_knowledge_search(query)
+    assert result["status"] == "success"
+    assert chatbot._render_direct_answer([("search_knowledge_base", result)]) is None
@@ -0,0 +1,85 @@
+import random
+
+import pytest
+
+from app.services.onboarding import ASK_UNIX_MESSAGE, ENABLE_UNIX_MESSAGE, UnixPrerequisiteChecker
+
+LINES = [
+    "hi", "I'm a new user", "i am new here", "yes", "yeah I do", "no", "not yet", "I don't have it",
+    "Do you have UNIX enabled on your account?", "ok", "UNIX is enabled", "without unix", "thanks"
+]
+
+
+def legacy_check(chat_history):
+    """The full substring rescan UnixPrerequisiteChecker replaced."""
+    is_new_user = False
+    asked_unix = False
+    unix_answer = None
+    for message in chat_history:
+        content = message.get("content", "").lower()
+        role = message.get("role")
+        if role == "user" and any(phrase in content for phrase in ["new user", "i am new", "i'm new"]):
+            is_new_user = True
+        if role == "assistant" and "unix enabled" in content:
+            asked_unix = True
+        if asked_unix and role == "user":
+            if any(word in content for word in ["yes", "yep", "yeah", "i do", "enabled", "have unix"]):
+                unix_answer = "yes"
+            elif any(word in content for word in ["no", "not", "don't have", "haven't", "without unix", "no unix"]):
+                unix_answer = "no"
+
+    if is_new_user and not asked_unix:
+        return ASK_UNIX_MESSAGE
+    if asked_unix and unix_answer == "no":
+        return ENABLE_UNIX_MESSAGE
+    return None
+
+
+def user(content):
+    return {"role": "user", "content": content}
+
+
+def assistant(content):
+    return {"role": "assistant", "content": content}
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_matches_the_legacy_check_turn_by_turn(seed):
+    generator = random.Random(seed)
+    checker = UnixPrerequisiteChecker()
+    history = []
+    for _ in range(generator.randint(1, 12)):
+        history.append({"role": generator.choice(["user", "assistant"]), "content": generator.choice(LINES)})
+        expected = legacy_check(history)
+        assert checker.check(history, f"session-{seed}") == expected
+        assert checker.check(history) == expected
+
+
+def test_each_check_scans_only_new_messages():
+    checker = UnixPrerequisiteChecker()
+    history = []
+    for turn in range(50):
+        history += [user(f"question {turn}"), assistant(f"answer {turn}")]
+        checker.check(history, "session")
+    assert checker.stats()["messages_scanned"] == len(history)
+    assert checker.stats()["rescans"] == 0
+
+
+def test_state_is_not_shared_between_sessions():
+    checker = UnixPrerequisiteChecker()
+    assert checker.check([user("hi, I'm a new user")], "a") == ASK_UNIX_MESSAGE
+    assert checker.check([user("hi")], "b") is None
+    assert checker.check([user("hi")]) is None
+
+
+def test_a_replaced_history_is_rescanned():
+    checker = UnixPrerequisiteChecker()
+    history = [user("I'm a new user"), assistant("Do you have UNIX enabled?"), user("no")]
+    assert checker.check(history, "session") == ENABLE_UNIX_MESSAGE
+
+    replaced = [user("hi"), assistant("hello"), user("groups for d1")]
+    assert checker.check(replaced, "session") is None
+    assert checker.stats()["rescans"] == 1
+
+    assert checker.check(history[:2], "session") is None
+    assert checker.stats()["rescans"] == 2
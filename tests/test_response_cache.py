@@ -0,0 +1,63 @@
+from app.services.response_cache import ResponseCache
+
+
+def conversation(*turns):
+    roles = ["user", "assistant"]
+    return [{"role": roles[index % 2], "content": content} for index, content in enumerate(turns)]
+
+
+def test_key_ignores_case_whitespace_and_trailing_punctuation():
+    cache = ResponseCache()
+    assert cache.make_key(conversation("Which groups for  D1?")) == cache.make_key(conversation("which groups for d1"))
+    assert cache.make_key(conversation("which groups for d1")) != cache.make_key(conversation("which groups for d2"))
+
+
+def test_key_covers_only_the_conversation_tail():
+    cache = ResponseCache(tail_messages=2)
+    first = conversation("hi", "hello", "groups for d1?", "here they are", "and q1?")
+    second = conversation("something else", "ok", "groups for d1?", "here they are", "and q1?")
+    assert cache.make_key(first) == cache.make_key(second)
+    assert cache.make_key(first) != cache.make_key(first[:-2] + conversation("and p1?"))
+
+
+def test_no_key_unless_the_last_message_is_from_the_user():
+    cache = ResponseCache()
+    assert cache.make_key([]) is None
+    assert cache.make_key(conversation("hi", "hello")) is None
+
+
+def test_new_version_invalidates_keys_and_local_entries():
+    cache = ResponseCache()
+    cache.set_version("v1")
+    key = cache.make_key(conversation("groups for d1"))
+    cache.set(key, "answer")
+    assert cache.get(key) == "answer"
+
+    cache.set_version("v2")
+    assert cache.make_key(conversation("groups for d1")) != key
+    assert cache.get(key) is None
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.services.response_cache.time.time", lambda: now[0])
+    cache = ResponseCache(ttl_seconds=60)
+    cache.set("key", "answer")
+    now[0] += 59
+    assert cache.get("key") == "answer"
+    now[0] += 2
+    assert cache.get("key") is None
+
+
+def test_shared_tier_serves_other_workers(tmp_path):
+    path = str(tmp_path / "cache.db")
+    writer = ResponseCache(shared_path=path)
+    reader = ResponseCache(shared_path=path)
+    key = writer.make_key(conversation("groups for d1"))
+    writer.set(key, "answer")
+
+    assert reader.get(key) == "answer"
+    assert reader.stats()["shared_hits"] == 1
+    # Copied into the reader's own tier on the way
+    assert reader.get(key) == "answer"
+    assert reader.stats()["hits"] == 1
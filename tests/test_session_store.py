@@ -0,0 +1,76 @@
+import pytest
+
+from app.services.session_store import SessionStore
+
+
+@pytest.fixture(params=["local", "shared"])
+def make_store(request, tmp_path):
+    def make(**options):
+        if request.param == "shared":
+            options["shared_path"] = str(tmp_path / "sessions.db")
+        return SessionStore(**options)
+    return make
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.services.session_store.time.time", lambda: now[0])
+    return now
+
+
+def message(content, role="user"):
+    return {"role": role, "content": content}
+
+
+def test_create_seeds_and_append_extends(make_store):
+    store = make_store()
+    session_id = store.create([message("hi"), message("hello", "assistant")])
+    store.append(session_id, [message("groups for d1?")])
+    assert [m["content"] for m in store.get_history(session_id)] == ["hi", "hello", "groups for d1?"]
+
+
+def test_first_append_stores_a_new_session(make_store):
+    store = make_store()
+    session_id = store.new_id()
+    assert store.get_history(session_id) is None
+    assert store.stats()["created"] == 0
+
+    store.append(session_id, [message("hi"), message("hello", "assistant")])
+    assert len(store.get_history(session_id)) == 2
+    assert store.stats()["created"] == 1
+
+
+def test_history_keeps_only_the_last_messages(make_store):
+    store = make_store(max_messages=3)
+    session_id = store.create([message(str(n)) for n in range(5)])
+    assert [m["content"] for m in store.get_history(session_id)] == ["2", "3", "4"]
+    store.append(session_id, [message("5"), message("6")])
+    assert [m["content"] for m in store.get_history(session_id)] == ["4", "5", "6"]
+
+
+def test_idle_sessions_expire(make_store, clock):
+    store = make_store(idle_ttl_seconds=60)
+    session_id = store.create([message("hi")])
+    clock[0] += 59
+    assert store.get_history(session_id) is not None
+    store.append(session_id, [message("still here")])
+    clock[0] += 59
+    assert store.get_history(session_id) is not None
+    clock[0] += 61
+    assert store.get_history(session_id) is None
+
+
+def test_least_recently_used_sessions_are_evicted(make_store, clock):
+    store = make_store(max_sessions=2)
+    first = store.create([message("1")])
+    clock[0] += 1
+    second = store.create([message("2")])
+    clock[0] += 1
+    store.append(first, [message("1b")])
+    clock[0] += 1
+    store.create([message("3")])
+
+    assert store.get_history(first) is not None
+    assert store.get_history(second) is None
+    assert store.stats()["active"] == 2
@@ -0,0 +1,76 @@
+import asyncio
+import json
+from contextvars import ContextVar
+
+import pytest
+
+from app.services.tool_registry import Tool, ToolExecutor, ToolRegistry
+
+request_id = ContextVar("request_id", default=None)
+
+
+def call(name, **arguments):
+    return {"id": f"call_{name}", "type": "function",
+            "function": {"name": name, "arguments": json.dumps(arguments)}}
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def executor(calls):
+    outcomes = {"flaky": ["error", "success"]}
+
+    def lookup(repository):
+        calls.append(("lookup", repository, request_id.get()))
+        return {"status": "success", "repository": repository}
+
+    def flaky(repository):
+        calls.append(("flaky", repository, request_id.get()))
+        return {"status": outcomes["flaky"].pop(0)}
+
+    registry = ToolRegistry()
+    for handler in (lookup, flaky):
+        registry.register(Tool(handler.__name__, handler, "", {"type": "object"}))
+    return ToolExecutor(registry, max_workers=4)
+
+
+def test_results_come_back_in_call_order_and_repeats_run_once(executor, calls):
+    memo = {}
+    results = executor.run([call("lookup", repository="d1"), call("lookup", repository="q1"), call("lookup", repository="d1")], memo)
+    assert [result["repository"] for result in results] == ["d1", "q1", "d1"]
+    assert sorted(repository for _, repository, _ in calls) == ["d1", "q1"]
+
+    executor.run([call("lookup", repository="q1")], memo)
+    assert len(calls) == 2
+
+
+def test_failures_are_not_memoized(executor, calls):
+    memo = {}
+    assert executor.run([call("flaky", repository="d1")], memo)[0]["status"] == "error"
+    assert executor.run([call("flaky", repository="d1")], memo)[0]["status"] == "success"
+    assert executor.run([call("flaky", repository="d1")], memo)[0]["status"] == "success"
+    assert len(calls) == 2
+
+
+def test_bad_calls_become_error_results(executor):
+    unknown = {"id": "x", "type": "function", "function": {"name": "missing", "arguments": "{}"}}
+    garbled = {"id": "y", "type": "function", "function": {"name": "lookup", "arguments": "{nope"}}
+    assert [result["status"] for result in executor.run([unknown, garbled], {})] == ["error", "error"]
+
+
+def test_pooled_calls_keep_the_request_context(executor, calls):
+    request_id.set("req-1")
+    executor.run([call("lookup", repository="d1"), call("lookup", repository="q1")], {})
+    assert {seen for _, _, seen in calls} == {"req-1"}
+
+
+def test_async_calls_keep_the_request_context(executor, calls):
+    async def run():
+        request_id.set("req-2")
+        return await executor.run_async([call("lookup", repository="d1"), call("lookup", repository="q1")], {})
+
+    assert [result["repository"] for result in asyncio.run(run())] == ["d1", "q1"]
+    assert {seen for _, _, seen in calls} == {"req-2"}